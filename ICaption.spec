@@ -1,16 +1,57 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# image_utils.pil_image() registers only these decoders, the rest of Pillow's format plugins are left out
+pil_plugins = ['PIL.PngImagePlugin', 'PIL.JpegImagePlugin', 'PIL.WebPImagePlugin', 'PIL.BmpImagePlugin']
+pil_excludes = [f'PIL.{name}ImagePlugin' for name in (
+    'Blp',
+    'Bufr',
+    'Cur',
+    'Dcx',
+    'Dds',
+    'Eps',
+    'Fits',
+    'Fli',
+    'Fpx',
+    'Ftex',
+    'Gbr',
+    'Grib',
+    'Hdf5',
+    'Icns',
+    'Ico',
+    'Im',
+    'Imt',
+    'Iptc',
+    'McIdas',
+    'Mic',
+    'Msp',
+    'Palm',
+    'Pcd',
+    'Pcx',
+    'Pdf',
+    'Pixar',
+    'Psd',
+    'Qoi',
+    'Sgi',
+    'Spider',
+    'Sun',
+    'Tga',
+    'Wmf',
+    'Xbm',
+    'Xpm',
+    'Xvthumb',
+)]
+
 
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
     datas=[('triggers.txt', '.'), ('translations.txt', '.'), ('trigger_groups.txt', '.'), ('assets', 'assets'), ('themes', 'themes'), ('settings.json', '.')],
-    hiddenimports=[],
+    hiddenimports=pil_plugins,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=pil_excludes,
     noarchive=False,
     optimize=0,
 )
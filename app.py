@@ -1,31 +1,90 @@
-import sys, os
+import sys, os, io, time
 import tkinter as tk
 import threading
 from tkinter import ttk, filedialog, messagebox, simpledialog
-from PIL import Image, ImageTk, ImageDraw
 from collections import Counter
+from typing import TYPE_CHECKING
 
 from constants import (
     APP_TITLE, DEFAULT_TRIGGERS_FILE, DEFAULT_TRANSLATIONS_FILE, DEFAULT_GROUPS_FILE,
-    CAPTION_JOINER, IMAGE_EXTS, SETTINGS_FILE
+    IMAGE_EXTS, SETTINGS_FILE
 )
 from io_store import (
     normalize_trigger,
-    load_triggers, save_triggers,
-    load_translations, save_translations, upsert_translation,
+    load_triggers,
     load_groups, save_groups,
     parse_caption_tokens,
     load_settings, save_settings
 )
 from ui_widgets import ScrollableFrame
+from caption_store import open_caption_store
+from translation_store import TranslationStore
+from persistence import PersistenceManager
+from file_watch import FileWatcher
+from vocab_index import wants_large_vocab
+from image_utils import (
+    pil_image, preload_pil, ppm_payload, read_embedded_thumbnail, read_image_size, set_max_image_pixels
+)
+from startup_profile import PROFILE
+from session_snapshot import SessionSnapshot
+from metrics import METRICS
+from dataset_session import DatasetSession
+from caption_state import CaptionState, CAPTIONED, UNKNOWN, MODIFIED, scan_unknown
+from loop_monitor import LoopMonitor
+from tile_viewer import TileViewer
+
+if TYPE_CHECKING:
+    from PIL import Image  # annotations only, Pillow itself loads lazily via pil_image()
+
+
+def _dataset_attr(name: str):
+    # App attribute backed by self.dataset, so UI code keeps reading self.groups, self.folder_images, ...
+    return property(lambda self: getattr(self.dataset, name), lambda self, v: setattr(self.dataset, name, v))
+
 
 class App(tk.Tk):
+    WATCH_INTERVAL_MS = 1500
+    VOCAB_FILTER_LIMIT = 200
+    AUTOCOMPLETE_LIMIT = 30
+    SESSION_SAVE_MS = 30_000
+    HUD_REFRESH_MS = 500
+    LAG_THRESHOLD_MS = 100
+    RESIZE_COARSE_MS = 30
+    PREVIEW_REFINE_MS = 250
+    # presses closer together than this are key repeat: show name + thumbnail only
+    NAV_REPEAT_S = 0.1
+    NAV_SETTLE_MS = 150
+
+    # ===== dataset state lives in DatasetSession =====
+    triggers_path = _dataset_attr("triggers_path")
+    translations_path = _dataset_attr("translations_path")
+    groups_path = _dataset_attr("groups_path")
+    triggers = _dataset_attr("triggers")
+    vocab = _dataset_attr("vocab")
+    groups = _dataset_attr("groups")
+    group_order = _dataset_attr("group_order")
+    translation_store = _dataset_attr("translation_store")
+    translations = property(lambda self: self.dataset.translations)
+    deleted_triggers = _dataset_attr("deleted_triggers")
+    caption_store = _dataset_attr("caption_store")
+    current_folder = _dataset_attr("folder")
+    folder_images = _dataset_attr("images")
+    folder_index = _dataset_attr("index")
+
     def __init__(self):
         super().__init__()
 
         self.title(APP_TITLE)
         self.geometry("1100x700")
 
+        # ===== window shell: painted before settings, vocabulary and widgets are loaded =====
+        self._ready = False
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        shell = ttk.Label(self, text="Loading...", padding=20)
+        shell.pack(side="top", anchor="nw")
+        self.update()
+        PROFILE.mark("window shell")
+
         # ===== UI STATE =====
         self.current_group = tk.StringVar(value="All")
         self.group_title = tk.StringVar(value="Group: All")
@@ -33,10 +92,6 @@ class App(tk.Tk):
         self.auto_save_var = tk.BooleanVar(value=False)
 
         # ===== DATA STATE =====
-        self.triggers_path = os.path.abspath(DEFAULT_TRIGGERS_FILE)
-        self.translations_path = os.path.abspath(DEFAULT_TRANSLATIONS_FILE)
-        self.groups_path = os.path.abspath(DEFAULT_GROUPS_FILE)
-
         if getattr(sys, 'frozen', False):
             base = os.path.dirname(sys.executable)
         else:
@@ -44,17 +99,63 @@ class App(tk.Tk):
 
         self.settings_path = os.path.join(base, "settings.json")
         self.settings = load_settings(self.settings_path)
+        # images above the cap (512 MP unless set) fail to open; 0 lifts it for trusted gigapixel scans
+        if "max_image_megapixels" in self.settings:
+            try:
+                set_max_image_pixels(int(float(self.settings["max_image_megapixels"]) * 1_000_000))
+            except (TypeError, ValueError):
+                pass
+        PROFILE.mark("settings")
+
+        # vocabulary, translations, groups, folder and caption I/O (no Tk in there)
+        self.dataset = DatasetSession(
+            os.path.abspath(DEFAULT_TRIGGERS_FILE),
+            os.path.abspath(DEFAULT_TRANSLATIONS_FILE),
+            os.path.abspath(DEFAULT_GROUPS_FILE),
+            group_order=self.settings.get("group_order", []),
+            large_vocab=self.settings.get("large_vocab", "auto"),
+        )
+        PROFILE.mark("dataset")
 
-        self.group_order = self.settings.get("group_order", [])
-        if not isinstance(self.group_order, list):
-            self.group_order = []
+        self.sqlite_store_var = tk.BooleanVar(value=self.settings.get("caption_backend") == "sqlite")
 
-        if not isinstance(self.group_order, list):
-            self.group_order = []
+        # ===== external edits of triggers/translations/groups =====
+        self.file_watcher = FileWatcher()
+        self._watch_data_files()
 
-        self.triggers = load_triggers(self.triggers_path)
-        self.translations = load_translations(self.translations_path) or {}
-        self.groups = load_groups(self.groups_path)
+        # ===== deferred file writes =====
+        self.persist = PersistenceManager(
+            delay_ms=400,
+            schedule=self.after,
+            cancel=self.after_cancel,
+            on_error=lambda key, err: self.after(0, lambda: self._set_status(f"Failed to save {key}: {err}")),
+            on_written=self.file_watcher.remember
+        )
+        self.dataset.on_dirty = self.persist.mark_dirty
+        self.persist.register("triggers", self._snapshot_triggers, lambda write: write())
+        self.persist.register(
+            "groups",
+            lambda: (self.groups_path, {g: list(v) for g, v in self.groups.items()}),
+            lambda p: save_groups(*p)
+        )
+        self.persist.register(
+            "settings",
+            lambda: (self.settings_path, {k: (list(v) if isinstance(v, list) else v) for k, v in self.settings.items()}),
+            lambda p: save_settings(*p)
+        )
+        self.persist.register(
+            "translations",
+            lambda: (self.translation_store, self.translation_store.begin_compact()),
+            lambda p: p[0].finish_compact(p[1])
+        )
+        self.translation_store.on_compact_needed = lambda: self.persist.mark_dirty("translations")
+
+        # ===== session snapshot (restored before the folder scan) =====
+        self.session = SessionSnapshot(os.path.join(os.path.dirname(self.settings_path), "session.json"))
+        self._session_preview = None
+        self._session_restored_path = None
+        self._session_last = None
+        self.persist.register("session", self._snapshot_session, lambda p: self.session.save(*p))
 
         self.var_map = {}
         self.selected_set = set()
@@ -70,23 +171,28 @@ class App(tk.Tk):
         self.current_pil_image = None
         self.original_pil_image = None
         self.current_tk_image = None
+        # one PhotoImage for the fitted preview, refilled in place; workers hand over ready PPM bytes
+        self._preview_photo = None
+        self._preview_bg = (255, 255, 255)
 
         self._resize_after_id = None
+        self._refine_after_id = None
+        self._nav_settle_id = None
+        self._nav_last = 0.0
         self._load_job_id = 0
         self._loading_label_id = None
 
-        self.folder_images = []
-        self.folder_index = -1
-
         self._suppress_tree_select = False
-        self.deleted_triggers = set()
 
         # ===== folder/list UI state =====
-        self.current_folder = None
         self.image_tree = None
         self._imglist_check_icon = None
         self._imglist_iid_to_path = {}
         self._imglist_path_to_iid = {}
+        self._imglist_has_cap = {}
+        self._image_filter = None
+        self.caption_state = None
+        self._unknown_scan_cancel = None
 
         from theme_manager import ThemeManager
 
@@ -97,20 +203,286 @@ class App(tk.Tk):
 
         # ===== UI BUILD =====
         self._resize_job_id = 0
-        print("INIT resize_job_id =", self._resize_job_id)
+        shell.destroy()
         self._build_ui()
         self.image_tree.tag_configure("hascap", foreground="#BB9F00")
+        PROFILE.mark("build ui")
 
         self.theme_manager.apply(self.theme_var.get())
         self._apply_combobox_theme(self.theme_var.get())
+        PROFILE.mark("theme")
 
         self._render_trigger_list()
+        PROFILE.mark("trigger panel")
+        self._restore_session()
+        PROFILE.mark("session restore")
         self.after(0, self._open_last_folder_on_start)
+        self.after(self.SESSION_SAVE_MS, self._session_tick)
+        self.after(self.WATCH_INTERVAL_MS, self._poll_watched_files)
 
         self.theme_var.trace_add("write", lambda *_: self._save_settings())
         self._used_triggers_windows = []
         self._themed_dialogs = []
 
+        # ===== metrics HUD: F3 toggles the overlay, Ctrl+F3 exports JSON =====
+        self._hud_visible = False
+        self._hud_after_id = None
+        self.bind_all("<F3>", lambda _e: self.toggle_metrics_hud())
+        self.bind_all("<Control-F3>", lambda _e: self.export_metrics())
+
+        # ===== main-loop watchdog: F4 opens the diagnostics window, slow beats go to ui_lag.log =====
+        self.loop_monitor = LoopMonitor(
+            self,
+            threshold_ms=int(self.settings.get("ui_lag_threshold_ms", self.LAG_THRESHOLD_MS)),
+            log_path=os.path.join(os.path.dirname(self.settings_path), "ui_lag.log"),
+            on_lag=lambda s: METRICS.observe("ui.lag", s),
+        )
+        self.loop_monitor.install()
+        self._loop_diag_win = None
+        self.bind_all("<F4>", lambda _e: self.open_loop_diagnostics())
+
+        self._ready = True
+        self.after_idle(self._on_first_paint)
+
+    def _on_first_paint(self):
+        PROFILE.mark("first full paint")
+        # Pillow is only needed for the first image, import it off the UI thread meanwhile
+        preload_pil()
+        if PROFILE.enabled:
+            PROFILE.print_report(os.path.join(os.path.dirname(self.settings_path), "startup_profile.txt"))
+
+    def _on_close(self):
+        if not self._ready:
+            self.destroy()
+            return
+        try:
+            self.loop_monitor.uninstall()
+        except Exception:
+            pass
+        try:
+            self.persist.mark_dirty("session")
+        except Exception:
+            pass
+        try:
+            self.persist.close()
+        except Exception:
+            pass
+        try:
+            self.dataset.close()
+        except Exception:
+            pass
+        self.destroy()
+
+    def _load_trigger_vocabulary(self) -> list[str]:
+        self.dataset.large_vocab = self.settings.get("large_vocab", "auto")
+        return self.dataset.load_vocabulary()
+
+    def _snapshot_triggers(self):
+        return self.dataset.snapshot_triggers()
+
+    def _promote_vocab_tokens(self, tokens):
+        self.dataset.promote(tokens)
+
+    def _trigger_suggestions(self, prefix: str, limit: int) -> list[str]:
+        return self.dataset.suggestions(prefix, limit)
+
+    def _ask_trigger_name(self, title: str, prompt: str) -> str | None:
+        win = tk.Toplevel(self)
+        win.title(title)
+        win.geometry("420x360")
+        win.transient(self)
+        win.grab_set()
+
+        frm = ttk.Frame(win, padding=10)
+        frm.pack(fill="both", expand=True)
+
+        ttk.Label(frm, text=prompt).pack(anchor="w")
+        var = tk.StringVar(value="")
+        entry = ttk.Entry(frm, textvariable=var)
+        entry.pack(fill="x", pady=(6, 6))
+
+        lb = tk.Listbox(frm, height=12, activestyle="none")
+        self._apply_listbox_theme(lb, self.theme_var.get())
+        lb.pack(fill="both", expand=True)
+
+        result = [None]
+
+        def _refresh(_e=None):
+            lb.delete(0, "end")
+            for t in self._trigger_suggestions(var.get(), self.AUTOCOMPLETE_LIMIT):
+                lb.insert("end", t)
+
+        def _pick(_e=None):
+            sel = lb.curselection()
+            if sel:
+                var.set(lb.get(sel[0]))
+                entry.icursor("end")
+                entry.focus_set()
+                _refresh()
+
+        def _ok(_e=None):
+            result[0] = var.get()
+            win.destroy()
+
+        def _down(_e=None):
+            if lb.size():
+                lb.focus_set()
+                lb.selection_clear(0, "end")
+                lb.selection_set(0)
+                lb.activate(0)
+            return "break"
+
+        entry.bind("<KeyRelease>", lambda e: None if e.keysym in ("Down", "Return", "Escape") else _refresh())
+        entry.bind("<Down>", _down)
+        entry.bind("<Return>", _ok)
+        lb.bind("<Double-Button-1>", _pick)
+        lb.bind("<Return>", _pick)
+        win.bind("<Escape>", lambda _e: win.destroy())
+
+        btns = ttk.Frame(frm)
+        btns.pack(fill="x", pady=(8, 0))
+        ttk.Button(btns, text="Cancel", command=win.destroy).pack(side="right")
+        ttk.Button(btns, text="OK", command=_ok).pack(side="right", padx=(0, 8))
+
+        entry.focus_set()
+        self.wait_window(win)
+        return result[0]
+
+    def _watch_data_files(self):
+        self.file_watcher.watch("triggers", self.triggers_path)
+        self.file_watcher.watch("translations", self.translations_path)
+        self.file_watcher.watch("groups", self.groups_path)
+
+    def _poll_watched_files(self):
+        try:
+            # our own pending writes are not external edits
+            pending = {k for k in ("triggers", "translations", "groups") if self.persist.is_pending(k)}
+            for key in self.file_watcher.changed(skip=pending):
+                if key == "triggers":
+                    self._on_triggers_file_changed()
+                elif key == "translations":
+                    self._on_translations_file_changed()
+                elif key == "groups":
+                    self._on_groups_file_changed()
+        except Exception as e:
+            self._set_status(f"Reload failed: {e}")
+        finally:
+            self.after(self.WATCH_INTERVAL_MS, self._poll_watched_files)
+
+    def _on_triggers_file_changed(self):
+        if self.vocab is not None or wants_large_vocab(self.triggers_path, self.dataset.large_vocab):
+            old = list(self.triggers)
+            self.triggers = self._load_trigger_vocabulary()
+            self._promote_vocab_tokens(old)
+            self._render_trigger_list()
+            self._set_status(f"triggers.txt changed: {len(self.vocab or self.triggers)} triggers")
+            return
+
+        new = load_triggers(self.triggers_path)
+        old_set = set(self.triggers)
+        new_set = set(new)
+        added = new_set - old_set
+        removed = old_set - new_set
+        self.triggers = new
+        if not added and not removed:
+            return
+
+        removed -= set(self._temp_caption_triggers)
+        self.selected_set -= removed
+
+        self._refresh_triggers_view(added | removed)
+        self._set_status(f"triggers.txt changed: +{len(added)} / -{len(removed)}")
+
+    def _on_translations_file_changed(self):
+        old = dict(self.translations)
+        self.translation_store.load()
+        changed = {k for k in old.keys() | self.translations.keys() if old.get(k) != self.translations.get(k)}
+        if not changed:
+            return
+        self._refresh_triggers_view(changed)
+        self._set_status(f"translations.txt changed: {len(changed)} entries")
+
+    def _on_groups_file_changed(self):
+        new = load_groups(self.groups_path)
+        if self._temp_caption_group_name:
+            new[self._temp_caption_group_name] = list(self._temp_caption_triggers)
+
+        old = self.groups
+        changed_groups = {g for g in old.keys() | new.keys() if old.get(g) != new.get(g)}
+        self.groups = new
+        if not changed_groups:
+            return
+
+        if set(old) != set(new):
+            self.group_combo["values"] = self._group_values()
+            if self.current_group.get() not in self.group_combo["values"]:
+                self.current_group.set("All")
+                changed_groups.add("All")
+
+        # in "All" group membership does not change what is shown
+        if self.current_group.get() in changed_groups:
+            self._render_trigger_list()
+        self._set_status(f"trigger_groups.txt changed: {len(changed_groups)} groups")
+
+    def _trigger_matches_view(self, t: str) -> bool:
+        grp = self.current_group.get() or "All"
+        if grp != "All" and t not in self.groups.get(grp, []):
+            return False
+        flt = self.filter_var.get().strip().lower()
+        if flt and flt not in t.lower() and flt not in self._display_text_for_trigger(t).lower():
+            return False
+        return True
+
+    def _refresh_triggers_view(self, changed: set[str]):
+        if any(self._trigger_matches_view(t) for t in changed):
+            self._render_trigger_list()
+        else:
+            self._update_trigger_count_label()
+
+    def _update_trigger_count_label(self):
+        lbl = getattr(self, "_trigger_count_label", None)
+        if lbl is None or not lbl.winfo_exists():
+            return
+        lbl.configure(text=f"Shown: {self._trigger_shown_count} / Total: {len(self._get_all_triggers_for_ui())}")
+
+    def _caption_backend(self) -> str:
+        return "sqlite" if self.sqlite_store_var.get() else "sidecar"
+
+    def _close_caption_store(self):
+        self.dataset.close_caption_store()
+
+    def _on_caption_backend_toggle(self):
+        self.settings["caption_backend"] = self._caption_backend()
+        self._save_settings()
+        if not self.current_folder:
+            return
+        try:
+            self._close_caption_store()
+        except Exception as e:
+            messagebox.showerror("Caption store", f"Failed to write .caption files:\n{e}")
+        self._set_status("Reopening folder...")
+        threading.Thread(target=self._scan_folder_worker, args=(self.current_folder,), daemon=True).start()
+
+    def sync_caption_store(self):
+        store = self.caption_store
+        if store.backend != "sqlite":
+            messagebox.showinfo("Sync", "Captions are stored as .caption files already.")
+            return
+
+        self._set_status("Syncing .caption files...")
+
+        def _worker():
+            try:
+                res = store.sync()
+            except Exception as e:
+                msg = f"Sync failed:\n{e}"
+                self.after(0, messagebox.showerror, "Sync", msg)
+                return
+            msg = f"Synced: {res['ingested']} read from .caption, {res['materialized']} written"
+            self.after(0, lambda: self._set_status(msg))
+
+        threading.Thread(target=_worker, daemon=True).start()
+
     def _open_last_folder_on_start(self):
         folder = (self.settings or {}).get("last_folder")
         if not folder:
@@ -139,33 +511,15 @@ class App(tk.Tk):
             if "last_folder" in self.settings:
                 self.settings.pop("last_folder", None)
 
-        save_settings(self.settings_path, self.settings)
+        self.persist.mark_dirty("settings")
 
     def _trigger_to_group(self, t: str) -> str | None:
-        for gname, items in self.groups.items():
-            if t in items:
-                return gname
-        return None
+        return self.dataset.group_of(t)
 
     def _ordered_selected_triggers_for_caption(self) -> list[str]:
-        trig_to_group = {}
-        for gname, arr in (self.groups or {}).items():
-            for tr in arr:
-                trig_to_group[tr] = gname
-
-        order = self.group_order or []
-        pr = {g: i for i, g in enumerate(order)}
-        unknown_pr = 10_000
-
         #selected = [t for t in self.triggers if t in self.selected_set]
         selected = [t for t in self._get_all_triggers_for_ui() if t in self.selected_set]
-
-        selected.sort(key=lambda t: (
-            pr.get(trig_to_group.get(t, ""), unknown_pr),
-            (trig_to_group.get(t, "") or "").lower(),
-            t.lower()
-        ))
-        return selected
+        return self.dataset.order_tokens(selected)
 
     def _group_cycle_list(self) -> list[str]:
         vals = self._group_values()
@@ -234,28 +588,14 @@ class App(tk.Tk):
     def _apply_temp_caption_group_for_image(self, image_path: str):
         self._clear_temp_caption_group()
 
-        cap_path = os.path.splitext(image_path)[0] + ".caption"
-        if not os.path.exists(cap_path):
-            return
-
         try:
-            with open(cap_path, "r", encoding="utf-8") as f:
-                text = f.read()
+            tokens = self.dataset.read_caption(image_path)
         except Exception:
             return
+        if tokens is None:
+            return
 
-        tokens = parse_caption_tokens(text)
-        trigger_set = set(self.triggers)
-
-        unknown = []
-        for t in tokens:
-            if t in trigger_set:
-                continue
-            if hasattr(self, "deleted_triggers") and t in self.deleted_triggers:
-                continue
-            if t not in unknown:
-                unknown.append(t)
-
+        _known, unknown = self.dataset.split_caption(tokens)
         if not unknown:
             return
 
@@ -330,9 +670,19 @@ class App(tk.Tk):
         if self.original_pil_image is None:
             return
 
-        self._resize_after_id = self.after(120, self._resize_preview_async)
+        if hasattr(self, "tile_viewer"):
+            self.tile_viewer.on_resize()
+        self._resize_after_id = self.after(self.RESIZE_COARSE_MS, self._resize_preview_async)
+
+    def _on_viewer_zoom(self, zoom):
+        if self._canvas_img_id is not None:
+            self.image_canvas.itemconfigure(self._canvas_img_id, state="normal" if zoom is None else "hidden")
+        if zoom is None:
+            self._set_status("Zoom: fit")
+        else:
+            self._set_status(f"Zoom: {zoom * 100:.0f}%  (drag to pan, double-click or z to fit)")
 
-    def _resize_preview_worker(self, job_id: int, cw: int, ch: int):
+    def _resize_preview_worker(self, job_id: int, cw: int, ch: int, fine: bool):
         try:
             img = self.original_pil_image
             w, h = img.size
@@ -342,20 +692,50 @@ class App(tk.Tk):
             scale = min(cw / w, ch / h)
             new_size = (max(1, int(w * scale)), max(1, int(h * scale)))
 
-            preview = img.resize(new_size, Image.Resampling.BILINEAR)
-
-            self.after(0, lambda: self._apply_resized_preview(job_id, preview))
+            Image = pil_image()
+            if fine:
+                with METRICS.timed("resize.fine"):
+                    preview = img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            else:
+                # smallest pyramid level that still covers the target, sampled without filtering
+                src = img
+                for lvl in list(self.tile_viewer.levels):
+                    if lvl.size[0] >= new_size[0] and lvl.size[1] >= new_size[1]:
+                        src = lvl
+                with METRICS.timed("resize.coarse"):
+                    preview = src.resize(new_size, Image.Resampling.NEAREST)
+
+            if job_id != self._resize_job_id:
+                return
+            payload = self._preview_payload(preview)
+            self.after(0, lambda: self._apply_resized_preview(job_id, preview, payload, fine))
         except Exception:
             return
 
-
-    def _apply_resized_preview(self, job_id: int, preview: Image.Image):
+    def _apply_resized_preview(self, job_id: int, preview: "Image.Image", payload: bytes, fine: bool):
         if job_id != self._resize_job_id:
             return
         if self.original_pil_image is None:
             return
 
-        self.current_tk_image = ImageTk.PhotoImage(preview)
+        self._show_preview(preview, payload, self.current_image_path)
+        if not fine:
+            self._schedule_preview_refine()
+
+    def _preview_payload(self, preview: "Image.Image") -> bytes:
+        # worker side: everything but the final copy into the Tk photo
+        with METRICS.timed("preview.ppm"):
+            return ppm_payload(preview, self._preview_bg)
+
+    def _show_preview(self, preview: "Image.Image", payload: bytes, path: str):
+        with METRICS.timed("photoimage"):
+            photo = self._preview_photo
+            if photo is not None and (photo.width(), photo.height()) == preview.size:
+                photo.configure(data=payload, format="PPM")
+            else:
+                photo = self._preview_photo = tk.PhotoImage(data=payload, format="PPM")
+        self.current_tk_image = photo
+        self._session_preview = (path, preview)
 
         if self._canvas_text_id is not None:
             self.image_canvas.delete(self._canvas_text_id)
@@ -366,13 +746,16 @@ class App(tk.Tk):
 
         if self._canvas_img_id is None:
             self._canvas_img_id = self.image_canvas.create_image(
-                cw // 2, ch // 2, image=self.current_tk_image, anchor="center"
+                cw // 2, ch // 2, image=photo, anchor="center"
             )
         else:
-            self.image_canvas.itemconfigure(self._canvas_img_id, image=self.current_tk_image)
+            if self.image_canvas.itemcget(self._canvas_img_id, "image") != str(photo):
+                self.image_canvas.itemconfigure(self._canvas_img_id, image=photo)
             self.image_canvas.coords(self._canvas_img_id, cw // 2, ch // 2)
+        if self.tile_viewer.active:
+            self.image_canvas.itemconfigure(self._canvas_img_id, state="hidden")
 
-    def _resize_preview_async(self):
+    def _resize_preview_async(self, fine: bool = False):
         self._resize_after_id = None
         if self.original_pil_image is None:
             return
@@ -385,33 +768,37 @@ class App(tk.Tk):
 
         t = threading.Thread(
             target=self._resize_preview_worker,
-            args=(job_id, cw, ch),
+            args=(job_id, cw, ch, fine),
             daemon=True
         )
         t.start()
 
+    # ===== progressive preview: the LANCZOS pass waits until navigation/resizing settles =====
+    def _cancel_preview_refine(self):
+        if self._refine_after_id is not None:
+            try:
+                self.after_cancel(self._refine_after_id)
+            except Exception:
+                pass
+            self._refine_after_id = None
+
+    def _schedule_preview_refine(self):
+        self._cancel_preview_refine()
+        self._refine_after_id = self.after(self.PREVIEW_REFINE_MS, self._refine_preview)
+
+    def _refine_preview(self):
+        self._refine_after_id = None
+        self._resize_preview_async(fine=True)
+
     def _apply_trigger_changes(self, win, trigger: str, new_translation: str, move_to_group: str):
         trigger = normalize_trigger(trigger)
         new_translation = (new_translation or "").strip()
         move_to_group = (move_to_group or "").strip()
 
-        if new_translation:
-            self.translations[trigger] = new_translation
-        else:
-            self.translations.pop(trigger, None)
-        save_translations(self.translations_path, self.translations)
+        self.dataset.set_translation(trigger, new_translation)
 
         if move_to_group:
-            for g in list(self.groups.keys()):
-                if trigger in self.groups[g]:
-                    self.groups[g] = [t for t in self.groups[g] if t != trigger]
-
-            if move_to_group not in self.groups:
-                self.groups[move_to_group] = []
-            if trigger not in self.groups[move_to_group]:
-                self.groups[move_to_group].append(trigger)
-
-            save_groups(self.groups_path, self.groups)
+            self.dataset.add_to_group(trigger, move_to_group, exclusive=True)
             self.group_combo["values"] = self._group_values()
 
         self._render_trigger_list()
@@ -426,20 +813,7 @@ class App(tk.Tk):
         if not messagebox.askyesno("Confirm delete", f"Delete trigger '{trigger}'?\n\nThis will remove it from:\n- triggers.txt\n- translations.txt\n- all groups\n- current selections"):
             return
 
-        self.triggers = [t for t in self.triggers if t != trigger]
-        save_triggers(self.triggers_path, self.triggers)
-
-        if trigger in self.translations:
-            self.translations.pop(trigger, None)
-            save_translations(self.translations_path, self.translations)
-
-        changed = False
-        for g in list(self.groups.keys()):
-            if trigger in self.groups[g]:
-                self.groups[g] = [t for t in self.groups[g] if t != trigger]
-                changed = True
-        if changed:
-            save_groups(self.groups_path, self.groups)
+        if self.dataset.delete_triggers([trigger]):
             self.group_combo["values"] = self._group_values()
 
         if hasattr(self, "selected_set"):
@@ -448,37 +822,28 @@ class App(tk.Tk):
         self._render_trigger_list()
         self._set_status(f"Deleted: {trigger}")
         win.destroy()
-        self.deleted_triggers.add(trigger)
         self.unknown_caption_tokens = [t for t in self.unknown_caption_tokens if t != trigger]
         self.loaded_caption_tokens = [t for t in self.loaded_caption_tokens if t != trigger]
 
     def _group_values(self):
-        names = sorted(self.groups.keys(), key=lambda s: s.lower())
-        return ["All"] + names
+        return ["All"] + self.dataset.group_names()
     
     def _scan_folder_worker(self, folder: str):
         items = []
         err = None
+        store = None
         try:
-            for entry in os.scandir(folder):
-                if not entry.is_file():
-                    continue
-                ext = os.path.splitext(entry.name)[1].lower()
-                if ext in IMAGE_EXTS:
-                    img_path = entry.path
-                    cap_path = os.path.splitext(img_path)[0] + ".caption"
-                    has_cap = os.path.exists(cap_path)
-                    items.append((img_path, has_cap))
-
-            items.sort(key=lambda x: os.path.basename(x[0]).lower())
+            with METRICS.timed("scan"):
+                items, store = self.dataset.scan(folder, self._caption_backend())
+            METRICS.gauge("folder.images", len(items))
         except Exception as e:
             err = str(e)
 
         count = len(items)
         self.after(0, lambda: self._set_status(f"Scan done: {count} images. Building list..."))
-        self.after(0, lambda: self._on_folder_scanned(items, err))
+        self.after(0, lambda: self._on_folder_scanned(items, err, store))
     
-    def _on_folder_scanned(self, items, err: str | None):
+    def _on_folder_scanned(self, items, err: str | None, store=None):
         try:
             self.open_folder_btn.configure(state="normal")
         except Exception:
@@ -490,17 +855,302 @@ class App(tk.Tk):
             self._set_status(f"Folder scan failed: {err}")
             return
 
-        self.folder_images = [p for (p, _has) in items]
-        self.folder_index = 0 if self.folder_images else -1
-
-        self._populate_image_tree_batched(items)
+        restored = self._session_restored_path
+        self._session_restored_path = None
+        same_list = bool(restored) and [p for (p, _h) in items] == self.folder_images
+
+        self.dataset.adopt(self.current_folder, items, store)
+
+        if same_list:
+            # the restored list is still current: only refresh the caption markers
+            pending = getattr(self, "_imglist_pending_items", None)
+            if pending:
+                # rows still waiting for their batch take the fresh marker when they are inserted
+                fresh = dict(items)
+                st = self.caption_state
+                for i, (p, has_cap) in enumerate(pending):
+                    if fresh.get(p, has_cap) != has_cap:
+                        pending[i] = (p, fresh[p])
+                        if st is not None:
+                            st.set(p, CAPTIONED, fresh[p])
+                self._update_caption_progress()
+            for (p, has_cap) in items:
+                if self._imglist_has_cap.get(p) != has_cap:
+                    self._refresh_image_tree_marker_for_path(p)
+        else:
+            self._populate_image_tree_batched(items)
+        self._start_unknown_scan()
 
         if not self.folder_images:
             self._set_status("No images found in folder")
             return
 
+        cur = self.current_image_path
+        if restored and cur in self.folder_images:
+            # keep the restored image (or whatever the user moved to since) instead of jumping to the first one
+            self.folder_index = self.folder_images.index(cur)
+            if cur == restored:
+                self._load_full_image_after_restore(cur)
+            return
+
         self.after(200, lambda: self._open_first_image_after_folder())
 
+    # ===== metrics HUD =====
+    def toggle_metrics_hud(self):
+        self._hud_visible = not self._hud_visible
+        if self._hud_visible:
+            self._draw_metrics_hud()
+            return
+        if self._hud_after_id is not None:
+            try:
+                self.after_cancel(self._hud_after_id)
+            except Exception:
+                pass
+            self._hud_after_id = None
+        self.image_canvas.delete("hud")
+
+    def _draw_metrics_hud(self):
+        self._hud_after_id = None
+        if not self._hud_visible:
+            return
+        c = self.image_canvas
+        c.delete("hud")
+        lines = METRICS.hud_lines() or ["no samples yet"]
+        text_id = c.create_text(
+            8, 8, anchor="nw", text="\n".join(lines), fill="#e6e6e6", font=("TkFixedFont", 9), tags=("hud",)
+        )
+        x0, y0, x1, y1 = c.bbox(text_id)
+        bg_id = c.create_rectangle(x0 - 4, y0 - 4, x1 + 4, y1 + 4, fill="#000000", outline="", tags=("hud",))
+        c.tag_lower(bg_id, text_id)
+        self._hud_after_id = self.after(self.HUD_REFRESH_MS, self._draw_metrics_hud)
+
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(
+            title="Export metrics",
+            defaultextension=".json",
+            initialfile="icaption_metrics.json",
+            filetypes=[("JSON", "*.json"), ("All", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            METRICS.export_json(path)
+        except Exception as e:
+            messagebox.showerror("Metrics", f"Export failed:\n{e}")
+            return
+        self._set_status(f"Metrics exported: {os.path.basename(path)}")
+
+    # ===== main-loop diagnostics =====
+    def open_loop_diagnostics(self):
+        if self._loop_diag_win is not None and self._loop_diag_win.winfo_exists():
+            self._loop_diag_win.lift()
+            return
+        mon = self.loop_monitor
+
+        win = tk.Toplevel(self)
+        win.title("UI lag diagnostics")
+        win.transient(self)
+        win.geometry("820x560")
+        self._loop_diag_win = win
+
+        top = ttk.Frame(win, padding=10)
+        top.pack(fill="x")
+        info_var = tk.StringVar()
+        ttk.Label(top, textvariable=info_var).pack(side="left", anchor="w")
+        btns = ttk.Frame(top)
+        btns.pack(side="right")
+
+        body = ttk.PanedWindow(win, orient="vertical")
+        body.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+
+        cols = ("calls", "max", "total")
+        tree = ttk.Treeview(body, columns=cols, height=12, style="ICap.Treeview")
+        tree.heading("#0", text="Callback")
+        tree.heading("calls", text="Slow calls")
+        tree.heading("max", text="Max ms")
+        tree.heading("total", text="Total ms")
+        tree.column("#0", width=460)
+        for c in cols:
+            tree.column(c, width=100, anchor="e")
+        body.add(tree, weight=3)
+
+        events = tk.Text(body, wrap="none", height=10)
+        body.add(events, weight=2)
+        # same text-pane theming as the Used Triggers window
+        win._used_triggers_text = events
+        self._used_triggers_windows.append(win)
+        self._apply_used_triggers_theme(win)
+
+        def _refresh():
+            info_var.set(
+                f"lag p50 {mon.lag_percentile(50):.1f} ms   p99 {mon.lag_percentile(99):.1f} ms   "
+                f"threshold {mon.threshold_ms} ms   {len(mon.events)} slow beat(s)"
+            )
+            tree.delete(*tree.get_children())
+            for name, calls, max_ms, total_ms in mon.worst(50):
+                tree.insert("", "end", text=name, values=(calls, f"{max_ms:.1f}", f"{total_ms:.1f}"))
+            events.delete("1.0", "end")
+            for ts, lag_ms, culprit, culprit_ms in reversed(mon.events):
+                stamp = time.strftime("%H:%M:%S", time.localtime(ts))
+                events.insert("end", f"{stamp}  lag {lag_ms:7.1f} ms  {culprit}  ({culprit_ms:.1f} ms)\n")
+
+        def _tick():
+            if not win.winfo_exists():
+                return
+            _refresh()
+            win.after(1000, _tick)
+
+        def _reset():
+            mon.reset()
+            _refresh()
+
+        def _on_destroy(e):
+            if e.widget is win:
+                self._loop_diag_win = None
+                if win in self._used_triggers_windows:
+                    self._used_triggers_windows.remove(win)
+
+        ttk.Button(btns, text="Reset", command=_reset).pack(side="left")
+        ttk.Button(btns, text="Close", command=win.destroy).pack(side="left", padx=(8, 0))
+        win.bind("<Destroy>", _on_destroy)
+        _tick()
+
+    # ===== session snapshot =====
+    def _session_state(self) -> dict:
+        top = 0.0
+        try:
+            top = float(self.image_tree.yview()[0])
+        except Exception:
+            pass
+        return {
+            "folder": self.current_folder,
+            "image": self.current_image_path,
+            "index": self.folder_index,
+            "list_top": top,
+            "group": self.current_group.get(),
+            "filter": self.filter_var.get(),
+            "count": len(self.folder_images),
+        }
+
+    def _snapshot_session(self):
+        state = self._session_state()
+        self._session_last = state
+
+        folder = self.current_folder or ""
+        n = len(folder) + 1
+        has_cap = self._imglist_has_cap
+        items = []
+        for p in self.folder_images:
+            items.append([p[n:] if folder and p.startswith(folder) else p, 1 if has_cap.get(p) else 0])
+
+        preview = None
+        pv = self._session_preview
+        if pv is not None and pv[0] == self.current_image_path:
+            preview = pv[1]
+        data = dict(state, items=items, preview_for=self.current_image_path if preview is not None else None)
+        return data, preview
+
+    def _session_tick(self):
+        try:
+            if self._session_state() != self._session_last:
+                self.persist.mark_dirty("session")
+        except Exception:
+            pass
+        self.after(self.SESSION_SAVE_MS, self._session_tick)
+
+    def _restore_session(self):
+        data = self.session.load()
+        if not data:
+            return
+        folder = data.get("folder")
+        if not folder or folder != (self.settings or {}).get("last_folder") or not os.path.isdir(folder):
+            return
+
+        self.current_folder = folder
+        # opening the SQLite store ingests changed sidecars: off the Tk thread, the caption follows
+        backend = self._caption_backend()
+        store_ready = backend == self.caption_store.backend
+
+        items = []
+        for entry in data.get("items") or []:
+            try:
+                rel, has_cap = entry
+            except (TypeError, ValueError):
+                continue
+            items.append((os.path.join(folder, rel), bool(has_cap)))
+        self.folder_images = [p for (p, _h) in items]
+        self.folder_index = data.get("index", -1) if self.folder_images else -1
+
+        if data.get("group") in self._group_values():
+            self.current_group.set(data["group"])
+        self.filter_var.set(data.get("filter") or "")
+
+        image = data.get("image")
+        if image and os.path.exists(image):
+            self.current_image_path = image
+            self._session_restored_path = image
+            if store_ready:
+                self._load_existing_caption_for_image()
+                self._apply_temp_caption_group_for_image(image)
+            else:
+                self.caption_info.set("caption: loading...")
+            self.image_info.set(os.path.basename(image))
+
+            if data.get("preview_for") == image:
+                try:
+                    self.update_idletasks()
+                    self.current_tk_image = self._preview_photo = tk.PhotoImage(file=self.session.preview_path)
+                    cw = self.image_canvas.winfo_width()
+                    ch = self.image_canvas.winfo_height()
+                    self._canvas_img_id = self.image_canvas.create_image(
+                        cw // 2, ch // 2, image=self.current_tk_image, anchor="center"
+                    )
+                except Exception:
+                    self.current_tk_image = None
+
+        # group and filter apply to the trigger panel whether or not the image is still there
+        self.group_combo["values"] = self._group_values()
+        self._render_trigger_list()
+
+        self._populate_image_tree_batched(items)
+        try:
+            # applied once the last batch is in, earlier the list is too short to scroll there
+            self._imglist_restore_top = float(data.get("list_top") or 0.0)
+        except (TypeError, ValueError):
+            pass
+
+        if not store_ready:
+            threading.Thread(target=self._open_restored_store_worker, args=(folder, backend, image), daemon=True).start()
+
+        self._session_last = self._session_state()
+        self._set_status(f"Restored session: {os.path.basename(image or folder)}")
+
+    def _open_restored_store_worker(self, folder: str, backend: str, image: str | None):
+        try:
+            store = open_caption_store(folder, backend)
+        except Exception:
+            return
+        self.after(0, lambda: self._on_restored_store_opened(store, backend, image))
+
+    def _on_restored_store_opened(self, store, backend: str, image: str | None):
+        if self.caption_store.backend == backend or self.current_folder != store.folder:
+            # the folder scan got there first (or another folder is open now)
+            store.close()
+            return
+        self.caption_store = store
+        if image and image == self.current_image_path:
+            self._load_existing_caption_for_image()
+            self._apply_temp_caption_group_for_image(image)
+            self.group_combo["values"] = self._group_values()
+            self._render_trigger_list()
+
+    def _load_full_image_after_restore(self, path: str):
+        # caption and trigger panel were restored already, only the real image is missing
+        self._load_job_id += 1
+        # the restored preview is already on screen, no coarse frame needed
+        t = threading.Thread(target=self._load_image_worker, args=(self._load_job_id, path, False), daemon=True)
+        t.start()
+
     def _open_first_image_after_folder(self):
         if not self.folder_images:
             return
@@ -525,9 +1175,14 @@ class App(tk.Tk):
         self.image_tree.delete(*self.image_tree.get_children())
         self._imglist_iid_to_path = {}
         self._imglist_path_to_iid = {}
+        self._imglist_has_cap = {}
+        self._set_image_filter_ui(None)
+        self.caption_state = CaptionState([p for (p, _h) in items], [h for (_p, h) in items])
+        self._update_caption_progress()
 
         self._imglist_pending_items = list(items)
         self._imglist_batch_size = int(batch)
+        self._imglist_restore_top = None
 
         self._set_status(f"Building list... 0 / {len(self._imglist_pending_items)}")
 
@@ -548,6 +1203,10 @@ class App(tk.Tk):
                     self.image_tree.see(iid)
                 finally:
                     self.after(0, lambda: setattr(self, "_suppress_tree_select", False))
+            top = getattr(self, "_imglist_restore_top", None)
+            if top is not None:
+                self._imglist_restore_top = None
+                self.image_tree.yview_moveto(top)
             return
 
         total = len(pending)
@@ -565,12 +1224,59 @@ class App(tk.Tk):
                 self.image_tree.item(iid, tags=("hascap",))
             self._imglist_iid_to_path[iid] = p
             self._imglist_path_to_iid[p] = iid
+            self._imglist_has_cap[p] = has_cap
 
         done = len(self._imglist_path_to_iid)
         self._set_status(f"Building list... {done} / {done + len(pending)}")
 
         self.after(1, self._populate_image_tree_batched_step)
 
+    # ===== image list filter =====
+    def set_image_filter(self, paths, label: str = ""):
+        """Show only these images in the list (None shows all); Next/Prev follow the filter."""
+        if not self.image_tree:
+            return
+        if getattr(self, "_imglist_pending_items", None):
+            self._set_status("Image list is still loading.")
+            return
+        flt = set(paths) if paths is not None else None
+        to_iid = self._imglist_path_to_iid
+        visible = [to_iid[p] for p in self.folder_images if p in to_iid and (flt is None or p in flt)]
+        # set_children detaches everything not listed and reattaches detached rows in one call
+        self.image_tree.set_children("", *visible)
+        self._set_image_filter_ui(flt, f"{label} ({len(visible)})" if flt is not None else "")
+
+        iid = to_iid.get(self.current_image_path) if self.current_image_path else None
+        if iid and (flt is None or self.current_image_path in flt):
+            self._suppress_tree_select = True
+            try:
+                self.image_tree.selection_set(iid)
+                self.image_tree.see(iid)
+            finally:
+                self.after(0, lambda: setattr(self, "_suppress_tree_select", False))
+
+    def _set_image_filter_ui(self, flt, text: str = ""):
+        self._image_filter = flt
+        if self.caption_state is not None:
+            self.caption_state.set_filter(flt)
+        if not hasattr(self, "image_list_label"):
+            return
+        if flt is None:
+            self.image_list_label.configure(text="Images")
+            self.image_filter_clear_btn.pack_forget()
+        else:
+            self.image_list_label.configure(text=f"Images: {text}")
+            self.image_filter_clear_btn.pack(side="right")
+
+    def _step_visible_index(self, step: int) -> int | None:
+        flt = self._image_filter
+        i = self.folder_index + step
+        while 0 <= i < len(self.folder_images):
+            if flt is None or self.folder_images[i] in flt:
+                return i
+            i += step
+        return None
+
     def open_used_triggers(self):
         if not getattr(self, "current_folder", None):
             messagebox.showinfo("Used Triggers", "Open a folder first.")
@@ -579,63 +1285,717 @@ class App(tk.Tk):
         win = tk.Toplevel(self)
         win.title("Used Triggers")
         win.transient(self)
-        win.geometry("720x640")
+        win.geometry("720x640")
+
+        top = ttk.Frame(win, padding=10)
+        top.pack(fill="x")
+
+        info_var = tk.StringVar(value=f"Scanning: {self.current_folder}")
+        ttk.Label(top, textvariable=info_var).pack(side="left", anchor="w")
+
+        btns = ttk.Frame(top)
+        btns.pack(side="right")
+
+        body = ttk.Frame(win, padding=(10, 0, 10, 10))
+        body.pack(fill="both", expand=True)
+
+        txt = tk.Text(body, wrap="none")
+        txt.pack(side="left", fill="both", expand=True)
+
+        ysb = ttk.Scrollbar(body, orient="vertical", command=txt.yview)
+        ysb.pack(side="right", fill="y")
+        txt.configure(yscrollcommand=ysb.set)
+
+        xsb = ttk.Scrollbar(win, orient="horizontal", command=txt.xview)
+        xsb.pack(side="bottom", fill="x")
+        txt.configure(xscrollcommand=xsb.set)
+
+        win._used_triggers_text = txt
+        win._used_triggers_info = info_var
+
+        self._used_triggers_windows.append(win)
+        win.bind("<Destroy>", lambda _e: self._used_triggers_windows.remove(win) if win in self._used_triggers_windows else None)
+
+        self._apply_used_triggers_theme(win)
+
+        def _save_as():
+            content = txt.get("1.0", "end-1c")
+            if not content.strip():
+                messagebox.showinfo("Save", "Nothing to save yet.")
+                return
+            path = filedialog.asksaveasfilename(
+                title="Save used triggers as...",
+                defaultextension=".txt",
+                filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+            )
+            if not path:
+                return
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+
+        ttk.Button(btns, text="Save as...", command=_save_as).pack(side="left")
+        ttk.Button(btns, text="Close", command=win.destroy).pack(side="left", padx=(8, 0))
+
+        t = threading.Thread(
+            target=self._used_triggers_worker,
+            args=(self.current_folder, win),
+            daemon=True
+        )
+        t.start()
+
+    # ===== aspect-ratio buckets =====
+    def open_bucket_analysis(self):
+        from aspect_buckets import make_buckets, parse_buckets, analyze, SDXL_RESOLUTION, BUCKET_STEP, CROP_THRESHOLD
+
+        if not getattr(self, "current_folder", None) or not self.folder_images:
+            messagebox.showinfo("Buckets", "Open a folder first.")
+            return
+
+        win = tk.Toplevel(self)
+        win.title("Aspect Buckets")
+        win.transient(self)
+        win.geometry("780x640")
+
+        form = ttk.Frame(win, padding=10)
+        form.pack(fill="x")
+
+        res_var = tk.StringVar(value=str(self.settings.get("bucket_resolution", SDXL_RESOLUTION)))
+        step_var = tk.StringVar(value=str(self.settings.get("bucket_step", BUCKET_STEP)))
+        crop_var = tk.StringVar(value=str(round(float(self.settings.get("bucket_crop_threshold", CROP_THRESHOLD)) * 100)))
+        custom_var = tk.StringVar(value=self.settings.get("aspect_buckets", ""))
+
+        ttk.Label(form, text="Resolution:").grid(row=0, column=0, sticky="w")
+        ttk.Entry(form, textvariable=res_var, width=7).grid(row=0, column=1, sticky="w", padx=(6, 12))
+        ttk.Label(form, text="Step:").grid(row=0, column=2, sticky="w")
+        ttk.Entry(form, textvariable=step_var, width=5).grid(row=0, column=3, sticky="w", padx=(6, 12))
+        ttk.Label(form, text="Heavy crop above %:").grid(row=0, column=4, sticky="w")
+        ttk.Entry(form, textvariable=crop_var, width=5).grid(row=0, column=5, sticky="w", padx=(6, 12))
+        ttk.Label(form, text="Buckets:").grid(row=1, column=0, sticky="w", pady=(6, 0))
+        ttk.Entry(form, textvariable=custom_var).grid(row=1, column=1, columnspan=5, sticky="we", padx=(6, 12), pady=(6, 0))
+        ttk.Label(form, text="WxH list, empty = generated from resolution/step").grid(row=2, column=1, columnspan=5, sticky="w", padx=(6, 0))
+        form.columnconfigure(5, weight=1)
+
+        info_var = tk.StringVar()
+        bar = ttk.Frame(win, padding=(10, 0, 10, 6))
+        bar.pack(fill="x")
+        ttk.Label(bar, textvariable=info_var).pack(side="left")
+        btns = ttk.Frame(bar)
+        btns.pack(side="right")
+
+        body = ttk.Frame(win, padding=(10, 0, 10, 10))
+        body.pack(fill="both", expand=True)
+        cols = ("aspect", "count", "hist", "cropped", "under")
+        tree = ttk.Treeview(body, columns=cols, height=18, selectmode="browse", style="ICap.Treeview")
+        tree.heading("#0", text="Bucket")
+        tree.heading("aspect", text="Aspect")
+        tree.heading("count", text="Images")
+        tree.heading("hist", text="")
+        tree.heading("cropped", text="Heavy crop")
+        tree.heading("under", text="Under-res")
+        tree.column("#0", width=110, stretch=False)
+        tree.column("aspect", width=60, stretch=False, anchor="e")
+        tree.column("count", width=70, stretch=False, anchor="e")
+        tree.column("hist", width=300, stretch=True)
+        tree.column("cropped", width=90, stretch=False, anchor="e")
+        tree.column("under", width=90, stretch=False, anchor="e")
+        ysb = ttk.Scrollbar(body, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=ysb.set)
+        tree.pack(side="left", fill="both", expand=True)
+        ysb.pack(side="right", fill="y")
+
+        state = {"cancel": None, "rows": {}}
+
+        def _show(res: dict, crop: float):
+            tree.delete(*tree.get_children())
+            rows = state["rows"] = {}
+            cropped = {p for (p, _c) in res["cropped"]}
+            under = {p for (p, _s) in res["under"]}
+            peak = max([len(v) for v in res["buckets"].values()] + [1])
+            for (bw, bh), paths in res["buckets"].items():
+                if not paths:
+                    continue
+                iid = f"{bw}x{bh}"
+                rows[iid] = (iid, paths)
+                tree.insert("", "end", iid=iid, text=iid, values=(
+                    f"{bw / bh:.2f}", len(paths), "█" * max(1, round(len(paths) / peak * 40)),
+                    sum(1 for p in paths if p in cropped), sum(1 for p in paths if p in under),
+                ))
+            for iid, text, paths in (
+                ("_cropped", f"Crop > {crop * 100:.0f}%", [p for (p, _c) in res["cropped"]]),
+                ("_under", "Under-resolution", [p for (p, _s) in res["under"]]),
+                ("_unreadable", "Unreadable", res["unreadable"]),
+            ):
+                if paths:
+                    rows[iid] = (text, paths)
+                    tree.insert("", "end", iid=iid, text=text, values=("", len(paths), "", "", ""))
+            used = sum(1 for v in res["buckets"].values() if v)
+            info_var.set(f"{res['images']} images in {used} of {len(res['buckets'])} buckets")
+
+        def _on_select(_e=None):
+            sel = tree.selection()
+            if sel and sel[0] in state["rows"]:
+                label, paths = state["rows"][sel[0]]
+                self.set_image_filter(paths, label)
+
+        def _run():
+            try:
+                resolution, step = int(res_var.get()), int(step_var.get())
+                crop = float(crop_var.get()) / 100.0
+                custom = custom_var.get().strip()
+                buckets = parse_buckets(custom) if custom else make_buckets(resolution, step)
+            except ValueError as e:
+                messagebox.showerror("Buckets", f"Invalid settings:\n{e}", parent=win)
+                return
+            self.settings.update({
+                "bucket_resolution": resolution,
+                "bucket_step": step,
+                "bucket_crop_threshold": crop,
+                "aspect_buckets": custom,
+            })
+            self._save_settings()
+
+            if state["cancel"] is not None:
+                state["cancel"].set()
+            cancel = state["cancel"] = threading.Event()
+            paths = list(self.folder_images)
+            info_var.set(f"Reading headers... 0 / {len(paths)}")
+            workers = min(32, (os.cpu_count() or 4) * 2)
+
+            def _progress(done, total):
+                self.after(0, lambda: info_var.set(f"Reading headers... {done} / {total}") if not cancel.is_set() else None)
+
+            def _worker():
+                try:
+                    res = analyze(paths, buckets, crop, workers=workers, progress=_progress, cancel=cancel)
+                except Exception as e:
+                    msg = f"Bucket analysis failed:\n{e}"
+                    self.after(0, messagebox.showerror, "Buckets", msg)
+                    return
+                if not res["cancelled"]:
+                    self.after(0, lambda: _show(res, crop) if win.winfo_exists() else None)
+
+            threading.Thread(target=_worker, daemon=True).start()
+
+        def _on_destroy(e):
+            if e.widget is win and state["cancel"] is not None:
+                state["cancel"].set()
+
+        tree.bind("<<TreeviewSelect>>", _on_select)
+        win.bind("<Destroy>", _on_destroy)
+        ttk.Button(btns, text="Analyze", command=_run).pack(side="left")
+        ttk.Button(btns, text="Show all", command=lambda: self.set_image_filter(None)).pack(side="left", padx=(8, 0))
+        ttk.Button(btns, text="Close", command=win.destroy).pack(side="left", padx=(8, 0))
+        _run()
+
+    # ===== duplicates =====
+    def open_duplicates_window(self):
+        from dedupe import HASH_KINDS, HASH_BITS, DEFAULT_RADIUS, compute_hashes, find_clusters
+
+        if not getattr(self, "current_folder", None) or not self.folder_images:
+            messagebox.showinfo("Duplicates", "Open a folder first.")
+            return
+
+        win = tk.Toplevel(self)
+        win.title("Duplicates")
+        win.transient(self)
+        win.geometry("720x620")
+
+        form = ttk.Frame(win, padding=10)
+        form.pack(fill="x")
+        kind_var = tk.StringVar(value=self.settings.get("dedupe_hash", "phash"))
+        radius_var = tk.StringVar(value=str(self.settings.get("dedupe_radius", DEFAULT_RADIUS)))
+        ttk.Label(form, text="Hash:").pack(side="left")
+        ttk.Combobox(form, textvariable=kind_var, state="readonly", values=HASH_KINDS, style="ICap.TCombobox", width=8).pack(
+            side="left", padx=(6, 12)
+        )
+        ttk.Label(form, text="Max distance (bits):").pack(side="left")
+        ttk.Entry(form, textvariable=radius_var, width=4).pack(side="left", padx=(6, 12))
+        btns = ttk.Frame(form)
+        btns.pack(side="right")
+
+        info_var = tk.StringVar()
+        ttk.Label(win, textvariable=info_var, padding=(10, 0, 10, 6)).pack(fill="x")
+
+        body = ttk.Frame(win, padding=(10, 0, 10, 10))
+        body.pack(fill="both", expand=True)
+        tree = ttk.Treeview(body, columns=("size", "bytes"), selectmode="browse", style="ICap.Treeview")
+        tree.heading("#0", text="Image")
+        tree.heading("size", text="Size")
+        tree.heading("bytes", text="KB")
+        tree.column("#0", width=420, stretch=True)
+        tree.column("size", width=110, stretch=False, anchor="e")
+        tree.column("bytes", width=80, stretch=False, anchor="e")
+        ysb = ttk.Scrollbar(body, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=ysb.set)
+        tree.pack(side="left", fill="both", expand=True)
+        ysb.pack(side="right", fill="y")
+
+        state = {"cancel": None, "clusters": [], "paths": {}}
+
+        def _show(clusters: list[list[str]], failed: int):
+            tree.delete(*tree.get_children())
+            state["clusters"] = clusters
+            state["paths"] = {}
+            for n, paths in enumerate(clusters):
+                parent = tree.insert("", "end", iid=f"c{n}", text=f"Group {n + 1}  ({len(paths)} images)", open=n < 50)
+                for m, p in enumerate(paths):
+                    iid = f"c{n}_{m}"
+                    size = read_image_size(p)
+                    try:
+                        kb = os.path.getsize(p) // 1024
+                    except OSError:
+                        kb = ""
+                    tree.insert(parent, "end", iid=iid, text=os.path.relpath(p, self.current_folder),
+                                values=(f"{size[0]}x{size[1]}" if size else "?", kb))
+                    state["paths"][iid] = p
+            dupes = sum(len(c) - 1 for c in clusters)
+            info_var.set(f"{len(clusters)} group(s), {dupes} redundant image(s)" + (f", {failed} unreadable" if failed else ""))
+
+        def _on_select(_e=None):
+            sel = tree.selection()
+            if not sel:
+                return
+            iid = sel[0]
+            if iid in state["paths"]:
+                path = state["paths"][iid]
+                if path in self.folder_images and path != self.current_image_path:
+                    self._maybe_autosave_before_nav()
+                    self.folder_index = self.folder_images.index(path)
+                    self._clear_selections_for_next_image()
+                    self.load_image(path)
+            else:
+                n = int(iid[1:])
+                self.set_image_filter(state["clusters"][n], f"group {n + 1}")
+
+        def _filter_all():
+            paths = [p for c in state["clusters"] for p in c]
+            if paths:
+                self.set_image_filter(paths, "duplicates")
+
+        def _run():
+            try:
+                radius = int(radius_var.get())
+            except ValueError:
+                messagebox.showerror("Duplicates", "Distance must be a number.", parent=win)
+                return
+            if not 0 <= radius < HASH_BITS:
+                messagebox.showerror("Duplicates", f"Distance must be between 0 and {HASH_BITS - 1} bits.", parent=win)
+                return
+            kind = kind_var.get()
+            self.settings["dedupe_hash"] = kind
+            self.settings["dedupe_radius"] = radius
+            self._save_settings()
+
+            if state["cancel"] is not None:
+                state["cancel"].set()
+            cancel = state["cancel"] = threading.Event()
+            folder = self.current_folder
+            paths = list(self.folder_images)
+            workers = max(1, os.cpu_count() or 1)
+            info_var.set(f"Hashing... 0 / {len(paths)}")
+
+            def _progress(done, total):
+                self.after(0, lambda: info_var.set(f"Hashing... {done} / {total}") if not cancel.is_set() else None)
+
+            def _worker():
+                try:
+                    hashes, failed = compute_hashes(folder, paths, workers=workers, progress=_progress, cancel=cancel)
+                    if cancel.is_set():
+                        return
+                    self.after(0, lambda: info_var.set("Searching for near duplicates...") if not cancel.is_set() else None)
+                    clusters = find_clusters(hashes, kind, radius, workers=workers)
+                except Exception as e:
+                    msg = f"Duplicate scan failed:\n{e}"
+                    self.after(0, messagebox.showerror, "Duplicates", msg)
+                    return
+                if not cancel.is_set():
+                    self.after(0, lambda: _show(clusters, len(failed)) if win.winfo_exists() else None)
+
+            threading.Thread(target=_worker, daemon=True).start()
+
+        def _on_destroy(e):
+            if e.widget is win and state["cancel"] is not None:
+                state["cancel"].set()
+
+        tree.bind("<<TreeviewSelect>>", _on_select)
+        win.bind("<Destroy>", _on_destroy)
+        ttk.Button(btns, text="Scan", command=_run).pack(side="left")
+        ttk.Button(btns, text="List all", command=_filter_all).pack(side="left", padx=(8, 0))
+        ttk.Button(btns, text="Show all", command=lambda: self.set_image_filter(None)).pack(side="left", padx=(8, 0))
+        ttk.Button(btns, text="Close", command=win.destroy).pack(side="left", padx=(8, 0))
+        _run()
+
+    def open_resize_dialog(self):
+        from resize_pipeline import CROP_POLICIES, OUTPUT_FORMATS
+
+        if not getattr(self, "current_folder", None) or not self.folder_images:
+            messagebox.showinfo("Resize", "Open a folder first.")
+            return
+
+        win = tk.Toplevel(self)
+        win.title("Resize to training buckets")
+        win.geometry("600x330")
+        win.transient(self)
+        win.grab_set()
+
+        frm = ttk.Frame(win, padding=10)
+        frm.pack(fill="both", expand=True)
+
+        st = self.settings
+        apart_var = tk.BooleanVar(value=bool(st.get("resize_out_dir")))
+        out_var = tk.StringVar(value=st.get("resize_out_dir", ""))
+        suffix_var = tk.StringVar(value=st.get("resize_suffix", "_train"))
+        crop_var = tk.StringVar(value=st.get("resize_crop", "center"))
+        fmt_var = tk.StringVar(value=st.get("resize_format", "png"))
+        quality_var = tk.StringVar(value=str(st.get("resize_quality", 95)))
+        upscale_var = tk.BooleanVar(value=bool(st.get("resize_upscale", False)))
+        force_var = tk.BooleanVar(value=False)
+
+        ttk.Radiobutton(frm, text="Output folder:", variable=apart_var, value=True).grid(row=0, column=0, sticky="w")
+        ttk.Entry(frm, textvariable=out_var).grid(row=0, column=1, sticky="ew", padx=(8, 0))
+
+        def _browse():
+            path = filedialog.askdirectory(title="Select output folder", parent=win)
+            if path:
+                out_var.set(path)
+                apart_var.set(True)
+
+        ttk.Button(frm, text="Browse...", command=_browse).grid(row=0, column=2, padx=(8, 0))
+        ttk.Radiobutton(frm, text="Next to originals, suffix:", variable=apart_var, value=False).grid(
+            row=1, column=0, sticky="w", pady=(8, 0)
+        )
+        ttk.Entry(frm, textvariable=suffix_var, width=12).grid(row=1, column=1, sticky="w", padx=(8, 0), pady=(8, 0))
+
+        ttk.Label(frm, text="Crop:").grid(row=2, column=0, sticky="w", pady=(10, 0))
+        ttk.Combobox(frm, textvariable=crop_var, state="readonly", values=CROP_POLICIES, style="ICap.TCombobox", width=10).grid(
+            row=2, column=1, sticky="w", padx=(8, 0), pady=(10, 0)
+        )
+        ttk.Label(frm, text="Format:").grid(row=3, column=0, sticky="w", pady=(8, 0))
+        ttk.Combobox(frm, textvariable=fmt_var, state="readonly", values=OUTPUT_FORMATS, style="ICap.TCombobox", width=10).grid(
+            row=3, column=1, sticky="w", padx=(8, 0), pady=(8, 0)
+        )
+        ttk.Label(frm, text="Quality (JPEG/WebP):").grid(row=4, column=0, sticky="w", pady=(8, 0))
+        ttk.Entry(frm, textvariable=quality_var, width=6).grid(row=4, column=1, sticky="w", padx=(8, 0), pady=(8, 0))
+        ttk.Checkbutton(frm, text="Upscale images smaller than their bucket", variable=upscale_var).grid(
+            row=5, column=1, sticky="w", padx=(8, 0), pady=(8, 0)
+        )
+        ttk.Checkbutton(frm, text="Rewrite up-to-date outputs", variable=force_var).grid(
+            row=6, column=1, sticky="w", padx=(8, 0)
+        )
+        ttk.Label(frm, text="Buckets are taken from the Buckets window settings.").grid(
+            row=7, column=1, sticky="w", padx=(8, 0), pady=(8, 0)
+        )
+        frm.columnconfigure(1, weight=1)
+
+        def _start():
+            out_dir = out_var.get().strip() if apart_var.get() else ""
+            suffix = suffix_var.get().strip()
+            try:
+                quality = int(quality_var.get())
+            except ValueError:
+                messagebox.showerror("Resize", "Quality must be a number.", parent=win)
+                return
+            if apart_var.get() and not out_dir:
+                messagebox.showerror("Resize", "Choose an output folder.", parent=win)
+                return
+            if not out_dir and not suffix:
+                messagebox.showerror("Resize", "A suffix is needed when writing next to the originals.", parent=win)
+                return
+            if out_dir and os.path.abspath(out_dir) == os.path.abspath(self.current_folder):
+                messagebox.showerror("Resize", "Output folder must differ from the dataset folder.", parent=win)
+                return
+            self.settings.update({
+                "resize_out_dir": out_dir,
+                "resize_suffix": suffix,
+                "resize_crop": crop_var.get(),
+                "resize_format": fmt_var.get(),
+                "resize_quality": quality,
+                "resize_upscale": upscale_var.get(),
+            })
+            self._save_settings()
+            force = force_var.get()
+            win.destroy()
+            self._run_resize(force)
+
+        btns = ttk.Frame(frm)
+        btns.grid(row=8, column=0, columnspan=3, sticky="e", pady=(14, 0))
+        ttk.Button(btns, text="Run", command=_start).pack(side="left")
+        ttk.Button(btns, text="Close", command=win.destroy).pack(side="left", padx=(8, 0))
+
+    def _run_resize(self, force: bool):
+        from aspect_buckets import make_buckets, parse_buckets, SDXL_RESOLUTION, BUCKET_STEP
+        from resize_pipeline import run_pipeline, throughput_lines
+
+        st = self.settings
+        try:
+            custom = (st.get("aspect_buckets") or "").strip()
+            buckets = parse_buckets(custom) if custom else make_buckets(
+                int(st.get("bucket_resolution", SDXL_RESOLUTION)), int(st.get("bucket_step", BUCKET_STEP))
+            )
+        except ValueError as e:
+            messagebox.showerror("Resize", f"Invalid bucket settings:\n{e}")
+            return
+
+        folder = self.current_folder
+        paths = list(self.folder_images)
+        store = self.caption_store
+        workers = max(1, os.cpu_count() or 1)
+        options = dict(
+            out_dir=st.get("resize_out_dir") or None,
+            suffix=st.get("resize_suffix", "_train"),
+            policy=st.get("resize_crop", "center"),
+            fmt=st.get("resize_format", "png"),
+            quality=int(st.get("resize_quality", 95)),
+            upscale=bool(st.get("resize_upscale", False)),
+            force=force,
+            workers=workers,
+        )
+
+        self._set_status(f"Resizing {len(paths)} images on {workers} processes...")
+
+        cancel = threading.Event()
+        win = tk.Toplevel(self)
+        win.title("Resizing")
+        win.geometry("380x110")
+        win.transient(self)
+        frm = ttk.Frame(win, padding=10)
+        frm.pack(fill="both", expand=True)
+        info_var = tk.StringVar(value=f"Starting {workers} processes...")
+        ttk.Label(frm, textvariable=info_var).pack(side="top", anchor="w")
+
+        def _cancel():
+            cancel.set()
+            info_var.set("Cancelling after the images in progress...")
+            cancel_btn.configure(state="disabled")
+
+        cancel_btn = ttk.Button(frm, text="Cancel", command=_cancel)
+        cancel_btn.pack(side="bottom", anchor="e")
+        win.protocol("WM_DELETE_WINDOW", _cancel)
+
+        def _close():
+            try:
+                win.destroy()
+            except Exception:
+                pass
+
+        def _progress(done, total):
+            def _show():
+                self._set_status(f"Resizing... {done} / {total}")
+                if not cancel.is_set():
+                    info_var.set(f"Resizing... {done} / {total}")
+            self.after(0, _show)
+
+        def _worker():
+            try:
+                # sidecars are copied along, so SQLite-backed captions must be on disk first
+                if hasattr(store, "materialize"):
+                    store.materialize()
+                res = run_pipeline(folder, paths, buckets, progress=_progress, cancel=cancel, **options)
+            except Exception as e:
+                msg = f"Resize failed:\n{e}"
+                self.after(0, _close)
+                self.after(0, messagebox.showerror, "Resize", msg)
+                self.after(0, lambda: self._set_status("Resize failed"))
+                return
+            self.after(0, _close)
+            if res["cancelled"]:
+                done = res["written"] + res["skipped"]
+                self.after(0, lambda: self._set_status(f"Resize cancelled after {done} images ({res['written']} written)"))
+                return
+            lines = [
+                f"{res['written']} written, {res['skipped']} up to date, {res['captions']} captions copied, "
+                f"{len(res['failed'])} failed in {res['elapsed_s']:.1f} s",
+                "",
+            ] + throughput_lines(res)
+            if res["failed"]:
+                lines += ["", "Failed:"] + [f"{os.path.basename(p)}: {err}" for p, err in res["failed"][:20]]
+            status = lines[0]
+            self.after(0, lambda: self._set_status(f"Resize done: {status}"))
+            self.after(0, messagebox.showinfo, "Resize", "\n".join(lines))
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+    def open_export_dialog(self):
+        from dataset_export import export_dataset
+
+        if not getattr(self, "current_folder", None):
+            messagebox.showinfo("Export", "Open a folder first.")
+            return
+
+        out_dir = filedialog.askdirectory(title="Select export folder for shards")
+        if not out_dir:
+            return
+        if os.path.abspath(out_dir) == os.path.abspath(self.current_folder):
+            messagebox.showerror("Export", "Export folder must differ from the dataset folder.")
+            return
+
+        shard_size = simpledialog.askinteger(
+            "Export",
+            "Images per shard:",
+            initialvalue=int(self.settings.get("export_shard_size", 1000) or 1000),
+            minvalue=1,
+            parent=self
+        )
+        if not shard_size:
+            return
+
+        self.settings["export_shard_size"] = shard_size
+        self._save_settings()
+
+        fmt = self.settings.get("export_format", "wds")
+        workers = max(1, min(8, os.cpu_count() or 1))
+        groups = {g: list(v) for g, v in self.groups.items() if g != self._temp_caption_group_name}
+        group_order = list(self.group_order or [])
+        folder = self.current_folder
+
+        self._set_status(f"Exporting to {out_dir}...")
+
+        def _progress(done, total):
+            if done == total or done % 200 == 0:
+                self.after(0, lambda: self._set_status(f"Exporting... {done} / {total}"))
+
+        store = self.caption_store
+
+        def _worker():
+            try:
+                if hasattr(store, "materialize"):
+                    store.materialize()
+                res = export_dataset(
+                    folder, out_dir, groups, group_order,
+                    shard_size=shard_size, fmt=fmt, workers=workers, progress=_progress
+                )
+            except Exception as e:
+                msg = f"Export failed:\n{e}"
+                self.after(0, messagebox.showerror, "Export", msg)
+                self.after(0, lambda: self._set_status("Export failed"))
+                return
+            msg = (f"Export done: {res['images']} images in {res['shards']} shards "
+                   f"({res['written']} written, {res['skipped']} up to date)")
+            self.after(0, lambda: self._set_status(msg))
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+    def open_import_dialog(self):
+        from dataset_import import IMPORT_SOURCES
+
+        if not getattr(self, "current_folder", None):
+            messagebox.showinfo("Import", "Open a folder first.")
+            return
+
+        win = tk.Toplevel(self)
+        win.title("Import captions")
+        win.geometry("560x230")
+        win.transient(self)
+        win.grab_set()
 
-        top = ttk.Frame(win, padding=10)
-        top.pack(fill="x")
+        frm = ttk.Frame(win, padding=10)
+        frm.pack(fill="both", expand=True)
 
-        info_var = tk.StringVar(value=f"Scanning: {self.current_folder}")
-        ttk.Label(top, textvariable=info_var).pack(side="left", anchor="w")
+        ttk.Label(frm, text="Source:").grid(row=0, column=0, sticky="w")
+        src_var = tk.StringVar(value="txt")
+        ttk.Combobox(frm, textvariable=src_var, state="readonly", values=IMPORT_SOURCES, style="ICap.TCombobox").grid(
+            row=0, column=1, sticky="ew", padx=(8, 0)
+        )
 
-        btns = ttk.Frame(top)
-        btns.pack(side="right")
+        ttk.Label(frm, text="Metadata file:").grid(row=1, column=0, sticky="w", pady=(10, 0))
+        meta_var = tk.StringVar(value="")
+        ttk.Entry(frm, textvariable=meta_var).grid(row=1, column=1, sticky="ew", padx=(8, 0), pady=(10, 0))
 
-        body = ttk.Frame(win, padding=(10, 0, 10, 10))
-        body.pack(fill="both", expand=True)
+        def _browse():
+            path = filedialog.askopenfilename(
+                title="Select metadata file",
+                filetypes=[("JSON Lines", "*.jsonl"), ("CSV", "*.csv"), ("All", "*.*")],
+                parent=win
+            )
+            if path:
+                meta_var.set(path)
+                ext = os.path.splitext(path)[1].lower().lstrip(".")
+                if ext in IMPORT_SOURCES:
+                    src_var.set(ext)
+
+        ttk.Button(frm, text="Browse...", command=_browse).grid(row=1, column=2, padx=(8, 0), pady=(10, 0))
+        ttk.Label(frm, text="(empty = metadata.<source> in the dataset folder)").grid(row=2, column=1, sticky="w", padx=(8, 0))
+
+        overwrite_var = tk.BooleanVar(value=False)
+        add_vocab_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(frm, text="Overwrite existing .caption files", variable=overwrite_var).grid(
+            row=3, column=1, sticky="w", padx=(8, 0), pady=(8, 0)
+        )
+        ttk.Checkbutton(frm, text="Add unseen tokens to triggers", variable=add_vocab_var).grid(
+            row=4, column=1, sticky="w", padx=(8, 0)
+        )
 
-        txt = tk.Text(body, wrap="none")
-        txt.pack(side="left", fill="both", expand=True)
+        frm.columnconfigure(1, weight=1)
 
-        ysb = ttk.Scrollbar(body, orient="vertical", command=txt.yview)
-        ysb.pack(side="right", fill="y")
-        txt.configure(yscrollcommand=ysb.set)
+        def _start():
+            src = src_var.get()
+            meta = meta_var.get().strip() or None
+            overwrite = overwrite_var.get()
+            add_vocab = add_vocab_var.get()
+            win.destroy()
+            self._run_import(src, meta, overwrite, add_vocab)
 
-        xsb = ttk.Scrollbar(win, orient="horizontal", command=txt.xview)
-        xsb.pack(side="bottom", fill="x")
-        txt.configure(xscrollcommand=xsb.set)
+        btns = ttk.Frame(frm)
+        btns.grid(row=5, column=0, columnspan=3, sticky="e", pady=(14, 0))
+        ttk.Button(btns, text="Import", command=_start).pack(side="left")
+        ttk.Button(btns, text="Close", command=win.destroy).pack(side="left", padx=(8, 0))
 
-        win._used_triggers_text = txt
-        win._used_triggers_info = info_var
+    def _run_import(self, source: str, metadata_path: str | None, overwrite: bool, add_vocab: bool):
+        from dataset_import import import_captions
 
-        self._used_triggers_windows.append(win)
-        win.bind("<Destroy>", lambda _e: self._used_triggers_windows.remove(win) if win in self._used_triggers_windows else None)
+        folder = self.current_folder
+        vocabulary = None
+        if add_vocab:
+            vocabulary = self.vocab if self.vocab is not None else set(self.triggers)
+        workers = max(1, min(8, os.cpu_count() or 1))
 
-        self._apply_used_triggers_theme(win)
+        self._set_status(f"Importing {source} captions...")
 
-        def _save_as():
-            content = txt.get("1.0", "end-1c")
-            if not content.strip():
-                messagebox.showinfo("Save", "Nothing to save yet.")
-                return
-            path = filedialog.asksaveasfilename(
-                title="Save used triggers as...",
-                defaultextension=".txt",
-                filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
-            )
-            if not path:
-                return
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(content)
+        def _progress(done, frac):
+            if frac is None:
+                self.after(0, lambda: self._set_status(f"Importing... {done} records"))
+            else:
+                self.after(0, lambda: self._set_status(f"Importing... {done} records ({frac:.0%})"))
 
-        ttk.Button(btns, text="Save as...", command=_save_as).pack(side="left")
-        ttk.Button(btns, text="Close", command=win.destroy).pack(side="left", padx=(8, 0))
+        store = self.caption_store
 
-        t = threading.Thread(
-            target=self._used_triggers_worker,
-            args=(self.current_folder, win),
-            daemon=True
+        def _worker():
+            try:
+                if hasattr(store, "materialize"):
+                    store.materialize()
+                res = import_captions(
+                    folder, source, metadata_path,
+                    overwrite=overwrite, vocabulary=vocabulary, workers=workers, progress=_progress
+                )
+                if hasattr(store, "ingest"):
+                    store.ingest()
+            except Exception as e:
+                msg = f"Import failed:\n{e}"
+                self.after(0, messagebox.showerror, "Import", msg)
+                self.after(0, lambda: self._set_status("Import failed"))
+                return
+            self.after(0, lambda: self._on_import_done(folder, res))
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+    def _on_import_done(self, folder: str, res: dict):
+        new_tokens = res.get("new_tokens") or []
+        if new_tokens:
+            existing = set(self.triggers)
+            self.triggers.extend(t for t in new_tokens if t not in existing)
+            if self.vocab is not None:
+                for t in new_tokens:
+                    self.vocab.add(t)
+            self.persist.mark_dirty("triggers")
+            self._render_trigger_list()
+
+        self._set_status(
+            f"Import done: {res['written']} written, {res['skipped']} kept, "
+            f"{res['missing']} missing images, {len(new_tokens)} new triggers"
         )
-        t.start()
+
+        if folder == self.current_folder:
+            threading.Thread(target=self._scan_folder_worker, args=(folder,), daemon=True).start()
 
     def _apply_used_triggers_theme(self, win: tk.Toplevel):
         if not win or not win.winfo_exists():
@@ -669,18 +2029,13 @@ class App(tk.Tk):
             relief="flat",
         )
 
-    def _apply_combobox_theme(self, theme_name: str):
-    
+    def _combobox_colors(self, theme_name: str) -> tuple[str, str, str, str]:
         if theme_name == "Dark":
-            cb_bg = "#202020"
-            cb_fg = "#e6e6e6"
-            sel_bg = "#3a3a3a"
-            sel_fg = "#ffffff"
-        else:
-            cb_bg = "#ffffff"
-            cb_fg = "#111111"
-            sel_bg = "#d9d9d9"
-            sel_fg = "#111111"
+            return "#202020", "#e6e6e6", "#3a3a3a", "#ffffff"
+        return "#ffffff", "#111111", "#d9d9d9", "#111111"
+
+    def _apply_combobox_style(self, theme_name: str):
+        cb_bg, cb_fg, _sel_bg, _sel_fg = self._combobox_colors(theme_name)
 
         style = ttk.Style(self)
 
@@ -698,6 +2053,9 @@ class App(tk.Tk):
             foreground=[("readonly", cb_fg), ("!readonly", cb_fg)],
         )
 
+    def _apply_combobox_theme(self, theme_name: str):
+        # the dropdown Listbox is a plain tk widget, the option database is not part of a ttk theme
+        cb_bg, cb_fg, sel_bg, sel_fg = self._combobox_colors(theme_name)
         self.option_add("*TCombobox*Listbox.background", cb_bg)
         self.option_add("*TCombobox*Listbox.foreground", cb_fg)
         self.option_add("*TCombobox*Listbox.selectBackground", sel_bg)
@@ -728,22 +2086,9 @@ class App(tk.Tk):
         )
 
     def _used_triggers_worker(self, folder: str, win: tk.Toplevel):
-        counter = Counter()
-        total_files = 0
         try:
-            for root, _, files in os.walk(folder):
-                for f in files:
-                    if f.lower().endswith(".caption"):
-                        total_files += 1
-                        p = os.path.join(root, f)
-                        try:
-                            with open(p, "r", encoding="utf-8") as fh:
-                                text = fh.read()
-                        except Exception:
-                            continue
-
-                        tokens = parse_caption_tokens(text)
-                        counter.update(tokens)
+            with METRICS.timed("used_triggers"):
+                counter, total_files = self.caption_store.token_counts(folder)
         except Exception as e:
             msg = f"Scan failed:\n{e}"
             self.after(0, messagebox.showerror, "Used Triggers", msg)
@@ -842,6 +2187,21 @@ class App(tk.Tk):
         ttk.Button(row2, text="Used Triggers", command=self.open_used_triggers).pack(side="left")
         ttk.Button(row2, text="Edit Groups", command=self.open_groups_editor).pack(side="left", padx=(8, 0))
         ttk.Button(row2, text="Order Groups", command=self.open_group_order_dialog).pack(side="left", padx=(8, 0))
+        ttk.Button(row2, text="Import...", command=self.open_import_dialog).pack(side="left", padx=(8, 0))
+        ttk.Button(row2, text="Export...", command=self.open_export_dialog).pack(side="left", padx=(8, 0))
+        ttk.Button(row2, text="Buckets", command=self.open_bucket_analysis).pack(side="left", padx=(8, 0))
+        ttk.Button(row2, text="Resize...", command=self.open_resize_dialog).pack(side="left", padx=(8, 0))
+        ttk.Button(row2, text="Duplicates", command=self.open_duplicates_window).pack(side="left", padx=(8, 0))
+
+        ttk.Separator(row2, orient="vertical").pack(side="left", fill="y", padx=12)
+
+        ttk.Checkbutton(
+            row2,
+            text="SQLite caption store",
+            variable=self.sqlite_store_var,
+            command=self._on_caption_backend_toggle
+        ).pack(side="left")
+        ttk.Button(row2, text="Sync .caption", command=self.sync_caption_store).pack(side="left", padx=(8, 0))
 
         ttk.Separator(row2, orient="vertical").pack(side="left", fill="y", padx=12)
 
@@ -876,9 +2236,8 @@ class App(tk.Tk):
         theme_cb.pack(side="left", padx=(6, 0))
 
         def _on_theme_change(_e=None):
+            # settings are saved by the theme_var trace
             self.theme_manager.apply(self.theme_var.get())
-            self.settings["theme"] = self.theme_var.get()
-            save_settings(self.settings_path, self.settings)
 
         theme_cb.bind("<<ComboboxSelected>>", _on_theme_change)
 
@@ -893,7 +2252,14 @@ class App(tk.Tk):
         img_list_panel.pack(side="left", fill="y")
         img_list_panel.pack_propagate(False)
 
-        ttk.Label(img_list_panel, text="Images").pack(side="top", anchor="w")
+        list_head = ttk.Frame(img_list_panel)
+        list_head.pack(side="top", fill="x")
+        self.image_list_label = ttk.Label(list_head, text="Images")
+        self.image_list_label.pack(side="left", anchor="w")
+        self.image_filter_clear_btn = ttk.Button(list_head, text="Show all", command=lambda: self.set_image_filter(None))
+
+        self.caption_progress = tk.StringVar(value="")
+        ttk.Label(img_list_panel, textvariable=self.caption_progress).pack(side="bottom", fill="x", pady=(4, 0))
 
         tree_wrap = ttk.Frame(img_list_panel)
         tree_wrap.pack(side="top", fill="both", expand=True, pady=(6, 0))
@@ -930,6 +2296,8 @@ class App(tk.Tk):
         self._canvas_text_id = self.image_canvas.create_text(
             10, 10, anchor="nw", text="No image loaded"
         )
+        # wheel zooms into the full-resolution image, drag pans, double-click fits again
+        self.tile_viewer = TileViewer(self.image_canvas, on_zoom=self._on_viewer_zoom)
 
         self.image_info = tk.StringVar(value="")
         ttk.Label(left, textvariable=self.image_info).pack(side="top", fill="x", pady=(8, 0))
@@ -1060,22 +2428,12 @@ class App(tk.Tk):
         if not name:
             return
 
-        if not hasattr(self, "groups") or self.groups is None:
-            self.groups = {}
-
-        if name in self.groups:
-            messagebox.showerror("Add group", f"Group '{name}' already exists.")
+        try:
+            self.dataset.add_group(name)
+        except ValueError as e:
+            messagebox.showerror("Add group", str(e))
             return
 
-        self.groups[name] = []
-
-        if isinstance(getattr(self, "group_order", None), list):
-            if name not in self.group_order:
-                self.group_order.append(name)
-        else:
-            self.group_order = [name]
-
-        save_groups(self.groups_path, self.groups)
         self._save_settings()
 
         # UI
@@ -1088,27 +2446,19 @@ class App(tk.Tk):
         new = (new or "").strip()
         if not old or not new:
             return
-        if old not in self.groups:
+        if old not in self.groups or old == new:
             return
-        if new in self.groups and new != old:
-            messagebox.showerror("Rename group", f"Group '{new}' already exists.")
-            return
-
-        if old == new:
+        try:
+            self.dataset.rename_group(old, new)
+        except ValueError as e:
+            messagebox.showerror("Rename group", str(e))
             return
 
-        self.groups[new] = list(self.groups.get(old, []))
-        self.groups.pop(old, None)
-
-        if isinstance(self.group_order, list):
-            self.group_order = [new if g == old else g for g in self.group_order]
-
         self.group_combo["values"] = self._group_values()
 
         if self.current_group.get() == old:
             self.current_group.set(new)
 
-        save_groups(self.groups_path, self.groups)
         self._save_settings()
         self._render_trigger_list()
         self._set_status(f"Renamed group: {old} → {new}")
@@ -1124,15 +2474,11 @@ class App(tk.Tk):
         ):
             return
 
-        self.groups.pop(gname, None)
-
-        if isinstance(self.group_order, list):
-            self.group_order = [g for g in self.group_order if g != gname]
+        self.dataset.delete_group(gname)
 
         if self.current_group.get() == gname:
             self.current_group.set("All")
 
-        save_groups(self.groups_path, self.groups)
         self._save_settings()
 
         self.group_combo["values"] = self._group_values()
@@ -1156,34 +2502,13 @@ class App(tk.Tk):
         ):
             return
 
-        self.deleted_triggers.update(trig_list)
+        self.dataset.delete_group(gname, with_triggers=True)
 
         trig_set = set(trig_list)
         self.unknown_caption_tokens = [t for t in self.unknown_caption_tokens if t not in trig_set]
         self.loaded_caption_tokens = [t for t in self.loaded_caption_tokens if t not in trig_set]
-        self.triggers = [t for t in self.triggers if t not in trig_set]
-        save_triggers(self.triggers_path, self.triggers)
-
-        changed_trans = False
-        for t in trig_list:
-            if t in self.translations:
-                self.translations.pop(t, None)
-                changed_trans = True
-        if changed_trans:
-            save_translations(self.translations_path, self.translations)
-
-        for g in list(self.groups.keys()):
-            self.groups[g] = [t for t in self.groups[g] if t not in trig_set]
-        self.groups.pop(gname, None)
+        self.selected_set -= trig_set
 
-        save_groups(self.groups_path, self.groups)
-
-        if hasattr(self, "selected_set"):
-            for t in trig_list:
-                self.selected_set.discard(t)
-
-        if isinstance(self.group_order, list):
-            self.group_order = [g for g in self.group_order if g != gname]
         if self.current_group.get() == gname:
             self.current_group.set("All")
 
@@ -1266,30 +2591,8 @@ class App(tk.Tk):
         ttk.Button(bottom, text="Cancel", command=win.destroy).pack(side="right")
         ttk.Button(bottom, text="Save", command=_save).pack(side="right", padx=(0, 8))
 
-    def on_theme_applied(self, name: str):
-        if name == "Dark":
-            bg = "#1e1e1e"
-            fg = "#e6e6e6" 
-            panel_bg = "#202020"
-        else:
-            bg = "#f3f3f3"
-            fg = "#111111"
-            panel_bg = "#ffffff"
-
-        self.configure(bg=bg)
-
-        if hasattr(self, "image_canvas"):
-            self.image_canvas.configure(bg=panel_bg, highlightthickness=0)
-
-        if hasattr(self, "scroll") and hasattr(self.scroll, "canvas"):
-            self.scroll.canvas.configure(bg=panel_bg, highlightthickness=0)
-
-        if hasattr(self, "right_panel"):
-            try:
-                self.right_panel.configure(style="TFrame")
-            except Exception:
-                pass
-
+    def on_theme_compiled(self, name: str):
+        # ttk styles owned by the app: configured once per theme while ThemeManager compiles it
         # ===== Image list (Treeview) theme =====
         try:
             style = ttk.Style(self)
@@ -1379,6 +2682,68 @@ class App(tk.Tk):
         except Exception:
             pass
 
+        # ===== Trigger rows: colors live in the theme, so switching needs no per-row work =====
+        try:
+            style = ttk.Style(self)
+            if name == "Dark":
+                row_bg = "#202020"
+                row_fg = "#e6e6e6"
+                select_bg = "#b02020"
+            else:
+                row_bg = "#ffffff"
+                row_fg = "#111111"
+                select_bg = "#0a7a2a"
+
+            style.configure(
+                "ICap.Row.Toolbutton",
+                background=row_bg,
+                foreground=row_fg,
+                anchor="w",
+                padding=(8, 4),
+                borderwidth=0,
+                relief="flat",
+            )
+            style.map(
+                "ICap.Row.Toolbutton",
+                background=[("selected", select_bg), ("active", row_bg)],
+                foreground=[("active", row_fg)],
+                relief=[("selected", "flat"), ("pressed", "flat")],
+            )
+        except Exception:
+            pass
+
+        # ===== Combobox field =====
+        try:
+            self._apply_combobox_style(name)
+        except Exception:
+            pass
+
+    def on_theme_applied(self, name: str):
+        if name == "Dark":
+            bg = "#1e1e1e"
+            fg = "#e6e6e6" 
+            panel_bg = "#202020"
+        else:
+            bg = "#f3f3f3"
+            fg = "#111111"
+            panel_bg = "#ffffff"
+
+        self.configure(bg=bg)
+
+        if hasattr(self, "image_canvas"):
+            self.image_canvas.configure(bg=panel_bg, highlightthickness=0)
+            # transparent previews are flattened onto the canvas color in the workers
+            self._preview_bg = tuple(c >> 8 for c in self.winfo_rgb(panel_bg))
+
+        if hasattr(self, "scroll") and hasattr(self.scroll, "canvas"):
+            self.scroll.canvas.configure(bg=panel_bg, highlightthickness=0)
+
+        if hasattr(self, "right_panel"):
+            try:
+                self.right_panel.configure(style="TFrame")
+            except Exception:
+                pass
+
         # ===== Used Triggers windows (tk.Text) theme =====
         for w in list(getattr(self, "_used_triggers_windows", [])):
             try:
@@ -1423,6 +2788,16 @@ class App(tk.Tk):
             if self._hotkeys_allowed():
                 self.clean()
 
+        def hk_zoom(_e=None):
+            if self._hotkeys_allowed():
+                self.tile_viewer.toggle_actual_size()
+
+        def hk_jump(flag: str, step: int, want: bool):
+            def _h(_e=None):
+                if self._hotkeys_allowed():
+                    self.jump_to_state(flag, step, want)
+            return _h
+
 
         self.bind_all("<Left>", hk_prev)
         self.bind_all("<Right>", hk_next)
@@ -1432,6 +2807,14 @@ class App(tk.Tk):
         self.bind_all("d", hk_next)
         self.bind_all("s", hk_save)
         self.bind_all("c", hk_clean)
+        self.bind_all("z", hk_zoom)
+        # next / previous (shift) uncaptioned, with unknown tokens, modified this session
+        self.bind_all("n", hk_jump(CAPTIONED, 1, False))
+        self.bind_all("N", hk_jump(CAPTIONED, -1, False))
+        self.bind_all("u", hk_jump(UNKNOWN, 1, True))
+        self.bind_all("U", hk_jump(UNKNOWN, -1, True))
+        self.bind_all("m", hk_jump(MODIFIED, 1, True))
+        self.bind_all("M", hk_jump(MODIFIED, -1, True))
 
 
     def _set_status(self, msg: str):
@@ -1444,6 +2827,7 @@ class App(tk.Tk):
         )
         if not path:
             return
+        self.persist.flush()
         self.triggers_path = path
         self.reload_triggers()
 
@@ -1454,22 +2838,33 @@ class App(tk.Tk):
         )
         if not path:
             return
+        self.persist.flush()
+        try:
+            self.translation_store.close()
+        except Exception:
+            pass
         self.translations_path = path
-        self.translations = load_translations(self.translations_path) or {}
+        self.translation_store = TranslationStore(self.translations_path)
+        self.translation_store.on_compact_needed = lambda: self.persist.mark_dirty("translations")
+        self._watch_data_files()
         self._render_trigger_list()
         self._set_status(f"Translations loaded: {os.path.basename(self.translations_path)}")
 
     def reload_triggers(self):
-        self.triggers = load_triggers(self.triggers_path)
-        self.selected_set = {t for t in self.selected_set if t in set(self.triggers)}
-        self.translations = load_translations(self.translations_path) or {}
+        self.persist.flush()
+        self.translation_store.load()
         self.groups = load_groups(self.groups_path)
+        self.triggers = self._load_trigger_vocabulary()
+        self._promote_vocab_tokens(self.selected_set)
+        self.selected_set = {t for t in self.selected_set if t in set(self.triggers)}
         self.group_combo["values"] = self._group_values()
         if self.current_group.get() not in self.group_combo["values"]:
             self.current_group.set("All")
         self._render_trigger_list()
         if self.loaded_caption_tokens:
             self._apply_caption_to_checkboxes()
+        self._watch_data_files()
+        self._start_unknown_scan()
         self._set_status(f"Triggers loaded: {len(self.triggers)} items")
 
     def open_folder(self):
@@ -1568,10 +2963,79 @@ class App(tk.Tk):
 
         self.load_image(path)
 
+    # ===== caption state: jumps and progress =====
+    JUMP_NAMES = {CAPTIONED: "uncaptioned", UNKNOWN: "with unknown tokens", MODIFIED: "modified"}
+
+    def jump_to_state(self, flag: str, step: int, want: bool = True):
+        st = self.caption_state
+        if st is None or not len(st):
+            self._set_status("Open a folder first")
+            return
+        self._maybe_autosave_before_nav()
+
+        path = self.current_image_path
+        if self.folder_images and 0 <= self.folder_index < len(self.folder_images):
+            path = self.folder_images[self.folder_index]
+        start = st.index.get(path, -1 if step > 0 else len(st))
+
+        # the state's mask plane follows the image list filter
+        i = st.find(flag, start, step, want)
+        if i is None:
+            where = "after" if step > 0 else "before"
+            self._set_status(f"No {self.JUMP_NAMES[flag]} image {where} this one")
+            return
+
+        target = st.paths[i]
+        if i < len(self.folder_images) and self.folder_images[i] == target:
+            self.folder_index = i
+        else:
+            try:
+                self.folder_index = self.folder_images.index(target)
+            except ValueError:
+                self.folder_index = -1
+        self._clear_selections_for_next_image()
+        self.load_image(target)
+
+    def _note_caption_written(self, path: str, before: list[str], was_cap: bool | None):
+        st = self.caption_state
+        if st is None:
+            return
+        st.mark_written(path, not was_cap or self.loaded_caption_tokens != before, bool(self.unknown_caption_tokens))
+        self._update_caption_progress()
+
+    def _update_caption_progress(self):
+        st = self.caption_state
+        if st is None or not len(st):
+            self.caption_progress.set("")
+            return
+        c = st.counts
+        text = f"Captioned {c[CAPTIONED]:,} / {len(st):,} ({st.progress():.1f}%)"
+        if st.unknown_ready:
+            text += f"  |  unknown: {c[UNKNOWN]:,}"
+        if c[MODIFIED]:
+            text += f"  |  modified: {c[MODIFIED]:,}"
+        self.caption_progress.set(text)
+
+    def _start_unknown_scan(self):
+        """Re-check every caption against the vocabulary in the background (folder open, trigger reload)."""
+        if self._unknown_scan_cancel is not None:
+            self._unknown_scan_cancel.set()
+        st = self.caption_state
+        if st is None or not len(st):
+            return
+        cancel = threading.Event()
+        self._unknown_scan_cancel = cancel
+        read = self.dataset.caption_store.read
+        is_unknown = self.dataset.unknown_checker()
+
+        def _progress(_done, _total):
+            if not cancel.is_set():
+                self.after(0, self._update_caption_progress)
+
+        threading.Thread(target=scan_unknown, args=(st, read, is_unknown, cancel, _progress), daemon=True).start()
+
     def _caption_exists(self, image_path: str) -> bool:
-        base_noext = os.path.splitext(image_path)[0]
-        cap_path = base_noext + ".caption"
-        return os.path.exists(cap_path)
+        return self.dataset.caption_exists(image_path)
 
     def _refresh_image_tree_marker_for_path(self, image_path: str):
         if not self.image_tree or not image_path:
@@ -1580,13 +3044,24 @@ class App(tk.Tk):
         if not iid:
             return
         has_cap = self._caption_exists(image_path)
+        self._imglist_has_cap[image_path] = has_cap
+        st = self.caption_state
+        if st is not None:
+            changed = st.set(image_path, CAPTIONED, has_cap)
+            # no caption, no unknown tokens
+            if not has_cap and st.set(image_path, UNKNOWN, False):
+                changed = True
+            if changed:
+                self._update_caption_progress()
         self.image_tree.item(iid, values=("✓" if has_cap else "",))
         self.image_tree.item(iid, tags=("hascap",) if has_cap else ())
 
     def load_image(self, path: str):
-        print("ASYNC load_image:", path)
+        self._cancel_nav_settle()
         self._load_job_id += 1
         job_id = self._load_job_id
+        self._resize_job_id += 1
+        self._cancel_preview_refine()
 
         self.current_image_path = path
         self._show_loading_text("Loading image...")
@@ -1608,12 +3083,9 @@ class App(tk.Tk):
         t = threading.Thread(target=self._load_image_worker, args=(job_id, path), daemon=True)
         t.start()
 
-    def _load_image_worker(self, job_id: int, path: str):
+    def _load_image_worker(self, job_id: int, path: str, coarse: bool = True):
         try:
-            img = Image.open(path)
-            img.load()
-
-            w, h = img.size
+            Image = pil_image()
 
             area = [900, 600]
             ev = threading.Event()
@@ -1626,41 +3098,82 @@ class App(tk.Tk):
 
             self.after(0, _capture)
             ev.wait(timeout=1.0)
-
             area_w, area_h = area
-            scale = min(area_w / w, area_h / h)
-            new_size = (max(1, int(w * scale)), max(1, int(h * scale)))
-
-            preview = img.resize(new_size, Image.Resampling.BILINEAR)
 
-            self.after(0, lambda: self._on_image_loaded(job_id, path, img, preview))
+            img = None
+            if coarse:
+                self._post_embedded_thumbnail(job_id, path, area_w, area_h)
+
+                # stage 1: reduced decode (JPEG DCT scaling) + NEAREST, on screen before the full decode
+                with METRICS.timed("decode.coarse"):
+                    draft = Image.open(path)
+                    w, h = draft.size
+                    if draft.format == "JPEG":
+                        draft.draft("RGB", (area_w, area_h))
+                    draft.load()
+                scale = min(area_w / w, area_h / h)
+                new_size = (max(1, int(w * scale)), max(1, int(h * scale)))
+                with METRICS.timed("resize.coarse"):
+                    preview = draft.resize(new_size, Image.Resampling.NEAREST)
+                if job_id != self._load_job_id:
+                    return
+                payload = self._preview_payload(preview)
+                self.after(0, lambda: self._on_coarse_preview(job_id, path, preview, payload, (w, h)))
+                if draft.size == (w, h):
+                    img = draft
+
+            if img is None:
+                with METRICS.timed("decode"):
+                    img = Image.open(path)
+                    img.load()
+            METRICS.incr("images.decoded")
+
+            if job_id != self._load_job_id:
+                return
+            self.after(0, lambda: self._on_image_loaded(job_id, path, img))
         except Exception as e:
             self.after(0, lambda: messagebox.showerror("Error", f"Failed to load image:\n{e}"))
 
-    def _on_image_loaded(self, job_id: int, path: str, full_img: Image.Image, preview: Image.Image):
+    def _post_embedded_thumbnail(self, job_id: int, path: str, area_w: int, area_h: int) -> bool:
+        # stage 0: the camera's own preview, a few KB from the file header
+        try:
+            with METRICS.timed("decode.thumbnail"):
+                data = read_embedded_thumbnail(path)
+                size = read_image_size(path) if data else None
+                if not size:
+                    return False
+                Image = pil_image()
+                thumb = Image.open(io.BytesIO(data))
+                thumb.load()
+            w, h = size
+            scale = min(area_w / w, area_h / h)
+            # stretched to the real image's fitted size so the later frames don't jump
+            preview = thumb.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.Resampling.BILINEAR)
+            payload = self._preview_payload(preview)
+        except Exception:
+            return False
+        if job_id == self._load_job_id:
+            self.after(0, lambda: self._on_coarse_preview(job_id, path, preview, payload, size))
+        return True
+
+    def _on_coarse_preview(self, job_id: int, path: str, preview: "Image.Image", payload: bytes,
+                           size: tuple[int, int]):
+        if job_id != self._load_job_id:
+            return
+        self._show_preview(preview, payload, path)
+        self.image_info.set(f"{os.path.basename(path)}  |  {size[0]}x{size[1]}")
+
+    def _on_image_loaded(self, job_id: int, path: str, full_img: "Image.Image"):
         if job_id != self._load_job_id:
             return
         if path != self.current_image_path:
             return
 
         self.original_pil_image = full_img
-        self._on_image_area_resize()
-        self.current_tk_image = ImageTk.PhotoImage(preview)
-
-        if self._canvas_text_id is not None:
-            self.image_canvas.delete(self._canvas_text_id)
-            self._canvas_text_id = None
-
-        cw = self.image_canvas.winfo_width()
-        ch = self.image_canvas.winfo_height()
-
-        if self._canvas_img_id is None:
-            self._canvas_img_id = self.image_canvas.create_image(
-                cw // 2, ch // 2, image=self.current_tk_image, anchor="center"
-            )
-        else:
-            self.image_canvas.itemconfigure(self._canvas_img_id, image=self.current_tk_image)
-            self.image_canvas.coords(self._canvas_img_id, cw // 2, ch // 2)
+        self.tile_viewer.set_image(full_img)
+        # any resize result still in flight belongs to the previous image
+        self._resize_job_id += 1
+        self._schedule_preview_refine()
 
         w, h = full_img.size
         self.image_info.set(f"{os.path.basename(path)}  |  {w}x{h}")
@@ -1715,19 +3228,17 @@ class App(tk.Tk):
         #    if u not in final_tokens:
         #        final_tokens.append(u)
 
-        caption_text = CAPTION_JOINER.join(final_tokens)
         caption_path = self._caption_path_for_current_image()
         if not caption_path:
             return
+        before, was_cap = self.loaded_caption_tokens, self._imglist_has_cap.get(self.current_image_path)
         try:
-            with open(caption_path, "w", encoding="utf-8") as f:
-                f.write(caption_text)
+            with METRICS.timed("caption.write"):
+                caption_text = self.dataset.write_caption(self.current_image_path, final_tokens)
             self._refresh_image_tree_marker_for_path(self.current_image_path)
             self.loaded_caption_tokens = parse_caption_tokens(caption_text)
-            trigger_set = set(self.triggers)
-            self.unknown_caption_tokens = [t for t in self.loaded_caption_tokens if t not in trigger_set]
-            if self.deleted_triggers:
-                self.unknown_caption_tokens = [t for t in self.unknown_caption_tokens if t not in self.deleted_triggers]
+            _known, self.unknown_caption_tokens = self.dataset.split_caption(self.loaded_caption_tokens)
+            self._note_caption_written(self.current_image_path, before, was_cap)
             if self.unknown_caption_tokens:
                 self.caption_info.set(
                     f"caption: autosaved ({len(self.loaded_caption_tokens)}), unknown: {len(self.unknown_caption_tokens)}"
@@ -1738,50 +3249,92 @@ class App(tk.Tk):
             pass
 
     def next_image(self):
+        self._navigate(1, "Next", "end of folder")
+
+    def prev_image(self):
+        self._navigate(-1, "Prev", "start of folder")
 
+    def _navigate(self, step: int, label: str, edge: str):
         if not self.current_image_path:
-            self._set_status("Next: no image loaded")
+            self._set_status(f"{label}: no image loaded")
             return
 
         if not self.folder_images or self.folder_index == -1:
             self._build_folder_index(self.current_image_path)
 
         if not self.folder_images or self.folder_index == -1:
-            self._set_status("Next: cannot build folder index")
+            self._set_status(f"{label}: cannot build folder index")
             return
 
-        self._maybe_autosave_before_nav()
-
-        if self.folder_index < len(self.folder_images) - 1:
-            self.folder_index += 1
-            self._clear_selections_for_next_image()
-            self.load_image(self.folder_images[self.folder_index])
-        else:
-            self._set_status("Next: end of folder")
-
+        now = time.perf_counter()
+        repeat = now - self._nav_last < self.NAV_REPEAT_S
+        self._nav_last = now
 
-    def prev_image(self):
-        if not self.current_image_path:
-            self._set_status("Prev: no image loaded")
+        nxt = self._step_visible_index(step)
+        if nxt is None:
+            self._set_status(f"{label}: {edge}")
+            if self._nav_settle_id is not None:
+                # stopped at the edge while scrubbing: load where we are now
+                self._settle_navigation()
             return
 
-        if not self.folder_images or self.folder_index == -1:
-            self._build_folder_index(self.current_image_path)
-
-        if not self.folder_images or self.folder_index == -1:
-            self._set_status("Prev: cannot build folder index")
+        self.folder_index = nxt
+        if repeat or self._nav_settle_id is not None:
+            self._scrub_to(self.folder_images[nxt])
             return
 
         self._maybe_autosave_before_nav()
+        self._clear_selections_for_next_image()
+        self.load_image(self.folder_images[self.folder_index])
 
-        if self.folder_index > 0:
-            self.folder_index -= 1
-            self._clear_selections_for_next_image()
-            self.load_image(self.folder_images[self.folder_index])
-        else:
-            self._set_status("Prev: start of folder")
+    # ===== key-repeat scrubbing: only the full load of the image you stop on =====
+    def _scrub_to(self, path: str):
+        """Cheap step while a nav key is held: name, list position and the embedded thumbnail."""
+        self._load_job_id += 1
+        job_id = self._load_job_id
+        self._resize_job_id += 1
+        self._cancel_preview_refine()
+
+        n = len(self.folder_images)
+        self.image_info.set(f"{os.path.basename(path)}  |  {self.folder_index + 1}/{n}")
+        if self.image_tree and self._imglist_path_to_iid:
+            iid = self._imglist_path_to_iid.get(path)
+            if iid:
+                self.image_tree.see(iid)
 
+        area_w = max(self.image_canvas.winfo_width(), 1)
+        area_h = max(self.image_canvas.winfo_height(), 1)
+        threading.Thread(target=self._scrub_worker, args=(job_id, path, area_w, area_h), daemon=True).start()
 
+        self._cancel_nav_settle()
+        self._nav_settle_id = self.after(self.NAV_SETTLE_MS, self._settle_navigation)
+
+    def _scrub_worker(self, job_id: int, path: str, area_w: int, area_h: int):
+        if not self._post_embedded_thumbnail(job_id, path, area_w, area_h):
+            self.after(0, lambda: self._on_scrub_without_thumbnail(job_id, path))
+
+    def _on_scrub_without_thumbnail(self, job_id: int, path: str):
+        # no cheap pixels (PNG, WebP, ...): don't leave the previous image under the new name
+        if job_id == self._load_job_id:
+            self._show_loading_text(os.path.basename(path))
+
+    def _cancel_nav_settle(self):
+        if self._nav_settle_id is not None:
+            try:
+                self.after_cancel(self._nav_settle_id)
+            except Exception:
+                pass
+            self._nav_settle_id = None
+
+    def _settle_navigation(self):
+        self._cancel_nav_settle()
+        if not self.folder_images or not 0 <= self.folder_index < len(self.folder_images):
+            return
+        path = self.folder_images[self.folder_index]
+        # the image left behind is still the last fully loaded one
+        self._maybe_autosave_before_nav()
+        self._clear_selections_for_next_image()
+        self.load_image(path)
 
     def _caption_path_for_current_image(self) -> str | None:
         if not self.current_image_path:
@@ -1800,30 +3353,17 @@ class App(tk.Tk):
         if not cap_path:
             return
 
-        if not os.path.exists(cap_path):
-            self.caption_info.set("caption: (none)")
-            return
-
         try:
-            with open(cap_path, "r", encoding="utf-8") as f:
-                text = f.read()
-            tokens = parse_caption_tokens(text)
+            with METRICS.timed("caption.read"):
+                tokens = self.dataset.read_caption(self.current_image_path)
+            if tokens is None:
+                self.caption_info.set("caption: (none)")
+                return
             self.loaded_caption_tokens = tokens
 
-            trigger_set = set(self.triggers)
-            #known = [t for t in tokens if t in trigger_set]
-            #self.selected_set = set(known)
-
-            #trigger_set = set(self.triggers)
-            #self.unknown_caption_tokens = [t for t in tokens if t not in trigger_set]
-            trigger_set = set(self.triggers)
-
-            known = [t for t in tokens if t in trigger_set]
-            unknown = [t for t in tokens if t not in trigger_set]
-
-            if self.deleted_triggers:
-                known = [t for t in known if t not in self.deleted_triggers]
-                unknown = [t for t in unknown if t not in self.deleted_triggers]
+            known, unknown = self.dataset.split_caption(tokens)
+            if self.caption_state is not None and self.caption_state.set(self.current_image_path, UNKNOWN, bool(unknown)):
+                self._update_caption_progress()
 
             self.selected_set = set(known + unknown)
 
@@ -1847,6 +3387,10 @@ class App(tk.Tk):
         self.var_map.clear()
 
     def _render_trigger_list(self):
+        with METRICS.timed("render_triggers"):
+            self._render_trigger_list_now()
+
+    def _render_trigger_list_now(self):
         grp = self.current_group.get() or "All"
         self.group_title.set(f"Group: {grp}")
 
@@ -1855,6 +3399,12 @@ class App(tk.Tk):
         #triggers = list(self.triggers)
         triggers = list(self._get_all_triggers_for_ui())
 
+        if self.vocab is not None:
+            prefix = normalize_trigger(self.filter_var.get())
+            if prefix:
+                have = set(triggers)
+                triggers.extend(t for t in self.vocab.prefix(prefix, self.VOCAB_FILTER_LIMIT) if t not in have)
+
 
         if grp != "All":
             allowed = set(self.groups.get(grp, []))
@@ -1882,16 +3432,6 @@ class App(tk.Tk):
 
         triggers.sort(key=lambda t: self._display_text_for_trigger(t).lower())
 
-        theme = self.theme_var.get()
-        if theme == "Dark":
-            row_bg = "#202020"
-            row_fg = "#e6e6e6"
-            select_bg = "#b02020"
-        else:
-            row_bg = "#ffffff"
-            row_fg = "#111111"
-            select_bg = "#0a7a2a"
-
         for t in triggers:
             var = tk.BooleanVar(value=(t in self.selected_set))
             self.var_map[t] = var
@@ -1899,6 +3439,7 @@ class App(tk.Tk):
             def _on_toggle(*_args, _t=t, _v=var):
                 if _v.get():
                     self.selected_set.add(_t)
+                    self._promote_vocab_tokens([_t])
                 else:
                     self.selected_set.discard(_t)
 
@@ -1906,34 +3447,30 @@ class App(tk.Tk):
 
             label_text = self._display_text_for_trigger(t)
 
-            cb = tk.Checkbutton(
+            # colors come from the theme (see on_theme_compiled), rows survive theme switches untouched
+            cb = ttk.Checkbutton(
                 self.scroll.inner,
                 text=label_text,
                 variable=var,
                 onvalue=True,
                 offvalue=False,
-                indicatoron=0,
-                bg=row_bg,
-                fg=row_fg,
-                activebackground=row_bg,
-                activeforeground=row_fg,
-                selectcolor=select_bg,
-                anchor="w",
-                padx=8,
-                pady=4,
-                bd=0,
-                highlightthickness=0
+                style="ICap.Row.Toolbutton"
             )
             cb.pack(fill="x", padx=2, pady=1)
 
         all_total = len(self._get_all_triggers_for_ui())
+        if self.vocab is not None:
+            all_total = f"{all_total} (vocabulary: {len(self.vocab)})"
 
-        ttk.Label(
+        self._trigger_shown_count = len(triggers)
+        METRICS.gauge("triggers.rows", len(triggers))
+        self._trigger_count_label = ttk.Label(
             self.scroll.inner,
             #text=f"Shown: {len(triggers)} / Total: {len(self.triggers)}",
             text=f"Shown: {len(triggers)} / Total: {all_total}",
             padding=(0, 8)
-        ).pack(side="top", anchor="w")
+        )
+        self._trigger_count_label.pack(side="top", anchor="w")
 
         if self.loaded_caption_tokens:
             self._apply_caption_to_checkboxes()
@@ -1971,22 +3508,19 @@ class App(tk.Tk):
             if not messagebox.askyesno("Empty caption", "No triggers selected. Save empty .caption anyway?"):
                 return
 
-        caption_text = CAPTION_JOINER.join(final_tokens)
-
         caption_path = self._caption_path_for_current_image()
         if not caption_path:
             messagebox.showerror("Error", "Internal error: caption path not resolved.")
             return
 
+        before, was_cap = self.loaded_caption_tokens, self._imglist_has_cap.get(self.current_image_path)
         try:
-            with open(caption_path, "w", encoding="utf-8") as f:
-                f.write(caption_text)
+            with METRICS.timed("caption.write"):
+                caption_text = self.dataset.write_caption(self.current_image_path, final_tokens)
 
             self.loaded_caption_tokens = parse_caption_tokens(caption_text)
-            trigger_set = set(self.triggers)
-            self.unknown_caption_tokens = [t for t in self.loaded_caption_tokens if t not in trigger_set]
-            if self.deleted_triggers:
-                self.unknown_caption_tokens = [t for t in self.unknown_caption_tokens if t not in self.deleted_triggers]
+            _known, self.unknown_caption_tokens = self.dataset.split_caption(self.loaded_caption_tokens)
+            self._note_caption_written(self.current_image_path, before, was_cap)
             if self.unknown_caption_tokens:
                 self.caption_info.set(
                     f"caption: saved ({len(self.loaded_caption_tokens)}), unknown: {len(self.unknown_caption_tokens)}"
@@ -2007,6 +3541,8 @@ class App(tk.Tk):
         self.loaded_caption_tokens = []
         self.unknown_caption_tokens = []
 
+        self._cancel_preview_refine()
+        self.tile_viewer.set_image(None)
         self.image_canvas.delete("all")
         self._canvas_img_id = None
         self._canvas_text_id = self.image_canvas.create_text(10, 10, anchor="nw", text="No image loaded")
@@ -2019,7 +3555,7 @@ class App(tk.Tk):
         self._set_status("Cleaned")
 
     def add_trigger(self):
-        new_t = simpledialog.askstring("Add Trigger", "Enter new trigger word:", parent=self)
+        new_t = self._ask_trigger_name("Add Trigger", "Enter new trigger word:")
         if not new_t:
             return
         new_t = normalize_trigger(new_t)
@@ -2029,19 +3565,15 @@ class App(tk.Tk):
         if new_t in self.triggers:
             messagebox.showinfo("Info", "Trigger already exists.", parent=self)
         else:
-            self.triggers.append(new_t)
-            save_triggers(self.triggers_path, self.triggers)
+            self.dataset.add_trigger(new_t)
 
         tr = simpledialog.askstring(
             "Translation (optional)",
             f"Translation for '{new_t}' (optional):",
             parent=self
         )
-        if tr is not None:
-            tr = tr.strip()
-            if tr:
-                upsert_translation(self.translations_path, new_t, tr)
-                self.translations = load_translations(self.translations_path)
+        if tr is not None and tr.strip():
+            self.dataset.set_translation(new_t, tr)
 
         group_list = ", ".join(sorted(self.groups.keys(), key=lambda s: s.lower()))
         g = simpledialog.askstring(
@@ -2054,19 +3586,11 @@ class App(tk.Tk):
         if g is not None:
             g = g.strip()
             if g:
-                if g not in self.groups:
-                    self.groups[g] = []
-                if new_t not in self.groups[g]:
-                    self.groups[g].append(new_t)
-                save_groups(self.groups_path, self.groups)
+                self.dataset.add_to_group(new_t, g)
                 self.group_combo["values"] = self._group_values()
 
         self.selected_set.add(new_t)
         self._render_trigger_list()
 
     def _display_text_for_trigger(self, t: str) -> str:
-        tr = (self.translations or {}).get(t, "")
-        tr = tr.strip() if isinstance(tr, str) else ""
-        if tr:
-            return f"{tr} ({t})"
-        return t
\ No newline at end of file
+        return self.dataset.display_text(t)
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Aspect-ratio bucketing analysis (SDXL style): which training bucket each image lands in,
+how much of it the trainer would crop away, and which images would have to be upscaled.
+
+Only image headers are read (image_utils.read_image_size), spread over a thread pool.
+"""
+import math, bisect, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from image_utils import read_image_size
+
+SDXL_RESOLUTION = 1024
+BUCKET_STEP = 64
+CROP_THRESHOLD = 0.15
+CHUNK = 512
+
+
+def make_buckets(resolution: int = SDXL_RESOLUTION, step: int = BUCKET_STEP,
+                 min_side: int = 512, max_side: int = 2048) -> list[tuple[int, int]]:
+    """Buckets of about resolution^2 pixels, sides multiples of step, ordered by aspect ratio."""
+    area = resolution * resolution
+    out = set()
+    w = min_side
+    while w <= max_side:
+        h = min(max_side, (area // w) // step * step)
+        if h >= min_side:
+            out.add((w, h))
+            out.add((h, w))
+        w += step
+    return sorted(out, key=lambda b: b[0] / b[1])
+
+
+def parse_buckets(text: str) -> list[tuple[int, int]]:
+    """'1024x1024, 1152x896 ...' -> [(1024, 1024), (1152, 896), ...]; raises ValueError."""
+    out = set()
+    for part in text.replace(";", ",").replace("\n", ",").split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        w, _, h = part.partition("x")
+        w, h = int(w), int(h)
+        if w <= 0 or h <= 0:
+            raise ValueError(f"Invalid bucket: {part}")
+        out.add((w, h))
+    if not out:
+        raise ValueError("No buckets given.")
+    return sorted(out, key=lambda b: b[0] / b[1])
+
+
+class BucketSet:
+    def __init__(self, buckets: list[tuple[int, int]]):
+        self.buckets = sorted(buckets, key=lambda b: b[0] / b[1])
+        self._logs = [math.log(w / h) for (w, h) in self.buckets]
+
+    def assign(self, w: int, h: int) -> tuple[tuple[int, int], float, float]:
+        """(bucket, cropped fraction, scale). Nearest aspect ratio; scale > 1 means upscaling."""
+        r = math.log(w / h)
+        i = bisect.bisect_left(self._logs, r)
+        if i == len(self._logs) or (i > 0 and r - self._logs[i - 1] <= self._logs[i] - r):
+            i -= 1
+        bw, bh = self.buckets[i]
+        # resize to cover the bucket, then center-crop
+        scale = max(bw / w, bh / h)
+        crop = 1.0 - (bw * bh) / (w * scale * h * scale)
+        return (bw, bh), max(0.0, crop), scale
+
+
+def _probe_chunk(paths: list[str], cancel) -> list[tuple[str, tuple[int, int] | None]]:
+    out = []
+    for p in paths:
+        if cancel is not None and cancel.is_set():
+            break
+        out.append((p, read_image_size(p)))
+    return out
+
+
+def analyze(paths: list[str], buckets: list[tuple[int, int]], crop_threshold: float = CROP_THRESHOLD,
+            workers: int = 8, progress=None, cancel: threading.Event | None = None) -> dict:
+    """
+    Returns {"buckets": {(w, h): [path, ...]}, "cropped": [(path, fraction)], "under": [(path, (w, h))],
+    "unreadable": [path], "images": n, "cancelled": bool}. progress(done, total) is called from
+    the calling thread.
+    """
+    bset = BucketSet(buckets)
+    res = {
+        "buckets": {b: [] for b in bset.buckets},
+        "cropped": [],
+        "under": [],
+        "unreadable": [],
+        "images": len(paths),
+        "cancelled": False,
+    }
+    chunks = [paths[i:i + CHUNK] for i in range(0, len(paths), CHUNK)]
+    done = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as ex:
+        futures = [ex.submit(_probe_chunk, chunk, cancel) for chunk in chunks]
+        for fut in as_completed(futures):
+            for p, size in fut.result():
+                if not size or size[0] <= 0 or size[1] <= 0:
+                    res["unreadable"].append(p)
+                    continue
+                bucket, crop, scale = bset.assign(*size)
+                res["buckets"][bucket].append(p)
+                if crop > crop_threshold:
+                    res["cropped"].append((p, crop))
+                if scale > 1.0:
+                    res["under"].append((p, size))
+                done += 1
+            if progress is not None:
+                progress(done + len(res["unreadable"]), len(paths))
+
+    res["cancelled"] = cancel is not None and cancel.is_set()
+    for arr in res["buckets"].values():
+        arr.sort(key=lambda p: p.lower())
+    res["cropped"].sort(key=lambda x: -x[1])
+    res["under"].sort(key=lambda x: x[1][0] * x[1][1])
+    res["unreadable"].sort(key=lambda p: p.lower())
+    return res
@@ -0,0 +1,91 @@
+"""
+Caption tokenizer throughput: per-file parse (as before parse_many) vs io_store.parse_many.
+
+    python benchmarks/bench_tokenizer.py --captions 1000000
+"""
+import os, re, sys, time, random, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from io_store import parse_caption_tokens, parse_many
+
+
+def _legacy_normalize(s: str) -> str:
+    s = s.strip()
+    s = re.sub(r"\s+", " ", s)
+    return s
+
+
+def legacy_parse_caption_tokens(text: str) -> list[str]:
+    text = text.strip()
+    if not text:
+        return []
+    parts = re.split(r",|\n", text)
+    tokens = [_legacy_normalize(p) for p in parts if p.strip()]
+    seen = set()
+    out = []
+    for t in tokens:
+        if t and t not in seen:
+            seen.add(t)
+            out.append(t)
+    return out
+
+
+def make_corpus(n: int, vocab_size: int = 5000, tokens_per_caption: int = 20, messy: float = 0.05, seed: int = 0) -> list[str]:
+    rnd = random.Random(seed)
+    vocab = [f"tag_{i} word{i % 97}" for i in range(vocab_size)]
+    out = []
+    for _ in range(n):
+        toks = rnd.sample(vocab, tokens_per_caption)
+        if rnd.random() < messy:
+            # hand-edited captions: double spaces, tabs, newlines, duplicates
+            toks = [t.replace(" ", "  ") for t in toks] + [toks[0]]
+            out.append(",\t".join(toks) + "\n")
+        else:
+            out.append(", ".join(toks))
+    return out
+
+
+def _time(fn, *args) -> float:
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def run(n: int, tokens_per_caption: int = 20) -> dict:
+    corpus = make_corpus(n, tokens_per_caption=tokens_per_caption)
+
+    sample = corpus[:2000]
+    if [legacy_parse_caption_tokens(t) for t in sample] != parse_many(sample):
+        raise AssertionError("parse_many differs from the per-file parser")
+
+    legacy = _time(lambda c: [legacy_parse_caption_tokens(t) for t in c], corpus)
+    per_file = _time(lambda c: [parse_caption_tokens(t) for t in c], corpus)
+    batch = _time(parse_many, corpus)
+    batch_interned = _time(lambda c: parse_many(c, intern=True), corpus)
+
+    return {
+        "captions": n,
+        "legacy_s": legacy,
+        "per_file_s": per_file,
+        "parse_many_s": batch,
+        "parse_many_intern_s": batch_interned,
+        "speedup": legacy / batch if batch else 0.0,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--captions", type=int, default=1_000_000)
+    ap.add_argument("--tokens", type=int, default=20)
+    args = ap.parse_args(argv)
+
+    res = run(args.captions, args.tokens)
+    n = res["captions"]
+    for key in ("legacy_s", "per_file_s", "parse_many_s", "parse_many_intern_s"):
+        print(f"{key:22s} {res[key]:8.2f} s  {n / res[key]:12,.0f} captions/s")
+    print(f"{'speedup':22s} {res['speedup']:8.2f} x")
+
+
+if __name__ == "__main__":
+    main()
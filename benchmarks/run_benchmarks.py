@@ -0,0 +1,163 @@
+"""
+Headless benchmark suite for the non-GUI hot paths.
+
+    python benchmarks/run_benchmarks.py --images 5000 --out results.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json     # exit 1 on regressions
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+
+Each case runs --repeat times on a synthetic dataset (see synth_dataset.py); the median is compared
+against the baseline and anything slower than --tolerance is reported as a regression.
+"""
+import os, sys, json, time, shutil, platform, tempfile, argparse, statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from io_store import load_triggers, save_triggers, load_groups, save_groups, parse_many
+from caption_store import SidecarCaptionStore
+from synth_dataset import generate_dataset
+
+PREVIEW_AREA = (900, 600)
+
+
+def _read_captions(folder: str) -> list[str]:
+    texts = []
+    for name in os.listdir(folder):
+        if name.endswith(".caption"):
+            with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+                texts.append(f.read())
+    return texts
+
+
+def build_cases(info: dict, decode_limit: int) -> dict:
+    folder = info["folder"]
+    store = SidecarCaptionStore(folder)
+    texts = _read_captions(folder)
+    triggers = load_triggers(info["triggers"])
+    groups = load_groups(info["groups"])
+    tmp_triggers = info["triggers"] + ".bench"
+    tmp_groups = info["groups"] + ".bench"
+
+    cases = {
+        "folder_scan": lambda: store.scan_images(folder),
+        "caption_read": lambda: _read_captions(folder),
+        "caption_parse": lambda: parse_many(texts),
+        "used_triggers": lambda: store.token_counts(folder),
+        "triggers_load": lambda: load_triggers(info["triggers"]),
+        "triggers_save": lambda: save_triggers(tmp_triggers, triggers),
+        "groups_load": lambda: load_groups(info["groups"]),
+        "groups_save": lambda: save_groups(tmp_groups, groups),
+    }
+
+    if info.get("real_images"):
+        from image_utils import pil_image
+
+        Image = pil_image()
+        paths = [p for (p, _has) in store.scan_images(folder)][:decode_limit]
+
+        def _decode_resize():
+            for p in paths:
+                with Image.open(p) as img:
+                    img.load()
+                    w, h = img.size
+                    scale = min(PREVIEW_AREA[0] / w, PREVIEW_AREA[1] / h)
+                    img.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.Resampling.BILINEAR)
+
+        cases["preview_decode_resize"] = _decode_resize
+
+    return cases
+
+
+def run_cases(cases: dict, repeat: int) -> dict:
+    results = {}
+    for name, fn in cases.items():
+        runs = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            runs.append(time.perf_counter() - t0)
+        results[name] = {"median_s": statistics.median(runs), "min_s": min(runs), "runs": runs}
+        print(f"{name:24s} median {results[name]['median_s'] * 1000:10.2f} ms   min {results[name]['min_s'] * 1000:10.2f} ms")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    base = baseline.get("results", {})
+    for name, cur in results.items():
+        ref = base.get(name)
+        if not ref or not ref.get("median_s"):
+            continue
+        ratio = cur["median_s"] / ref["median_s"]
+        mark = "REGRESSION" if ratio > 1.0 + tolerance else ""
+        print(f"{name:24s} {ratio:6.2f}x baseline  {mark}")
+        if mark:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--images", type=int, default=2000)
+    ap.add_argument("--vocab", type=int, default=5000)
+    ap.add_argument("--tokens", type=int, default=20)
+    ap.add_argument("--groups", type=int, default=20)
+    ap.add_argument("--size", default="640x480", help="image size WxH")
+    ap.add_argument("--decode-limit", type=int, default=50, help="images decoded per preview_decode_resize run")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--dataset", help="generate the dataset here and keep it (default: temporary directory)")
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--baseline", help="compare against this results JSON")
+    ap.add_argument("--save-baseline", help="write results JSON as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline (0.2 = 20%%)")
+    args = ap.parse_args(argv)
+
+    params = {
+        "images": args.images,
+        "vocab": args.vocab,
+        "tokens": args.tokens,
+        "groups": args.groups,
+        "size": args.size,
+        "decode_limit": args.decode_limit,
+        "repeat": args.repeat,
+    }
+
+    work = args.dataset or tempfile.mkdtemp(prefix="icaption_bench_")
+    try:
+        size = tuple(int(v) for v in args.size.lower().split("x"))
+        t0 = time.perf_counter()
+        info = generate_dataset(work, args.images, (size,), args.vocab, args.tokens, args.groups)
+        print(f"dataset: {args.images} images in {time.perf_counter() - t0:.1f} s" + ("" if info["real_images"] else " (Pillow missing, decode skipped)"))
+
+        results = run_cases(build_cases(info, args.decode_limit), args.repeat)
+    finally:
+        if not args.dataset:
+            shutil.rmtree(work, ignore_errors=True)
+
+    doc = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params,
+        },
+        "results": results,
+    }
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(doc, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("params") != params:
+            print("warning: baseline was recorded with different parameters")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Synthetic dataset generator for the benchmarks: images with .caption sidecars, triggers.txt and trigger_groups.txt.
+
+    python benchmarks/synth_dataset.py out_dir --images 5000 --vocab 20000 --groups 30
+"""
+import os, sys, random, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from io_store import save_triggers, save_groups
+
+# without Pillow the image files are placeholders: enough for scans, not for decode benchmarks
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def make_vocab(n: int, seed: int = 0) -> list[str]:
+    rnd = random.Random(seed)
+    words = [f"w{i:x}" for i in range(max(16, n // 4))]
+    out = set()
+    while len(out) < n:
+        out.add(" ".join(rnd.sample(words, rnd.randint(1, 3))) + f" {len(out)}")
+    return sorted(out)
+
+
+def make_groups(vocab: list[str], count: int, seed: int = 0) -> dict[str, list[str]]:
+    rnd = random.Random(seed + 1)
+    groups = {f"group_{i:03d}": [] for i in range(max(1, count))}
+    names = list(groups)
+    for t in vocab:
+        if rnd.random() < 0.8:
+            groups[rnd.choice(names)].append(t)
+    return groups
+
+
+def _write_image(path: str, size: tuple[int, int], rnd: random.Random):
+    if Image is None:
+        with open(path, "wb") as f:
+            f.write(b"\0" * 64)
+        return
+    color = (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256))
+    img = Image.new("RGB", size, color)
+    # some structure so JPEG/PNG decode is not trivially cheap
+    step = max(8, size[0] // 16)
+    for x in range(0, size[0], step):
+        img.paste((color[1], color[2], color[0]), (x, 0, min(size[0], x + step // 2), size[1]))
+    if path.endswith(".jpg"):
+        img.save(path, quality=90)
+    else:
+        img.save(path)
+
+
+def generate_dataset(
+    out_dir: str,
+    images: int = 1000,
+    sizes: tuple = ((640, 480), (1024, 768)),
+    vocab_size: int = 2000,
+    tokens_per_caption: int = 20,
+    groups: int = 10,
+    caption_ratio: float = 0.9,
+    seed: int = 0,
+) -> dict:
+    rnd = random.Random(seed)
+    img_dir = os.path.join(out_dir, "images")
+    os.makedirs(img_dir, exist_ok=True)
+
+    vocab = make_vocab(vocab_size, seed)
+    group_map = make_groups(vocab, groups, seed)
+
+    triggers_path = os.path.join(out_dir, "triggers.txt")
+    groups_path = os.path.join(out_dir, "trigger_groups.txt")
+    save_triggers(triggers_path, vocab)
+    save_groups(groups_path, group_map)
+
+    k = min(tokens_per_caption, len(vocab))
+    for i in range(images):
+        ext = ".jpg" if i % 2 else ".png"
+        path = os.path.join(img_dir, f"img_{i:07d}{ext}")
+        _write_image(path, sizes[i % len(sizes)], rnd)
+        if rnd.random() < caption_ratio:
+            with open(os.path.splitext(path)[0] + ".caption", "w", encoding="utf-8") as f:
+                f.write(", ".join(rnd.sample(vocab, k)))
+
+    return {
+        "folder": img_dir,
+        "triggers": triggers_path,
+        "groups": groups_path,
+        "images": images,
+        "real_images": Image is not None,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("out_dir")
+    ap.add_argument("--images", type=int, default=1000)
+    ap.add_argument("--size", action="append", default=None, help="WxH, repeatable (default 640x480 and 1024x768)")
+    ap.add_argument("--vocab", type=int, default=2000)
+    ap.add_argument("--tokens", type=int, default=20)
+    ap.add_argument("--groups", type=int, default=10)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    sizes = tuple(tuple(int(v) for v in s.lower().split("x")) for s in args.size) if args.size else ((640, 480), (1024, 768))
+    info = generate_dataset(args.out_dir, args.images, sizes, args.vocab, args.tokens, args.groups, seed=args.seed)
+    print(f"{info['images']} images in {info['folder']}" + ("" if info["real_images"] else " (placeholders, Pillow missing)"))
+
+
+if __name__ == "__main__":
+    main()
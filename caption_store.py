@@ -0,0 +1,295 @@
+import os, threading
+from collections import Counter
+
+from constants import IMAGE_EXTS
+from io_store import caption_path_for, parse_caption_tokens, parse_many
+
+CAPTION_BACKENDS = ("sidecar", "sqlite")
+SQLITE_DB_NAME = ".icaption_captions.sqlite"
+
+
+class SidecarCaptionStore:
+    """Plain <image>.caption files next to the images."""
+
+    backend = "sidecar"
+
+    def __init__(self, folder: str | None = None):
+        self.folder = folder
+
+    def read(self, image_path: str) -> str | None:
+        try:
+            with open(caption_path_for(image_path), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, image_path: str, text: str) -> None:
+        with open(caption_path_for(image_path), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def write_many(self, items: list[tuple[str, str]]) -> None:
+        for image_path, text in items:
+            self.write(image_path, text)
+
+    def exists(self, image_path: str) -> bool:
+        return os.path.exists(caption_path_for(image_path))
+
+    def scan_images(self, folder: str) -> list[tuple[str, bool]]:
+        # one directory pass: caption stems are collected instead of one exists() per image
+        images = []
+        cap_stems = set()
+        for entry in os.scandir(folder):
+            if not entry.is_file():
+                continue
+            stem, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if ext == ".caption":
+                cap_stems.add(os.path.normcase(stem))
+            elif ext in IMAGE_EXTS:
+                images.append((entry.path, os.path.normcase(stem)))
+        items = [(p, stem in cap_stems) for p, stem in images]
+        items.sort(key=lambda x: os.path.basename(x[0]).lower())
+        return items
+
+    def token_counts(self, folder: str) -> tuple[Counter, int]:
+        return self._count_sidecars(folder)
+
+    def _count_sidecars(self, folder: str, subfolders_only: bool = False) -> tuple[Counter, int]:
+        # the whole tree; subfolders_only leaves out the files directly in folder
+        counter = Counter()
+        total_files = 0
+        batch = []
+        for root, _, files in os.walk(folder):
+            if subfolders_only and root == folder:
+                continue
+            for f in files:
+                if f.lower().endswith(".caption"):
+                    total_files += 1
+                    p = os.path.join(root, f)
+                    try:
+                        with open(p, "r", encoding="utf-8") as fh:
+                            batch.append(fh.read())
+                    except Exception:
+                        continue
+                    if len(batch) >= 1024:
+                        for tokens in parse_many(batch, intern=True):
+                            counter.update(tokens)
+                        batch = []
+        for tokens in parse_many(batch, intern=True):
+            counter.update(tokens)
+        return counter, total_files
+
+    def sync(self) -> dict:
+        return {"ingested": 0, "materialized": 0}
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteCaptionStore(SidecarCaptionStore):
+    """
+    Captions of one dataset folder in a single SQLite file.
+    Rows written through the store are marked dirty until materialize() writes the sidecars;
+    ingest() pulls in sidecars that were changed by other tools.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, folder: str, db_path: str | None = None):
+        import sqlite3
+
+        super().__init__(folder)
+        self.db_path = db_path or os.path.join(folder, SQLITE_DB_NAME)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS captions ("
+                " stem TEXT PRIMARY KEY,"
+                " text TEXT NOT NULL,"
+                " file_mtime_ns INTEGER NOT NULL DEFAULT 0,"
+                " dirty INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS caption_tokens ("
+                " stem TEXT NOT NULL,"
+                " token TEXT NOT NULL,"
+                " PRIMARY KEY (stem, token)) WITHOUT ROWID"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS caption_tokens_token ON caption_tokens(token)")
+
+    def _stem(self, image_path: str) -> str | None:
+        rel = os.path.relpath(os.path.abspath(image_path), os.path.abspath(self.folder))
+        if rel.startswith(os.pardir) or os.path.isabs(rel):
+            return None
+        return self._key(os.path.splitext(rel)[0])
+
+    @staticmethod
+    def _key(stem: str) -> str:
+        # same case rules as the file system, the way the sidecar scan matches captions to images
+        return os.path.normcase(stem).replace("\\", "/")
+
+    def _put(self, stem: str, text: str, file_mtime_ns: int, dirty: int):
+        self._conn.execute(
+            "INSERT INTO captions(stem, text, file_mtime_ns, dirty) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(stem) DO UPDATE SET text=excluded.text, "
+            "file_mtime_ns=excluded.file_mtime_ns, dirty=excluded.dirty",
+            (stem, text, file_mtime_ns, dirty)
+        )
+        self._conn.execute("DELETE FROM caption_tokens WHERE stem=?", (stem,))
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO caption_tokens(stem, token) VALUES (?, ?)",
+            [(stem, t) for t in parse_caption_tokens(text)]
+        )
+
+    def read(self, image_path: str) -> str | None:
+        stem = self._stem(image_path)
+        if stem is None:
+            return super().read(image_path)
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM captions WHERE stem=?", (stem,)).fetchone()
+        return row[0] if row else None
+
+    def write(self, image_path: str, text: str) -> None:
+        self.write_many([(image_path, text)])
+
+    def write_many(self, items: list[tuple[str, str]]) -> None:
+        outside = []
+        with self._lock, self._conn:
+            for image_path, text in items:
+                stem = self._stem(image_path)
+                if stem is None:
+                    outside.append((image_path, text))
+                    continue
+                row = self._conn.execute("SELECT file_mtime_ns FROM captions WHERE stem=?", (stem,)).fetchone()
+                self._put(stem, text, row[0] if row else 0, 1)
+        if outside:
+            super().write_many(outside)
+
+    def exists(self, image_path: str) -> bool:
+        stem = self._stem(image_path)
+        if stem is None:
+            return super().exists(image_path)
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM captions WHERE stem=?", (stem,)).fetchone() is not None
+
+    def scan_images(self, folder: str) -> list[tuple[str, bool]]:
+        if os.path.abspath(folder) != os.path.abspath(self.folder):
+            return super().scan_images(folder)
+        with self._lock:
+            stems = {r[0] for r in self._conn.execute("SELECT stem FROM captions")}
+        items = []
+        for entry in os.scandir(folder):
+            if not entry.is_file():
+                continue
+            stem, ext = os.path.splitext(entry.name)
+            if ext.lower() in IMAGE_EXTS:
+                items.append((entry.path, self._key(stem) in stems))
+        items.sort(key=lambda x: os.path.basename(x[0]).lower())
+        return items
+
+    def token_counts(self, folder: str) -> tuple[Counter, int]:
+        if os.path.abspath(folder) != os.path.abspath(self.folder):
+            return super().token_counts(folder)
+        with self._lock:
+            counter = Counter(dict(self._conn.execute(
+                "SELECT token, COUNT(*) FROM caption_tokens GROUP BY token"
+            )))
+            total = self._conn.execute("SELECT COUNT(*) FROM captions").fetchone()[0]
+        # the store only holds the top folder; sidecars further down count as they do without it
+        sub_counter, sub_total = self._count_sidecars(folder, subfolders_only=True)
+        counter.update(sub_counter)
+        return counter, total + sub_total
+
+    def ingest(self, progress=None) -> int:
+        """
+        Reads .caption sidecars that are new or changed on disk since the last sync and drops
+        synced rows whose sidecar was deleted. Returns the number of rows added, changed or removed.
+        """
+        with self._lock:
+            known = {r[0]: (r[1], r[2]) for r in self._conn.execute("SELECT stem, file_mtime_ns, dirty FROM captions")}
+
+        changed = []
+        on_disk = set()
+        for entry in os.scandir(self.folder):
+            if not entry.is_file() or not entry.name.lower().endswith(".caption"):
+                continue
+            stem = self._key(os.path.splitext(entry.name)[0])
+            on_disk.add(stem)
+            mtime = entry.stat().st_mtime_ns
+            prev = known.get(stem)
+            # dirty rows win: they hold edits not yet written to the sidecar
+            if prev is not None and (prev[1] or prev[0] == mtime):
+                continue
+            try:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    changed.append((stem, f.read(), mtime))
+            except OSError:
+                continue
+
+        # deleted outside the app; dirty rows are kept, materialize() writes them back
+        removed = [(stem,) for stem, (_mtime, dirty) in known.items() if not dirty and stem not in on_disk]
+
+        with self._lock, self._conn:
+            for i, (stem, text, mtime) in enumerate(changed):
+                self._put(stem, text, mtime, 0)
+                if progress and i % 1000 == 0:
+                    progress(i, len(changed))
+            # a row written through the store meanwhile is dirty again and survives
+            self._conn.executemany(
+                "DELETE FROM caption_tokens WHERE stem IN (SELECT stem FROM captions WHERE stem=? AND dirty=0)",
+                removed
+            )
+            self._conn.executemany("DELETE FROM captions WHERE stem=? AND dirty=0", removed)
+        return len(changed) + len(removed)
+
+    def materialize(self, progress=None) -> int:
+        """Writes dirty rows out as .caption sidecars."""
+        with self._lock:
+            rows = self._conn.execute("SELECT stem, text FROM captions WHERE dirty=1").fetchall()
+
+        done = []
+        for i, (stem, text) in enumerate(rows):
+            path = os.path.join(self.folder, stem + ".caption")
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(text)
+                done.append((os.stat(path).st_mtime_ns, stem, text))
+            except OSError:
+                continue
+            if progress and i % 1000 == 0:
+                progress(i, len(rows))
+
+        with self._lock, self._conn:
+            # a row edited again while we were writing stays dirty
+            self._conn.executemany(
+                "UPDATE captions SET dirty=0, file_mtime_ns=? WHERE stem=? AND text=?",
+                done
+            )
+        return len(done)
+
+    def sync(self) -> dict:
+        ingested = self.ingest()
+        materialized = self.materialize()
+        return {"ingested": ingested, "materialized": materialized}
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+
+def open_caption_store(folder: str | None, backend: str = "sidecar"):
+    if backend == "sqlite" and folder and os.path.isdir(folder):
+        store = SqliteCaptionStore(folder)
+        try:
+            store.ingest()
+        except Exception:
+            store.close()
+            raise
+        return store
+    return SidecarCaptionStore(folder)
@@ -0,0 +1,417 @@
+"""
+Batch mode: dataset-wide operations without the GUI.
+
+    icaption stats    <folder>                     token statistics
+    icaption validate <folder>                     non-normalized / duplicate / unknown tokens, missing captions
+    icaption rewrite  <folder> [--dry-run]         normalize every .caption (whitespace, duplicates)
+    icaption reorder  <folder> [--dry-run]         sort tokens by trigger group order, like Save in the GUI
+    icaption export   <folder> --out DIR           sharded tar export (see dataset_export)
+    icaption buckets  <folder>                     SDXL aspect-ratio bucket histogram (headers only)
+    icaption resize   <folder> [--out DIR]         resize/crop/convert to the buckets (needs Pillow)
+    icaption dupes    <folder> [--radius N]        perceptual-hash near-duplicate groups (needs Pillow)
+
+Captions are parsed with io_store.parse_caption_tokens and ordered with order_tokens_by_groups,
+the same rules the GUI uses. Work is spread over a process pool in chunks of image paths.
+"""
+import os, sys, json, time, argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from constants import CAPTION_JOINER, DEFAULT_TRIGGERS_FILE, DEFAULT_GROUPS_FILE, SETTINGS_FILE
+from io_store import caption_path_for, parse_caption_tokens, order_tokens_by_groups, load_triggers, load_groups, load_settings
+from caption_store import SidecarCaptionStore
+from dataset_export import scan_dataset, EXPORT_FORMATS
+from resize_pipeline import CROP_POLICIES, OUTPUT_FORMATS
+from dedupe import HASH_KINDS, HASH_BITS, DEFAULT_RADIUS
+
+CHUNK = 256
+
+# per-process context, set once by the pool initializer instead of pickled with every chunk
+_ctx = {}
+
+
+def _base_dir() -> str:
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def _radius(text: str) -> int:
+    r = int(text)
+    if not 0 <= r < HASH_BITS:
+        raise argparse.ArgumentTypeError(f"must be between 0 and {HASH_BITS - 1}")
+    return r
+
+
+def _init_worker(ctx: dict):
+    _ctx.clear()
+    _ctx.update(ctx)
+    if "vocab" in _ctx:
+        _ctx["vocab"] = set(_ctx["vocab"])
+
+
+def _canonical(tokens: list[str], reorder: bool) -> str:
+    if reorder:
+        tokens = order_tokens_by_groups(tokens, _ctx.get("groups"), _ctx.get("group_order"))
+    return CAPTION_JOINER.join(tokens)
+
+
+def _read(image_path: str) -> str | None:
+    try:
+        with open(caption_path_for(image_path), "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _work_chunk(op: str, folder: str, rels: list[str]) -> dict:
+    out = {"images": len(rels), "captioned": 0, "empty": 0, "changed": 0, "tokens": Counter(), "issues": []}
+    store = SidecarCaptionStore(folder)
+    dry_run = _ctx.get("dry_run", False)
+    vocab = _ctx.get("vocab")
+
+    for rel in rels:
+        path = os.path.join(folder, rel)
+        text = _read(path)
+        if text is None:
+            if op == "validate":
+                out["issues"].append((rel, "missing caption"))
+            continue
+        out["captioned"] += 1
+        tokens = parse_caption_tokens(text)
+        if not tokens:
+            out["empty"] += 1
+
+        if op == "stats":
+            out["tokens"].update(tokens)
+        elif op == "validate":
+            if not tokens:
+                out["issues"].append((rel, "empty caption"))
+                continue
+            raw = [p for p in text.replace("\n", ",").split(",") if p.strip()]
+            if len(raw) > len(tokens):
+                out["issues"].append((rel, "duplicate tokens"))
+            if text != _canonical(tokens, False):
+                out["issues"].append((rel, "not normalized"))
+            if _ctx.get("check_order") and text != _canonical(tokens, True):
+                out["issues"].append((rel, "not in group order"))
+            if vocab is not None:
+                unknown = [t for t in tokens if t not in vocab]
+                if unknown:
+                    out["issues"].append((rel, "unknown: " + ", ".join(unknown)))
+        elif op in ("rewrite", "reorder"):
+            new = _canonical(tokens, op == "reorder")
+            if new != text:
+                out["changed"] += 1
+                if not dry_run:
+                    store.write(path, new)
+    return out
+
+
+def _orphan_captions(folder: str, rels: list[str], recursive: bool) -> list[str]:
+    stems = {os.path.normcase(os.path.splitext(r)[0]) for r in rels}
+    out = []
+    for root, dirs, files in os.walk(folder):
+        if not recursive:
+            dirs[:] = []
+        for name in files:
+            if name.endswith(".caption"):
+                rel = os.path.relpath(os.path.join(root, name), folder)
+                if os.path.normcase(os.path.splitext(rel)[0]) not in stems:
+                    out.append(rel)
+    return sorted(out)
+
+
+class _Progress:
+    def __init__(self, label: str, total: int, quiet: bool = False):
+        self.label = label
+        self.total = total
+        self.quiet = quiet
+        self.done = 0
+        self._last = 0.0
+
+    def __call__(self, done: int, total: int | None = None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if self.quiet:
+            return
+        now = time.monotonic()
+        if now - self._last >= 0.2 or self.done >= self.total:
+            self._last = now
+            sys.stderr.write(f"\r{self.label}: {self.done} / {self.total}")
+            sys.stderr.flush()
+
+    def finish(self):
+        if not self.quiet:
+            sys.stderr.write("\n")
+
+
+def run_pool(op: str, folder: str, rels: list[str], ctx: dict, workers: int, quiet: bool = False) -> dict:
+    total = {"images": 0, "captioned": 0, "empty": 0, "changed": 0, "tokens": Counter(), "issues": []}
+    chunks = [rels[i:i + CHUNK] for i in range(0, len(rels), CHUNK)]
+    progress = _Progress(op, len(rels), quiet)
+    progress(0)
+
+    with ProcessPoolExecutor(max_workers=max(1, workers), initializer=_init_worker, initargs=(ctx,)) as ex:
+        futures = [ex.submit(_work_chunk, op, folder, chunk) for chunk in chunks]
+        for fut in as_completed(futures):
+            res = fut.result()
+            for key in ("images", "captioned", "empty", "changed"):
+                total[key] += res[key]
+            total["tokens"].update(res["tokens"])
+            total["issues"].extend(res["issues"])
+            progress(total["images"])
+    progress.finish()
+    total["issues"].sort()
+    return total
+
+
+def _load_context(args) -> dict:
+    settings = load_settings(args.settings)
+    order = settings.get("group_order", [])
+    ctx = {
+        "groups": load_groups(args.groups) if os.path.exists(args.groups) else {},
+        "group_order": order if isinstance(order, list) else [],
+        "dry_run": getattr(args, "dry_run", False),
+        "check_order": getattr(args, "check_order", False),
+    }
+    if os.path.exists(args.triggers):
+        ctx["vocab"] = load_triggers(args.triggers)
+    return ctx
+
+
+def cmd_stats(args, rels: list[str], ctx: dict) -> int:
+    # unknown tokens are counted once on the merged counter, workers do not need the vocabulary
+    vocab = ctx.pop("vocab", None)
+    vocab = set(vocab) if vocab is not None else None
+    res = run_pool("stats", args.folder, rels, ctx, args.workers, args.quiet)
+    tokens = res["tokens"]
+    total_tokens = sum(tokens.values())
+    summary = {
+        "images": res["images"],
+        "captioned": res["captioned"],
+        "missing": res["images"] - res["captioned"],
+        "empty": res["empty"],
+        "unique_tokens": len(tokens),
+        "total_tokens": total_tokens,
+        "tokens_per_caption": (total_tokens / res["captioned"]) if res["captioned"] else 0.0,
+        "unknown_tokens": len([t for t in tokens if t not in vocab]) if vocab is not None else None,
+        "top": tokens.most_common(args.top),
+    }
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return 0
+    for key in ("images", "captioned", "missing", "empty", "unique_tokens", "total_tokens", "unknown_tokens"):
+        if summary[key] is not None:
+            print(f"{key:20s} {summary[key]}")
+    print(f"{'tokens_per_caption':20s} {summary['tokens_per_caption']:.2f}")
+    for t, n in summary["top"]:
+        print(f"  {n:8d}  {t}")
+    return 0
+
+
+def cmd_validate(args, rels: list[str], ctx: dict) -> int:
+    if args.no_vocab:
+        ctx.pop("vocab", None)
+    res = run_pool("validate", args.folder, rels, ctx, args.workers, args.quiet)
+    issues = res["issues"] + [(rel, "orphan caption") for rel in _orphan_captions(args.folder, rels, args.recursive)]
+    if args.json:
+        print(json.dumps([{"path": p, "issue": i} for p, i in issues], ensure_ascii=False, indent=2))
+    else:
+        for p, i in issues:
+            print(f"{p}: {i}")
+        print(f"{len(issues)} issue(s) in {res['images']} images", file=sys.stderr)
+    return 1 if issues else 0
+
+
+def cmd_rewrite(args, rels: list[str], ctx: dict, op: str) -> int:
+    ctx.pop("vocab", None)
+    res = run_pool(op, args.folder, rels, ctx, args.workers, args.quiet)
+    verb = "would change" if args.dry_run else "changed"
+    print(f"{verb} {res['changed']} of {res['captioned']} captions")
+    return 0
+
+
+def cmd_export(args, ctx: dict) -> int:
+    from dataset_export import export_dataset
+
+    progress = _Progress("export", 0, args.quiet)
+    try:
+        res = export_dataset(
+            args.folder, args.out, ctx["groups"], ctx["group_order"],
+            shard_size=args.shard_size, fmt=args.format, workers=args.workers,
+            resume=not args.no_resume, recursive=args.recursive, progress=progress
+        )
+    except ValueError as e:
+        progress.finish()
+        print(str(e), file=sys.stderr)
+        return 2
+    progress.finish()
+    print(f"{res['images']} images in {res['shards']} shards ({res['written']} written, {res['skipped']} up to date)")
+    return 0
+
+
+def cmd_buckets(args, rels: list[str]) -> int:
+    from aspect_buckets import make_buckets, parse_buckets, analyze
+
+    buckets = parse_buckets(args.buckets) if args.buckets else make_buckets(args.resolution, args.step)
+    progress = _Progress("buckets", len(rels), args.quiet)
+    res = analyze([os.path.join(args.folder, r) for r in rels], buckets, args.crop_threshold,
+                  workers=args.workers * 2, progress=progress)
+    progress.finish()
+
+    def rel(p: str) -> str:
+        return os.path.relpath(p, args.folder)
+
+    if args.json:
+        print(json.dumps({
+            "images": res["images"],
+            "buckets": {f"{w}x{h}": len(v) for (w, h), v in res["buckets"].items() if v},
+            "cropped": [{"path": rel(p), "crop": round(c, 4)} for p, c in res["cropped"]],
+            "under": [{"path": rel(p), "size": list(s)} for p, s in res["under"]],
+            "unreadable": [rel(p) for p in res["unreadable"]],
+        }, ensure_ascii=False, indent=2))
+        return 0
+
+    peak = max([len(v) for v in res["buckets"].values()] + [1])
+    for (w, h), paths in res["buckets"].items():
+        if paths:
+            print(f"{w:5d}x{h:<5d} {w / h:5.2f} {len(paths):8d}  {'#' * max(1, round(len(paths) / peak * 40))}")
+    print(f"heavy crop (> {args.crop_threshold * 100:.0f}%): {len(res['cropped'])}")
+    print(f"under-resolution:      {len(res['under'])}")
+    print(f"unreadable:            {len(res['unreadable'])}")
+    return 0
+
+
+def cmd_resize(args, rels: list[str]) -> int:
+    from aspect_buckets import make_buckets, parse_buckets
+    from resize_pipeline import run_pipeline, throughput_lines
+
+    buckets = parse_buckets(args.buckets) if args.buckets else make_buckets(args.resolution, args.step)
+    progress = _Progress("resize", len(rels), args.quiet)
+    res = run_pipeline(
+        args.folder, [os.path.join(args.folder, r) for r in rels], buckets,
+        out_dir=args.out, suffix=args.suffix, policy=args.crop, fmt=args.format, quality=args.quality,
+        upscale=args.upscale, force=args.force, workers=args.workers, progress=progress
+    )
+    progress.finish()
+    for src, err in res["failed"]:
+        print(f"{os.path.relpath(src, args.folder)}: {err}", file=sys.stderr)
+    print(f"{res['written']} written, {res['skipped']} up to date, {res['captions']} captions copied, "
+          f"{len(res['failed'])} failed in {res['elapsed_s']:.1f} s")
+    for line in throughput_lines(res):
+        print(line)
+    return 1 if res["failed"] else 0
+
+
+def cmd_dupes(args, rels: list[str]) -> int:
+    from dedupe import compute_hashes, find_clusters
+
+    progress = _Progress("hash", len(rels), args.quiet)
+    hashes, failed = compute_hashes(args.folder, [os.path.join(args.folder, r) for r in rels],
+                                    workers=args.workers, progress=progress)
+    progress.finish()
+    t0 = time.perf_counter()
+    clusters = find_clusters(hashes, args.hash, args.radius, workers=args.workers)
+    search_s = time.perf_counter() - t0
+
+    groups = [[os.path.relpath(p, args.folder) for p in c] for c in clusters]
+    if args.json:
+        print(json.dumps({"groups": groups, "unreadable": [os.path.relpath(p, args.folder) for p, _e in failed]},
+                         ensure_ascii=False, indent=2))
+        return 0
+    for n, group in enumerate(groups, 1):
+        print(f"group {n} ({len(group)})")
+        for rel in group:
+            print(f"  {rel}")
+    print(f"{len(groups)} group(s), {sum(len(g) - 1 for g in groups)} redundant image(s), "
+          f"{len(failed)} unreadable; search {search_s:.2f} s", file=sys.stderr)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    base = _base_dir()
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("folder")
+    common.add_argument("--recursive", action="store_true", help="include subfolders")
+    common.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    # same resolution as the GUI: vocabulary files relative to the working directory, settings next to the app
+    common.add_argument("--triggers", default=os.path.abspath(DEFAULT_TRIGGERS_FILE))
+    common.add_argument("--groups", default=os.path.abspath(DEFAULT_GROUPS_FILE))
+    common.add_argument("--settings", default=os.path.join(base, SETTINGS_FILE), help="group_order is read from here")
+    common.add_argument("--quiet", action="store_true", help="no progress output")
+
+    ap = argparse.ArgumentParser(prog="icaption", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("stats", parents=[common], help="token statistics")
+    p.add_argument("--top", type=int, default=20)
+    p.add_argument("--json", action="store_true")
+
+    p = sub.add_parser("validate", parents=[common], help="report caption problems, exit 1 if any")
+    p.add_argument("--check-order", action="store_true", help="also require group order")
+    p.add_argument("--no-vocab", action="store_true", help="do not report tokens missing from triggers.txt")
+    p.add_argument("--json", action="store_true")
+
+    for name, helptext in (("rewrite", "normalize captions"), ("reorder", "sort caption tokens by group order")):
+        p = sub.add_parser(name, parents=[common], help=helptext)
+        p.add_argument("--dry-run", action="store_true")
+
+    p = sub.add_parser("export", parents=[common], help="sharded tar export")
+    p.add_argument("--out", required=True)
+    p.add_argument("--format", choices=EXPORT_FORMATS, default="wds")
+    p.add_argument("--shard-size", type=int, default=1000)
+    p.add_argument("--no-resume", action="store_true")
+
+    bucket_opts = argparse.ArgumentParser(add_help=False)
+    bucket_opts.add_argument("--resolution", type=int, default=1024)
+    bucket_opts.add_argument("--step", type=int, default=64)
+    bucket_opts.add_argument("--buckets", help="explicit bucket list, e.g. '1024x1024,1152x896'")
+
+    p = sub.add_parser("buckets", parents=[common, bucket_opts], help="aspect-ratio bucket histogram")
+    p.add_argument("--crop-threshold", type=float, default=0.15, help="report images losing more than this fraction")
+    p.add_argument("--json", action="store_true")
+
+    p = sub.add_parser("resize", parents=[common, bucket_opts], help="resize/crop/convert to training buckets")
+    p.add_argument("--out", help="output folder (default: next to the originals, see --suffix)")
+    p.add_argument("--suffix", default="_train", help="file name suffix when writing next to the originals")
+    p.add_argument("--crop", choices=CROP_POLICIES, default="center")
+    p.add_argument("--format", choices=OUTPUT_FORMATS, default="png")
+    p.add_argument("--quality", type=int, default=95, help="JPEG/WebP quality")
+    p.add_argument("--upscale", action="store_true", help="also enlarge images smaller than their bucket")
+    p.add_argument("--force", action="store_true", help="rewrite outputs that are up to date")
+
+    p = sub.add_parser("dupes", parents=[common], help="near-duplicate groups by perceptual hash")
+    p.add_argument("--hash", choices=HASH_KINDS, default="phash")
+    p.add_argument("--radius", type=_radius, default=DEFAULT_RADIUS, help="max Hamming distance in bits (of 64)")
+    p.add_argument("--json", action="store_true")
+    return ap
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.folder):
+        print(f"Not a folder: {args.folder}", file=sys.stderr)
+        return 2
+
+    ctx = _load_context(args)
+    if args.command == "export":
+        return cmd_export(args, ctx)
+
+    rels = [it[0] for it in scan_dataset(args.folder, recursive=args.recursive)]
+    if args.command == "stats":
+        return cmd_stats(args, rels, ctx)
+    if args.command == "validate":
+        return cmd_validate(args, rels, ctx)
+    if args.command == "buckets":
+        return cmd_buckets(args, rels)
+    if args.command == "resize":
+        return cmd_resize(args, rels)
+    if args.command == "dupes":
+        return cmd_dupes(args, rels)
+    return cmd_rewrite(args, rels, ctx, args.command)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
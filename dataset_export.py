@@ -0,0 +1,263 @@
+import os, io, json, hashlib, tarfile, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from constants import IMAGE_EXTS, CAPTION_JOINER
+from io_store import caption_path_for, parse_caption_tokens, order_tokens_by_groups
+
+# "tar"  -> original file names + .caption sidecars (same layout as the dataset folder)
+# "wds"  -> WebDataset style: <key>.<ext> + <key>.txt, key has no dots ("." and "%" are %-escaped)
+EXPORT_FORMATS = ("wds", "tar")
+
+SHARD_NAME = "shard-{:06d}"
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def scan_dataset(folder: str, recursive: bool = False) -> list[tuple[str, int, int, int, int]]:
+    """
+    (relative image path, size, mtime_ns, caption size, caption mtime_ns) sorted like the image list;
+    the caption fields are -1 without a .caption sidecar.
+    """
+    items = []
+    stack = [folder]
+    while stack:
+        d = stack.pop()
+        images = []
+        captions = {}
+        try:
+            with os.scandir(d) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        if recursive:
+                            stack.append(entry.path)
+                        continue
+                    stem, ext = os.path.splitext(entry.name)
+                    ext = ext.lower()
+                    if ext == ".caption":
+                        st = entry.stat()
+                        captions[os.path.normcase(stem)] = (st.st_size, st.st_mtime_ns)
+                    elif ext in IMAGE_EXTS:
+                        st = entry.stat()
+                        images.append((entry.path, stem, st.st_size, st.st_mtime_ns))
+        except OSError:
+            continue
+        for path, stem, size, mtime in images:
+            cap_size, cap_mtime = captions.get(os.path.normcase(stem), (-1, -1))
+            items.append((os.path.relpath(path, folder), size, mtime, cap_size, cap_mtime))
+    items.sort(key=lambda x: x[0].lower())
+    return items
+
+
+def plan_shards(items: list[tuple], max_count: int = 1000, max_bytes: int = 0) -> list[list[tuple]]:
+    shards = []
+    cur = []
+    cur_bytes = 0
+    max_count = max(1, int(max_count or 1))
+    for it in items:
+        if cur and (len(cur) >= max_count or (max_bytes and cur_bytes + it[1] > max_bytes)):
+            shards.append(cur)
+            cur = []
+            cur_bytes = 0
+        cur.append(it)
+        cur_bytes += it[1]
+    if cur:
+        shards.append(cur)
+    return shards
+
+
+def _shard_digest(shard: list[tuple], fmt: str, caption_sig: str) -> str:
+    h = hashlib.sha1()
+    # shards written with the old "." -> "_" keys are redone on resume
+    h.update((fmt + ":key-pct" if fmt == "wds" else fmt).encode("utf-8"))
+    h.update(caption_sig.encode("utf-8"))
+    # the caption stat too: an edited caption alone has to redo its shard
+    for rel, size, mtime, cap_size, cap_mtime in shard:
+        h.update(f"{rel}\0{size}\0{mtime}\0{cap_size}\0{cap_mtime}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _wds_key(rel: str) -> str:
+    noext = os.path.splitext(rel)[0].replace("\\", "/")
+    # reversible, so a.b.png and a_b.png stay two samples
+    return noext.replace("%", "%25").replace(".", "%2E")
+
+
+def _check_wds_keys(items: list[tuple]):
+    """a.png next to a.jpg would share a key and merge into one sample."""
+    seen = {}
+    for it in items:
+        rel = it[0]
+        key = _wds_key(rel)
+        if key in seen:
+            raise ValueError(f"Images map to the same WebDataset key '{key}': {seen[key]}, {rel}")
+        seen[key] = rel
+
+
+def _read_caption(image_path: str) -> str | None:
+    cap = caption_path_for(image_path)
+    try:
+        with open(cap, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _add_bytes(tar: tarfile.TarFile, name: str, data: bytes, mtime: float):
+    ti = tarfile.TarInfo(name)
+    ti.size = len(data)
+    ti.mtime = int(mtime)
+    ti.mode = 0o644
+    tar.addfile(ti, io.BytesIO(data))
+
+
+def _write_shard(folder: str, out_dir: str, idx: int, shard: list, fmt: str,
+                 groups: dict, group_order: list, digest: str, on_item=None) -> list[dict]:
+    base = SHARD_NAME.format(idx)
+    tar_path = os.path.join(out_dir, base + ".tar")
+    part_path = tar_path + ".part"
+    rows = []
+
+    with tarfile.open(part_path, "w", format=tarfile.PAX_FORMAT) as tar:
+        for rel, size, mtime_ns, _cap_size, _cap_mtime in shard:
+            img_path = os.path.join(folder, rel)
+            text = _read_caption(img_path)
+            tokens = order_tokens_by_groups(parse_caption_tokens(text), groups, group_order) if text is not None else []
+            caption = CAPTION_JOINER.join(tokens)
+
+            ext = os.path.splitext(rel)[1].lower()
+            arc_rel = rel.replace("\\", "/")
+            if fmt == "wds":
+                key = _wds_key(rel)
+                img_name = key + ext
+                cap_name = key + ".txt"
+            else:
+                key = os.path.splitext(arc_rel)[0]
+                img_name = arc_rel
+                cap_name = key + ".caption"
+
+            # streamed in chunks by tarfile, the image is never held in memory
+            ti = tarfile.TarInfo(img_name)
+            ti.size = size
+            ti.mtime = mtime_ns // 1_000_000_000
+            ti.mode = 0o644
+            with open(img_path, "rb") as fh:
+                tar.addfile(ti, fh)
+
+            if text is not None:
+                _add_bytes(tar, cap_name, caption.encode("utf-8"), ti.mtime)
+
+            rows.append({
+                "key": key,
+                "shard": base + ".tar",
+                "image": img_name,
+                "caption": cap_name if text is not None else None,
+                "tokens": tokens,
+                "bytes": size,
+            })
+            if on_item:
+                on_item()
+
+    os.replace(part_path, tar_path)
+
+    # the shard manifest doubles as the "done" marker used when resuming
+    man_path = os.path.join(out_dir, base + ".json")
+    tmp = man_path + ".part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"digest": digest, "count": len(rows), "items": rows}, f, ensure_ascii=False)
+    os.replace(tmp, man_path)
+    return rows
+
+
+def _shard_done(out_dir: str, idx: int, digest: str) -> bool:
+    base = SHARD_NAME.format(idx)
+    if not os.path.exists(os.path.join(out_dir, base + ".tar")):
+        return False
+    try:
+        with open(os.path.join(out_dir, base + ".json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get("digest") == digest
+    except Exception:
+        return False
+
+
+def _write_manifest(out_dir: str, count: int):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    tmp = path + ".part"
+    with open(tmp, "w", encoding="utf-8") as out:
+        for idx in range(count):
+            with open(os.path.join(out_dir, SHARD_NAME.format(idx) + ".json"), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for row in data.get("items", []):
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def export_dataset(folder: str, out_dir: str, groups: dict, group_order: list,
+                   shard_size: int = 1000, shard_bytes: int = 0, fmt: str = "wds",
+                   workers: int = 4, resume: bool = True, recursive: bool = False,
+                   progress=None, cancel: threading.Event | None = None) -> dict:
+    """
+    Streams images + captions into sharded tar archives and writes manifest.jsonl.
+    Finished shards whose content digest still matches are skipped on resume.
+    progress(done_items, total_items) is called from worker threads.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    items = scan_dataset(folder, recursive=recursive)
+    if fmt == "wds":
+        _check_wds_keys(items)
+    shards = plan_shards(items, shard_size, shard_bytes)
+
+    caption_sig = json.dumps([group_order or [], sorted((groups or {}).items())], ensure_ascii=False)
+    digests = [_shard_digest(s, fmt, caption_sig) for s in shards]
+
+    total = len(items)
+    done = [0]
+    lock = threading.Lock()
+
+    def _tick(n: int = 1):
+        with lock:
+            done[0] += n
+            cur = done[0]
+        if progress:
+            progress(cur, total)
+
+    todo = []
+    skipped = 0
+    for idx, shard in enumerate(shards):
+        if resume and _shard_done(out_dir, idx, digests[idx]):
+            skipped += 1
+            _tick(len(shard))
+        else:
+            todo.append(idx)
+
+    # stale shards from a previous, larger export would otherwise end up in the output dir
+    idx = len(shards)
+    while os.path.exists(os.path.join(out_dir, SHARD_NAME.format(idx) + ".tar")):
+        for ext in (".tar", ".json"):
+            try:
+                os.remove(os.path.join(out_dir, SHARD_NAME.format(idx) + ext))
+            except OSError:
+                pass
+        idx += 1
+
+    def _job(i: int) -> bool:
+        if cancel is not None and cancel.is_set():
+            return False
+        _write_shard(folder, out_dir, i, shards[i], fmt, groups, group_order, digests[i], on_item=_tick)
+        return True
+
+    written = 0
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as ex:
+        futures = [ex.submit(_job, i) for i in todo]
+        for fut in as_completed(futures):
+            if fut.result():
+                written += 1
+
+    if cancel is not None and cancel.is_set():
+        # shards finished before the cancel are complete and count, a resume skips them
+        return {"images": total, "shards": len(shards), "written": written, "skipped": skipped, "cancelled": True}
+
+    _write_manifest(out_dir, len(shards))
+    return {"images": total, "shards": len(shards), "written": written, "skipped": skipped, "cancelled": False}
@@ -0,0 +1,180 @@
+import os, csv, json, threading
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import IMAGE_EXTS, CAPTION_JOINER
+from io_store import caption_path_for, parse_caption_tokens
+
+IMPORT_SOURCES = ("txt", "jsonl", "csv")
+
+# column / key names used by the common dataset tools (HF imagefolder, kohya, booru dumps)
+FILE_KEYS = ("file_name", "filename", "file", "image", "path")
+TEXT_KEYS = ("text", "caption", "tags", "prompt")
+
+
+def _pick(row: dict, keys: tuple[str, ...]):
+    for k in keys:
+        v = row.get(k)
+        if v not in (None, ""):
+            return v
+    return None
+
+
+def _as_text(v) -> str:
+    if isinstance(v, (list, tuple)):
+        return ", ".join(str(x) for x in v)
+    return str(v)
+
+
+def _inside(folder: str, name) -> str | None:
+    # metadata comes from elsewhere: absolute names, "../" or symlinks must not land outside folder
+    path = os.path.join(folder, str(name))
+    root = os.path.realpath(folder)
+    try:
+        if os.path.commonpath([root, os.path.realpath(path)]) != root:
+            return None
+    except ValueError:
+        return None  # different drives on Windows
+    return path
+
+
+def iter_txt_sidecars(folder: str):
+    with os.scandir(folder) as it:
+        for entry in it:
+            if not entry.is_file():
+                continue
+            stem, ext = os.path.splitext(entry.path)
+            if ext.lower() not in IMAGE_EXTS:
+                continue
+            txt = stem + ".txt"
+            try:
+                with open(txt, "r", encoding="utf-8") as f:
+                    yield entry.path, f.read()
+            except FileNotFoundError:
+                continue
+
+
+def iter_metadata_jsonl(folder: str, path: str, progress_bytes=None):
+    # line by line, multi-GB metadata files are never loaded whole
+    with open(path, "rb") as f:
+        for raw in f:
+            if progress_bytes:
+                progress_bytes(len(raw))
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(row, dict):
+                continue
+            name = _pick(row, FILE_KEYS)
+            text = _pick(row, TEXT_KEYS)
+            if name is None or text is None:
+                continue
+            img_path = _inside(folder, name)
+            if img_path is None:
+                continue
+            yield img_path, _as_text(text)
+
+
+def iter_metadata_csv(folder: str, path: str, progress_bytes=None):
+    # utf-8-sig: spreadsheet exports start with a BOM, which would otherwise stick to the first header
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if progress_bytes:
+                # approximate, csv hides the raw line length
+                progress_bytes(sum(len(v or "") + 1 for v in row.values()))
+            name = _pick(row, FILE_KEYS)
+            text = _pick(row, TEXT_KEYS)
+            if name is None or text is None:
+                continue
+            img_path = _inside(folder, name)
+            if img_path is None:
+                continue
+            yield img_path, _as_text(text)
+
+
+def import_captions(folder: str, source: str, metadata_path: str | None = None,
+                    overwrite: bool = False, vocabulary: set[str] | None = None,
+                    workers: int = 4, max_pending: int = 512,
+                    progress=None, cancel: threading.Event | None = None) -> dict:
+    """
+    Converts foreign caption sources into .caption files.
+    Records are streamed and written by a thread pool, at most max_pending are in flight.
+    If vocabulary is given, tokens not in it are collected into result["new_tokens"].
+    progress(records_done, fraction_or_None) is called from the calling thread.
+    """
+    if source not in IMPORT_SOURCES:
+        raise ValueError(f"Unknown import source: {source}")
+
+    total_bytes = 0
+    read_bytes = [0]
+
+    def _on_bytes(n: int):
+        read_bytes[0] += n
+
+    if source == "txt":
+        records = iter_txt_sidecars(folder)
+    else:
+        if not metadata_path:
+            metadata_path = os.path.join(folder, "metadata." + source)
+        total_bytes = os.path.getsize(metadata_path)
+        if source == "jsonl":
+            records = iter_metadata_jsonl(folder, metadata_path, _on_bytes)
+        else:
+            records = iter_metadata_csv(folder, metadata_path, _on_bytes)
+
+    new_tokens: list[str] = []
+    new_seen: set[str] = set()
+    stats = {"records": 0, "written": 0, "skipped": 0, "missing": 0, "errors": 0}
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(max(1, int(max_pending)))
+
+    def _write(cap_path: str, text: str):
+        try:
+            with open(cap_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            key = "written"
+        except Exception:
+            key = "errors"  # also UnicodeEncodeError etc., an exception left in the future is never seen
+        finally:
+            slots.release()
+        with lock:
+            stats[key] += 1
+
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as ex:
+        for img_path, text in records:
+            if cancel is not None and cancel.is_set():
+                break
+
+            stats["records"] += 1
+            if progress and stats["records"] % 500 == 0:
+                progress(stats["records"], read_bytes[0] / total_bytes if total_bytes else None)
+
+            if not os.path.exists(img_path):
+                stats["missing"] += 1
+                continue
+
+            cap_path = caption_path_for(img_path)
+            if not overwrite and os.path.exists(cap_path):
+                stats["skipped"] += 1
+                continue
+
+            tokens = parse_caption_tokens(text)
+            if vocabulary is not None:
+                for t in tokens:
+                    if t not in vocabulary and t not in new_seen:
+                        new_seen.add(t)
+                        new_tokens.append(t)
+
+            slots.acquire()
+            ex.submit(_write, cap_path, CAPTION_JOINER.join(tokens))
+
+    if progress:
+        progress(stats["records"], 1.0 if total_bytes else None)
+
+    stats["new_tokens"] = new_tokens
+    stats["cancelled"] = bool(cancel is not None and cancel.is_set())
+    return stats
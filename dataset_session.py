@@ -0,0 +1,291 @@
+from constants import CAPTION_JOINER
+from io_store import (
+    normalize_trigger,
+    load_triggers, save_triggers,
+    load_groups,
+    parse_caption_tokens,
+    order_tokens_by_groups,
+)
+from caption_store import SidecarCaptionStore, open_caption_store
+from translation_store import TranslationStore
+from vocab_index import LargeVocabulary, wants_large_vocab, save_large_triggers
+
+
+class DatasetSession:
+    """
+    Dataset state and operations without Tk: vocabulary, translations, groups and their order,
+    the open folder and caption I/O.
+
+    The App keeps only widgets and drives this object; batch jobs, benchmarks and worker
+    processes can use it directly. Edits that need persisting are reported through
+    on_dirty(key) with key in ("triggers", "groups"); translations journal themselves.
+    """
+
+    def __init__(
+        self,
+        triggers_path: str,
+        translations_path: str,
+        groups_path: str,
+        group_order: list[str] | None = None,
+        large_vocab: str = "auto",
+    ):
+        self.triggers_path = triggers_path
+        self.translations_path = translations_path
+        self.groups_path = groups_path
+        self.group_order = list(group_order) if isinstance(group_order, list) else []
+        self.large_vocab = large_vocab
+        self.on_dirty = None
+
+        self.translation_store = TranslationStore(translations_path)
+        self.groups = load_groups(groups_path)
+
+        # large-vocabulary mode: vocab is the full memory-mapped list,
+        # triggers only the curated/used part that gets UI rows
+        self.vocab = None
+        self.triggers: list[str] = []
+        self.load_vocabulary()
+        self.deleted_triggers: set[str] = set()
+
+        # ===== open folder =====
+        self.caption_store = SidecarCaptionStore()
+        self.folder = None
+        self.images: list[str] = []
+        self.index = -1
+
+    @property
+    def translations(self) -> dict[str, str]:
+        return self.translation_store.data
+
+    def _dirty(self, key: str):
+        if self.on_dirty is not None:
+            self.on_dirty(key)
+
+    # ===== vocabulary =====
+    def load_vocabulary(self) -> list[str]:
+        if self.vocab is not None:
+            self.vocab.close()
+            self.vocab = None
+
+        if not wants_large_vocab(self.triggers_path, self.large_vocab):
+            self.triggers = load_triggers(self.triggers_path)
+            return self.triggers
+
+        self.vocab = LargeVocabulary(self.triggers_path)
+        curated = {}
+        for arr in self.groups.values():
+            for t in arr:
+                if t in self.vocab:
+                    curated[t] = None
+        for t in self.translations:
+            if t in self.vocab:
+                curated[t] = None
+        self.triggers = list(curated)
+        return self.triggers
+
+    def snapshot_triggers(self):
+        path = self.triggers_path
+        if self.vocab is not None:
+            snap = self.vocab.snapshot()
+            return lambda: save_large_triggers(path, snap)
+        triggers = list(self.triggers)
+        return lambda: save_triggers(path, triggers)
+
+    def promote(self, tokens):
+        """Large mode: give vocabulary tokens that are in use a place in self.triggers."""
+        if self.vocab is None:
+            return
+        have = set(self.triggers)
+        for t in tokens:
+            if t not in have and t in self.vocab:
+                have.add(t)
+                self.triggers.append(t)
+
+    def has_trigger(self, t: str) -> bool:
+        return t in self.triggers or (self.vocab is not None and t in self.vocab)
+
+    def suggestions(self, prefix: str, limit: int) -> list[str]:
+        prefix = normalize_trigger(prefix)
+        if not prefix:
+            return []
+        if self.vocab is not None:
+            return self.vocab.prefix(prefix, limit)
+        low = prefix.lower()
+        return sorted(t for t in self.triggers if t.lower().startswith(low))[:limit]
+
+    def add_trigger(self, t: str) -> bool:
+        """False if the trigger is already known."""
+        if t in self.triggers:
+            return False
+        if self.vocab is not None and t in self.vocab:
+            self.promote([t])
+            return False
+        self.triggers.append(t)
+        if self.vocab is not None:
+            self.vocab.add(t)
+        self._dirty("triggers")
+        return True
+
+    def delete_triggers(self, triggers: list[str]) -> bool:
+        """Remove from the vocabulary, translations and all groups. True if any group changed."""
+        gone = set(triggers)
+        self.triggers = [t for t in self.triggers if t not in gone]
+        if self.vocab is not None:
+            for t in triggers:
+                self.vocab.remove(t)
+        self._dirty("triggers")
+
+        self.translation_store.remove_many(triggers)
+
+        changed = False
+        for g in list(self.groups.keys()):
+            if any(t in gone for t in self.groups[g]):
+                self.groups[g] = [t for t in self.groups[g] if t not in gone]
+                changed = True
+        if changed:
+            self._dirty("groups")
+
+        self.deleted_triggers.update(gone)
+        return changed
+
+    def set_translation(self, t: str, text: str):
+        text = (text or "").strip()
+        if text:
+            self.translation_store.upsert(t, text)
+        else:
+            self.translation_store.remove(t)
+
+    def display_text(self, t: str) -> str:
+        tr = (self.translations or {}).get(t, "")
+        tr = tr.strip() if isinstance(tr, str) else ""
+        if tr:
+            return f"{tr} ({t})"
+        return t
+
+    # ===== groups =====
+    def group_names(self) -> list[str]:
+        return sorted(self.groups.keys(), key=lambda s: s.lower())
+
+    def group_of(self, t: str) -> str | None:
+        for gname, items in self.groups.items():
+            if t in items:
+                return gname
+        return None
+
+    def add_group(self, name: str):
+        if name in self.groups:
+            raise ValueError(f"Group '{name}' already exists.")
+        self.groups[name] = []
+        if name not in self.group_order:
+            self.group_order.append(name)
+        self._dirty("groups")
+
+    def rename_group(self, old: str, new: str):
+        if new in self.groups and new != old:
+            raise ValueError(f"Group '{new}' already exists.")
+        if old == new or old not in self.groups:
+            return
+        self.groups[new] = list(self.groups.get(old, []))
+        self.groups.pop(old, None)
+        self.group_order = [new if g == old else g for g in self.group_order]
+        self._dirty("groups")
+
+    def delete_group(self, name: str, with_triggers: bool = False) -> list[str]:
+        """Returns the triggers deleted together with the group."""
+        deleted = list(self.groups.get(name, [])) if with_triggers else []
+        if deleted:
+            self.delete_triggers(deleted)
+        self.groups.pop(name, None)
+        self.group_order = [g for g in self.group_order if g != name]
+        self._dirty("groups")
+        return deleted
+
+    def add_to_group(self, t: str, group: str, exclusive: bool = False):
+        if exclusive:
+            for g in list(self.groups.keys()):
+                if t in self.groups[g]:
+                    self.groups[g] = [x for x in self.groups[g] if x != t]
+        if group not in self.groups:
+            self.groups[group] = []
+        if t not in self.groups[group]:
+            self.groups[group].append(t)
+        self._dirty("groups")
+
+    def order_tokens(self, tokens: list[str]) -> list[str]:
+        return order_tokens_by_groups(tokens, self.groups, self.group_order)
+
+    # ===== folder and captions =====
+    def scan(self, folder: str, backend: str = "sidecar"):
+        """Thread-safe: returns (items, store) without touching the session; adopt() applies them."""
+        store = self.caption_store
+        if store.backend != backend or store.folder != folder:
+            store = open_caption_store(folder, backend)
+        return store.scan_images(folder), store
+
+    def adopt(self, folder: str, items, store=None):
+        if store is not None and store is not self.caption_store:
+            try:
+                self.close_caption_store()
+            except Exception:
+                pass
+            self.caption_store = store
+        self.folder = folder
+        self.images = [p for (p, _has) in items]
+        self.index = 0 if self.images else -1
+
+    def close_caption_store(self):
+        store = self.caption_store
+        self.caption_store = SidecarCaptionStore()
+        if hasattr(store, "materialize"):
+            store.materialize()
+        store.close()
+
+    def caption_exists(self, image_path: str) -> bool:
+        return self.caption_store.exists(image_path)
+
+    def read_caption(self, image_path: str) -> list[str] | None:
+        text = self.caption_store.read(image_path)
+        if text is None:
+            return None
+        tokens = parse_caption_tokens(text)
+        self.promote(tokens)
+        return tokens
+
+    def split_caption(self, tokens: list[str]) -> tuple[list[str], list[str]]:
+        """(known, unknown) tokens, leaving out triggers deleted in this session."""
+        trigger_set = set(self.triggers)
+        known = [t for t in tokens if t in trigger_set and t not in self.deleted_triggers]
+        unknown = [t for t in tokens if t not in trigger_set and t not in self.deleted_triggers]
+        return known, unknown
+
+    def unknown_checker(self):
+        """Thread-safe is_unknown(tokens) over a snapshot of the current vocabulary (see split_caption)."""
+        known = frozenset(self.triggers)
+        deleted = frozenset(self.deleted_triggers)
+        in_vocab = self.vocab.lookup_snapshot() if self.vocab is not None else None
+
+        def is_unknown(tokens) -> bool:
+            for t in tokens:
+                if t in deleted or t in known:
+                    continue
+                # large mode: reading the caption would promote vocabulary tokens
+                if in_vocab is not None and in_vocab(t):
+                    continue
+                return True
+            return False
+        return is_unknown
+
+    def write_caption(self, image_path: str, tokens: list[str]) -> str:
+        text = CAPTION_JOINER.join(self.order_tokens(tokens))
+        self.caption_store.write(image_path, text)
+        return text
+
+    def close(self):
+        try:
+            self.close_caption_store()
+        finally:
+            try:
+                self.translation_store.close()
+            finally:
+                if self.vocab is not None:
+                    self.vocab.close()
+                    self.vocab = None
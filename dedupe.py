@@ -0,0 +1,263 @@
+"""
+Duplicate / near-duplicate detection with 64-bit perceptual hashes.
+
+    aHash  8x8 mean threshold
+    dHash  9x8 horizontal gradient sign
+    pHash  32x32 DCT-II, 8x8 low frequencies against their median
+
+Hashes are computed on a process pool and cached per dataset folder by (path, mtime, size).
+Pairs within a Hamming radius r are found with a multi-index hash table: the 64 bits are split
+into r + k blocks, so by pigeonhole any two hashes within r agree exactly on at least k blocks.
+One table per k-block combination groups hashes by those blocks, and only hashes sharing a
+cell are compared instead of every pair.
+"""
+import os, json, math, time, threading, multiprocessing
+from itertools import combinations
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+HASH_KINDS = ("phash", "dhash", "ahash")
+# position in the (ahash, dhash, phash) tuples
+HASH_INDEX = {"ahash": 0, "dhash": 1, "phash": 2}
+HASH_BITS = 64
+DEFAULT_RADIUS = 6
+CACHE_NAME = ".icaption_hashes.json"
+CACHE_VERSION = 1
+CHUNK = 64
+
+# DCT-II basis for the 8 lowest frequencies of a 32-sample signal
+_DCT = [[math.cos((2 * x + 1) * u * math.pi / 64) for x in range(32)] for u in range(8)]
+
+
+def _mp_context():
+    # spawn, not fork: the Duplicates window runs this from a worker thread of the Tk process
+    return multiprocessing.get_context("spawn")
+
+
+# ===== hashing =====
+def _bits(flags) -> int:
+    v = 0
+    for f in flags:
+        v = (v << 1) | (1 if f else 0)
+    return v
+
+
+def _phash(px32: list[int]) -> int:
+    rows = [px32[y * 32:(y + 1) * 32] for y in range(32)]
+    r = [[sum(c * p for c, p in zip(_DCT[u], row)) for u in range(8)] for row in rows]
+    coeffs = [sum(_DCT[v][y] * r[y][u] for y in range(32)) for v in range(8) for u in range(8)]
+    # the DC term only carries brightness, keep it out of the median
+    med = sorted(coeffs[1:])[31]
+    return _bits(c > med for c in coeffs)
+
+
+def image_hashes(path: str) -> tuple[int, int, int]:
+    """(ahash, dhash, phash) of one image."""
+    from image_utils import pil_image
+
+    Image = pil_image()
+    with Image.open(path) as img:
+        img.draft("L", (64, 64))
+        g = img.convert("L")
+    g32 = g.resize((32, 32), Image.Resampling.BOX)
+    px8 = list(g32.resize((8, 8), Image.Resampling.BOX).getdata())
+    mean = sum(px8) / 64.0
+    a = _bits(p > mean for p in px8)
+    px9 = list(g32.resize((9, 8), Image.Resampling.BOX).getdata())
+    d = _bits(px9[y * 9 + x] > px9[y * 9 + x + 1] for y in range(8) for x in range(8))
+    return a, d, _phash(list(g32.getdata()))
+
+
+def _hash_chunk(items: list[tuple[str, str, int, int]]) -> list:
+    out = []
+    for rel, path, mtime, size in items:
+        try:
+            out.append((rel, mtime, size) + image_hashes(path))
+        except Exception as e:
+            out.append((rel, mtime, size, None, None, str(e)))
+    return out
+
+
+# ===== cache =====
+def load_cache(folder: str) -> dict:
+    try:
+        with open(os.path.join(folder, CACHE_NAME), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+        return {}
+    return data.get("items", {})
+
+
+def save_cache(folder: str, items: dict):
+    path = os.path.join(folder, CACHE_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "items": items}, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def compute_hashes(folder: str, paths: list[str], workers: int = 4, progress=None,
+                   cancel: threading.Event | None = None) -> tuple[dict, list[tuple[str, str]]]:
+    """
+    {path: (ahash, dhash, phash)} for paths, reusing cached entries whose mtime and size match.
+    Returns (hashes, failures). progress(done, total) is called from the calling thread.
+    """
+    cache = load_cache(folder)
+    hashes, todo, failed = {}, [], []
+    for p in paths:
+        rel = os.path.relpath(p, folder)
+        try:
+            st = os.stat(p)
+        except OSError as e:
+            failed.append((p, str(e)))
+            continue
+        hit = cache.get(rel)
+        if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            hashes[p] = tuple(hit[2:5])
+        else:
+            todo.append((rel, p, st.st_mtime_ns, st.st_size))
+
+    total = len(paths)
+    done = len(hashes) + len(failed)
+    if progress is not None:
+        progress(done, total)
+
+    if todo:
+        chunks = [todo[i:i + CHUNK] for i in range(0, len(todo), CHUNK)]
+        last_save = time.monotonic()
+        with ProcessPoolExecutor(max_workers=max(1, int(workers)), mp_context=_mp_context()) as ex:
+            futures = [ex.submit(_hash_chunk, c) for c in chunks]
+            for fut in as_completed(futures):
+                if cancel is not None and cancel.is_set():
+                    for f in futures:
+                        f.cancel()
+                    break
+                rows = fut.result()
+                for rel, mtime, size, a, d, p in rows:
+                    path = os.path.join(folder, rel)
+                    if a is None:
+                        failed.append((path, p))
+                        continue
+                    cache[rel] = [mtime, size, a, d, p]
+                    hashes[path] = (a, d, p)
+                done += len(rows)
+                if progress is not None:
+                    progress(done, total)
+                # a long first run survives being interrupted
+                if time.monotonic() - last_save > 30:
+                    save_cache(folder, cache)
+                    last_save = time.monotonic()
+
+        # forget files that are gone
+        live = {os.path.relpath(p, folder) for p in paths}
+        save_cache(folder, {k: v for k, v in cache.items() if k in live})
+
+    return hashes, failed
+
+
+# ===== multi-index hash table =====
+def _plan_tables(n: int, radius: int, bits: int) -> tuple[int, int]:
+    """(blocks, key_blocks) with the lowest estimated cost: table builds plus expected random collisions."""
+    best = None
+    for k in range(1, 5):
+        b = radius + k
+        if b > bits:
+            break
+        tables = math.comb(b, k)
+        key_bits = k * bits / b
+        cost = tables * (n + n * n / 2 ** (key_bits + 1))
+        if best is None or cost < best[0]:
+            best = (cost, b, k)
+    return best[1], best[2]
+
+
+def _combo_pairs(values: list[int], edges: list[int], combos: list[tuple], radius: int) -> dict:
+    blocks = [[(v >> edges[b]) & ((1 << (edges[b + 1] - edges[b])) - 1) for v in values] for b in range(len(edges) - 1)]
+    n = len(values)
+    found = {}
+    for combo in combos:
+        keys = blocks[combo[0]]
+        for b in combo[1:]:
+            w = edges[b + 1] - edges[b]
+            keys = [x << w | y for x, y in zip(keys, blocks[b])]
+        counts = Counter(keys)
+        if len(counts) == n:
+            continue
+        table = {}
+        for i, key in enumerate(keys):
+            if counts[key] > 1:
+                table.setdefault(key, []).append(i)
+        for cell in table.values():
+            for a, b in combinations(cell, 2):
+                if (a, b) not in found:
+                    dist = (values[a] ^ values[b]).bit_count()
+                    if dist <= radius:
+                        found[(a, b)] = dist
+    return found
+
+
+_pool_values = []
+
+
+def _init_pairs_worker(values: list[int]):
+    _pool_values[:] = values
+
+
+def _pool_combo_pairs(edges: list[int], combos: list[tuple], radius: int) -> dict:
+    return _combo_pairs(_pool_values, edges, combos, radius)
+
+
+def near_pairs(values: list[int], radius: int, bits: int = HASH_BITS, workers: int = 1) -> list[tuple[int, int, int]]:
+    """(i, j, distance) for all i < j with popcount(values[i] ^ values[j]) <= radius."""
+    if not 0 <= radius < bits:
+        raise ValueError(f"Distance must be between 0 and {bits - 1} bits, got {radius}")
+    n = len(values)
+    if n < 2:
+        return []
+    blocks, k = _plan_tables(n, radius, bits)
+    edges = [round(i * bits / blocks) for i in range(blocks + 1)]
+    combos = list(combinations(range(blocks), k))
+
+    # tables are independent: spread them over processes for large sets
+    if workers > 1 and n >= 20000 and len(combos) > 1:
+        found = {}
+        parts = [combos[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context(),
+                                 initializer=_init_pairs_worker, initargs=(values,)) as ex:
+            for fut in as_completed([ex.submit(_pool_combo_pairs, edges, part, radius) for part in parts if part]):
+                found.update(fut.result())
+    else:
+        found = _combo_pairs(values, edges, combos, radius)
+    return [(a, b, d) for (a, b), d in found.items()]
+
+
+def find_clusters(hashes: dict, kind: str = "phash", radius: int = DEFAULT_RADIUS, workers: int = 1) -> list[list[str]]:
+    """Groups of paths connected by near-duplicate pairs, largest first, each group sorted by path."""
+    idx = HASH_INDEX[kind]
+    # identical hashes collapse into one node before the pair search
+    by_value = {}
+    for path, hs in hashes.items():
+        by_value.setdefault(hs[idx], []).append(path)
+    values = list(by_value)
+
+    parent = list(range(len(values)))
+
+    def _find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j, _d in near_pairs(values, radius, workers=workers):
+        ri, rj = _find(i), _find(j)
+        if ri != rj:
+            parent[rj] = ri
+
+    groups = {}
+    for i, v in enumerate(values):
+        groups.setdefault(_find(i), []).extend(by_value[v])
+    clusters = [sorted(g, key=lambda p: p.lower()) for g in groups.values() if len(g) > 1]
+    clusters.sort(key=lambda g: (-len(g), g[0].lower()))
+    return clusters
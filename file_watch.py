@@ -0,0 +1,50 @@
+import os, threading
+
+
+def file_signature(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class FileWatcher:
+    """
+    Polls (mtime_ns, size) of a few named files.
+    remember(key) is called after our own writes so they are not reported as changes.
+    """
+
+    def __init__(self):
+        self._paths: dict[str, str] = {}
+        self._sigs: dict[str, tuple[int, int] | None] = {}
+        self._lock = threading.Lock()
+
+    def watch(self, key: str, path: str):
+        sig = file_signature(path)
+        with self._lock:
+            self._paths[key] = path
+            self._sigs[key] = sig
+
+    def remember(self, key: str):
+        with self._lock:
+            path = self._paths.get(key)
+        if path is None:
+            return
+        sig = file_signature(path)
+        with self._lock:
+            self._sigs[key] = sig
+
+    def changed(self, skip=()) -> list[str]:
+        out = []
+        with self._lock:
+            items = list(self._paths.items())
+        for key, path in items:
+            if key in skip:
+                continue
+            sig = file_signature(path)
+            with self._lock:
+                if sig != self._sigs.get(key):
+                    self._sigs[key] = sig
+                    out.append(key)
+        return out
@@ -0,0 +1,193 @@
+import struct
+import threading
+import importlib
+
+# decoders for IMAGE_EXTS beyond Image.preinit() (BMP/GIF/JPEG/PPM/PNG); with these registered,
+# Image.open() only falls back to Image.init() (every plugin) for formats the app doesn't list
+PIL_PLUGINS = ("WebPImagePlugin",)
+
+# Pillow warns above MAX_IMAGE_PIXELS and refuses images over twice it (its default is ~89 MP), so
+# by default nothing over 512 MP opens. Gigapixel scans need the "max_image_megapixels" setting,
+# see set_max_image_pixels().
+MAX_IMAGE_PIXELS = 256 * 1024 * 1024
+_max_pixels = MAX_IMAGE_PIXELS
+
+_pil_lock = threading.Lock()
+_Image = None
+
+
+def pil_image():
+    global _Image
+    if _Image is not None:
+        return _Image
+    with _pil_lock:
+        if _Image is None:
+            from PIL import Image
+            Image.preinit()
+            for name in PIL_PLUGINS:
+                try:
+                    importlib.import_module("PIL." + name)
+                except ImportError:
+                    pass
+            # room for very large scans in the tile viewer, but keep the decompression-bomb guard
+            # for the scraped datasets the same viewer browses
+            Image.MAX_IMAGE_PIXELS = _max_pixels
+            _Image = Image
+    return _Image
+
+
+def set_max_image_pixels(refuse_above: int | None):
+    """
+    Largest image (in pixels) Pillow will open in this process; None or 0 turns the
+    decompression-bomb guard off. Worker processes keep MAX_IMAGE_PIXELS.
+    """
+    global _max_pixels
+    _max_pixels = refuse_above // 2 if refuse_above else None
+    with _pil_lock:
+        if _Image is not None:
+            _Image.MAX_IMAGE_PIXELS = _max_pixels
+
+
+def pil_imagetk():
+    pil_image()
+    from PIL import ImageTk
+    return ImageTk
+
+
+def preload_pil():
+    threading.Thread(target=pil_imagetk, daemon=True).start()
+
+
+def ppm_payload(img, bg: tuple[int, int, int] = (255, 255, 255)) -> bytes:
+    """
+    Binary PPM/PGM bytes that tk.PhotoImage(data=..., format="PPM") reads directly, so the pixel
+    conversion can run off the Tk thread. Alpha is flattened onto bg.
+    """
+    if img.mode == "L":
+        return b"P5 %d %d 255\n" % img.size + img.tobytes()
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        flat = pil_image().new("RGB", img.size, bg)
+        flat.paste(rgba, mask=rgba.getchannel("A"))
+        img = flat
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    return b"P6 %d %d 255\n" % img.size + img.tobytes()
+
+
+# ===== header-only size probing (no Pillow, no pixel decode) =====
+# SOF0..SOF15 minus DHT (C4), JPG (C8) and DAC (CC)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(f) -> tuple[int, int] | None:
+    f.seek(2)
+    while True:
+        b = f.read(1)
+        while b and b != b"\xff":
+            b = f.read(1)
+        while b == b"\xff":
+            b = f.read(1)
+        if not b:
+            return None
+        marker = b[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue
+        seg = f.read(2)
+        if len(seg) < 2:
+            return None
+        length = struct.unpack(">H", seg)[0]
+        if marker in _JPEG_SOF:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            h, w = struct.unpack(">HH", data[1:5])
+            return w, h
+        f.seek(length - 2, 1)
+
+
+def _exif_thumbnail(tiff: bytes) -> bytes | None:
+    """JPEG thumbnail from IFD1 (JPEGInterchangeFormat / ...Length) of an Exif TIFF block."""
+    if tiff[:2] == b"II":
+        e = "<"
+    elif tiff[:2] == b"MM":
+        e = ">"
+    else:
+        return None
+    ifd0 = struct.unpack(e + "I", tiff[4:8])[0]
+    n = struct.unpack(e + "H", tiff[ifd0:ifd0 + 2])[0]
+    ifd1 = struct.unpack(e + "I", tiff[ifd0 + 2 + 12 * n:ifd0 + 6 + 12 * n])[0]
+    if not ifd1:
+        return None
+    n = struct.unpack(e + "H", tiff[ifd1:ifd1 + 2])[0]
+    offset = length = 0
+    for i in range(n):
+        tag, _typ, _count, value = struct.unpack(e + "HHII", tiff[ifd1 + 2 + 12 * i:ifd1 + 14 + 12 * i])
+        if tag == 0x0201:
+            offset = value
+        elif tag == 0x0202:
+            length = value
+    thumb = tiff[offset:offset + length]
+    return thumb if offset and length and thumb[:2] == b"\xff\xd8" else None
+
+
+def read_embedded_thumbnail(path: str) -> bytes | None:
+    """
+    JPEG bytes of the preview a camera/editor embedded in a JPEG (Exif IFD1 or JFIF JFXX),
+    None if there is none. Only the APPn segments in front of the image data are read.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(2) != b"\xff\xd8":
+                return None
+            while True:
+                seg = f.read(4)
+                if len(seg) < 4 or seg[0] != 0xFF:
+                    return None
+                marker = seg[1]
+                length = struct.unpack(">H", seg[2:4])[0]
+                # APPn segments come first; anything else means the image data starts
+                # the length counts its own two bytes; less is a corrupt header
+                if not 0xE0 <= marker <= 0xEF or length < 2:
+                    return None
+                data = f.read(length - 2)
+                if marker == 0xE1 and data[:6] == b"Exif\x00\x00":
+                    thumb = _exif_thumbnail(data[6:])
+                    if thumb:
+                        return thumb
+                elif marker == 0xE0 and data[:5] == b"JFXX\x00" and data[5:6] == b"\x10":
+                    return data[6:]
+    except (OSError, struct.error):
+        return None
+
+
+def read_image_size(path: str) -> tuple[int, int] | None:
+    """(width, height) from the file header for PNG/JPEG/WebP/BMP, None if unknown or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(32)
+            if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+                return struct.unpack(">II", head[16:24])
+            if head[:2] == b"\xff\xd8":
+                return _jpeg_size(f)
+            if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+                kind = head[12:16]
+                if kind == b"VP8 ":
+                    w, h = struct.unpack("<HH", head[26:30])
+                    return w & 0x3FFF, h & 0x3FFF
+                if kind == b"VP8L":
+                    bits = struct.unpack("<I", head[21:25])[0]
+                    return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+                if kind == b"VP8X":
+                    w = int.from_bytes(head[24:27], "little") + 1
+                    h = int.from_bytes(head[27:30], "little") + 1
+                    return w, h
+                return None
+            if head[:2] == b"BM" and len(head) >= 26:
+                if struct.unpack("<I", head[14:18])[0] == 12:
+                    return struct.unpack("<HH", head[18:22])
+                w, h = struct.unpack("<ii", head[18:26])
+                return w, abs(h)
+    except (OSError, struct.error):
+        return None
+    return None
@@ -1,11 +1,30 @@
 import os, re, json
-from typing import Dict, List
+from typing import Dict, List, Iterable
+
+_SPLIT_RE = re.compile(r",|\n")
+_WS_RE = re.compile(r"\s+")
 
 def normalize_trigger(s: str) -> str:
     s = s.strip()
-    s = re.sub(r"\s+", " ", s)
+    s = _WS_RE.sub(" ", s)
     return s
 
+def _tokenize(text: str, intern_table: dict | None = None) -> list[str]:
+    flat = text.replace("\n", ",")
+    # every whitespace char except the ASCII space is non-printable, so printable text
+    # without double spaces is already normalized and only needs splitting and stripping
+    if flat.isprintable() and "  " not in flat:
+        tokens = [p.strip() for p in flat.split(",")]
+    else:
+        tokens = [_WS_RE.sub(" ", p.strip()) for p in _SPLIT_RE.split(text)]
+    if intern_table is not None:
+        setdefault = intern_table.setdefault
+        tokens = [setdefault(t, t) for t in tokens if t]
+    # dict keeps insertion order: same first-seen dedup as before
+    seen = dict.fromkeys(tokens)
+    seen.pop("", None)
+    return list(seen)
+
 def load_triggers(triggers_path: str) -> list[str]:
     if not os.path.exists(triggers_path):
         with open(triggers_path, "w", encoding="utf-8") as f:
@@ -15,16 +34,7 @@ def load_triggers(triggers_path: str) -> list[str]:
     with open(triggers_path, "r", encoding="utf-8") as f:
         data = f.read()
 
-    raw = [x for x in re.split(r",|\n", data) if x.strip()]
-    triggers = [normalize_trigger(x) for x in raw]
-
-    seen = set()
-    out = []
-    for t in triggers:
-        if t and t not in seen:
-            seen.add(t)
-            out.append(t)
-    return out
+    return _tokenize(data)
 
 def save_triggers(triggers_path: str, triggers: list[str]) -> None:
     content = ", ".join(triggers)
@@ -112,16 +122,39 @@ def parse_caption_tokens(text: str) -> list[str]:
     text = text.strip()
     if not text:
         return []
-    parts = re.split(r",|\n", text)
-    tokens = [normalize_trigger(p) for p in parts if p.strip()]
-    seen = set()
+    return _tokenize(text)
+
+def parse_many(texts: Iterable[str], intern: bool = False) -> list[list[str]]:
+    """
+    Batch version of parse_caption_tokens (same result per text).
+    intern=True makes equal tokens share one string object across the whole batch.
+    """
+    table = {} if intern else None
+    tok = _tokenize
     out = []
-    for t in tokens:
-        if t and t not in seen:
-            seen.add(t)
-            out.append(t)
+    for text in texts:
+        text = text.strip()
+        out.append(tok(text, table) if text else [])
     return out
 
+def caption_path_for(image_path: str) -> str:
+    return os.path.splitext(image_path)[0] + ".caption"
+
+def order_tokens_by_groups(tokens: list[str], groups: dict[str, list[str]], group_order: list[str]) -> list[str]:
+    trig_to_group = {}
+    for gname, arr in (groups or {}).items():
+        for tr in arr:
+            trig_to_group[tr] = gname
+
+    pr = {g: i for i, g in enumerate(group_order or [])}
+    unknown_pr = 10_000
+
+    return sorted(tokens, key=lambda t: (
+        pr.get(trig_to_group.get(t, ""), unknown_pr),
+        (trig_to_group.get(t, "") or "").lower(),
+        t.lower()
+    ))
+
 def load_settings(path: str) -> dict:
     try:
         if not os.path.exists(path):
@@ -0,0 +1,153 @@
+import os, time, tkinter
+from collections import deque
+
+# callbacks faster than this are not worth a stats entry
+MIN_RECORD_S = 0.004
+
+
+def unwrap_callback(func):
+    """The function passed to after(): Misc.after wraps it in a local callit closure."""
+    code = getattr(func, "__code__", None)
+    if code is not None and code.co_name == "callit" and func.__closure__:
+        cell = dict(zip(code.co_freevars, func.__closure__)).get("func")
+        if cell is not None:
+            try:
+                return cell.cell_contents
+            except ValueError:
+                pass
+    return func
+
+
+def callback_name(func) -> str:
+    f = unwrap_callback(func)
+    f = getattr(f, "__func__", f)
+    name = getattr(f, "__qualname__", None) or repr(f)
+    code = getattr(f, "__code__", None)
+    if "<lambda>" in name and code is not None:
+        name += f" ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name
+
+
+class LoopMonitor:
+    """
+    Main-loop watchdog.
+
+    An `after` heartbeat measures how late the loop gets back to it (lag). Every Tcl -> Python
+    callback (event bindings, after callbacks, widget commands, variable traces) goes through
+    tkinter.CallWrapper, which is wrapped to time it; when a beat is late by more than
+    threshold_ms the slowest callback since the previous beat is blamed.
+    """
+
+    def __init__(self, root: tkinter.Misc, interval_ms: int = 50, threshold_ms: int = 100,
+                 log_path: str | None = None, on_lag=None):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.threshold_ms = threshold_ms
+        self.log_path = log_path
+        self.on_lag = on_lag
+
+        self.stats: dict[str, list] = {}     # name -> [slow calls, total s, max s]
+        self.events = deque(maxlen=200)      # (wall time, lag ms, culprit, culprit ms)
+        self.lags = deque(maxlen=2000)       # recent lag samples in ms
+        self._slowest = None                 # (seconds, func) since the last beat
+        self._expected = 0.0
+        self._orig_call = None
+        self._after_id = None
+
+    # ===== install / uninstall =====
+    def install(self):
+        if self._orig_call is not None:
+            return
+        orig = tkinter.CallWrapper.__call__
+        monitor = self
+
+        def __call__(wrapper, *args):
+            t0 = time.perf_counter()
+            try:
+                return orig(wrapper, *args)
+            finally:
+                monitor._record(wrapper.func, time.perf_counter() - t0)
+
+        self._orig_call = orig
+        tkinter.CallWrapper.__call__ = __call__
+        self._expected = time.perf_counter() + self.interval_ms / 1000.0
+        self._after_id = self.root.after(self.interval_ms, self._beat)
+
+    def uninstall(self):
+        if self._orig_call is None:
+            return
+        tkinter.CallWrapper.__call__ = self._orig_call
+        self._orig_call = None
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    # ===== measuring =====
+    def _record(self, func, dur: float):
+        func = unwrap_callback(func)
+        if func == self._beat:
+            return
+        if self._slowest is None or dur > self._slowest[0]:
+            self._slowest = (dur, func)
+        if dur < MIN_RECORD_S:
+            return
+        name = callback_name(func)
+        st = self.stats.get(name)
+        if st is None:
+            st = self.stats[name] = [0, 0.0, 0.0]
+        st[0] += 1
+        st[1] += dur
+        if dur > st[2]:
+            st[2] = dur
+
+    def _beat(self):
+        now = time.perf_counter()
+        lag_ms = max(0.0, (now - self._expected) * 1000.0)
+        self.lags.append(lag_ms)
+        if self.on_lag is not None:
+            self.on_lag(lag_ms / 1000.0)
+
+        if lag_ms >= self.threshold_ms:
+            slowest = self._slowest
+            if slowest is not None and slowest[0] * 1000.0 >= self.threshold_ms / 2:
+                culprit, culprit_ms = callback_name(slowest[1]), slowest[0] * 1000.0
+            else:
+                culprit, culprit_ms = "(no slow Python callback: Tk layout/redraw or C code)", 0.0
+            self.events.append((time.time(), lag_ms, culprit, culprit_ms))
+            self._log(lag_ms, culprit, culprit_ms)
+
+        self._slowest = None
+        self._expected = now + self.interval_ms / 1000.0
+        self._after_id = self.root.after(self.interval_ms, self._beat)
+
+    def _log(self, lag_ms: float, culprit: str, culprit_ms: float):
+        if not self.log_path:
+            return
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+                f.write(f"{stamp}  lag {lag_ms:7.1f} ms  {culprit}  ({culprit_ms:.1f} ms)\n")
+        except OSError:
+            pass
+
+    # ===== reporting =====
+    def worst(self, n: int = 20) -> list[tuple[str, int, float, float]]:
+        """(name, slow calls, max ms, total ms), worst max first."""
+        rows = [(name, st[0], st[2] * 1000.0, st[1] * 1000.0) for name, st in self.stats.items()]
+        rows.sort(key=lambda r: r[2], reverse=True)
+        return rows[:n]
+
+    def lag_percentile(self, p: float) -> float:
+        if not self.lags:
+            return 0.0
+        data = sorted(self.lags)
+        return data[min(len(data) - 1, int(round(p / 100.0 * (len(data) - 1))))]
+
+    def reset(self):
+        self.stats.clear()
+        self.events.clear()
+        self.lags.clear()
+        self._slowest = None
@@ -1,8 +1,24 @@
-from app import App
+import sys
+from startup_profile import PROFILE
+
+CLI_COMMANDS = ("stats", "validate", "rewrite", "reorder", "export", "buckets", "resize", "dupes")
 
 def main():
+    argv = sys.argv[1:]
+    if argv and argv[0] in CLI_COMMANDS:
+        # batch mode: no Tk, no Pillow
+        from cli import main as cli_main
+        sys.exit(cli_main(argv))
+
+    PROFILE.enabled = "--startup-profile" in argv
+    from app import App
+    PROFILE.mark("import app")
     app = App()
     app.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if getattr(sys, "frozen", False):
+        # process pools (batch mode, resize pipeline) re-launch the frozen exe
+        import multiprocessing
+        multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,106 @@
+import time, json, threading
+from collections import deque
+from contextlib import contextmanager
+
+
+class Histogram:
+    """Latency samples in seconds: exact count/total/max, percentiles over the last `window` samples."""
+
+    def __init__(self, window: int = 2048):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        data = sorted(self.samples)
+        i = min(len(data) - 1, max(0, int(round(p / 100.0 * (len(data) - 1)))))
+        return data[i]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": (self.total / self.count * 1000.0) if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000.0,
+            "p99_ms": self.percentile(99) * 1000.0,
+            "max_ms": self.max * 1000.0,
+        }
+
+
+class Metrics:
+    """Process-wide counters, gauges and latency histograms; safe to update from worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: dict[str, int] = {}
+        self.gauges: dict[str, float] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.started = time.time()
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            h = self.histograms.get(name)
+            if h is None:
+                h = self.histograms[name] = Histogram()
+            h.add(seconds)
+
+    @contextmanager
+    def timed(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "uptime_s": time.time() - self.started,
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {k: h.summary() for k, h in self.histograms.items()},
+            }
+
+    def export_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def hud_lines(self) -> list[str]:
+        snap = self.snapshot()
+        lines = []
+        for name in sorted(snap["histograms"]):
+            s = snap["histograms"][name]
+            lines.append(f"{name:18s} p50 {s['p50_ms']:7.1f}  p99 {s['p99_ms']:7.1f} ms  n={s['count']}")
+        for name in sorted(snap["gauges"]):
+            lines.append(f"{name:18s} {snap['gauges'][name]:g}")
+        for name in sorted(snap["counters"]):
+            lines.append(f"{name:18s} {snap['counters'][name]}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+
+METRICS = Metrics()
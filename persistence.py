@@ -0,0 +1,135 @@
+import threading, queue
+
+
+class PersistenceManager:
+    """
+    Coalesces writes of whole files (triggers, groups, settings, ...).
+
+    register(key, snapshot, write):
+        snapshot() runs on the thread that owns the data and returns a cheap copy,
+        write(payload) runs on the background writer thread.
+    mark_dirty(key) schedules a flush after delay_ms; more edits inside the window
+    are written once. flush() writes everything now and waits for the writer.
+
+    schedule(delay_ms, fn) / cancel(token) let the owner run snapshots on its own
+    thread (Tk `after`); without them a threading.Timer is used.
+    """
+
+    def __init__(self, delay_ms: int = 500, schedule=None, cancel=None, on_error=None, on_written=None):
+        self.delay_ms = delay_ms
+        self._schedule = schedule
+        self._cancel = cancel
+        self._on_error = on_error
+        self._on_written = on_written
+        self._entries = {}
+        self._dirty = []
+        self._inflight = {}
+        self._timer = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
+        self.writes = 0
+
+    def register(self, key: str, snapshot, write):
+        self._entries[key] = (snapshot, write)
+
+    def mark_dirty(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                if key not in self._entries:
+                    raise KeyError(key)
+                if key not in self._dirty:
+                    self._dirty.append(key)
+            if self._timer is not None or self._closed:
+                return
+            if self._schedule is not None:
+                self._timer = self._schedule(self.delay_ms, self._on_timer)
+            else:
+                self._timer = threading.Timer(self.delay_ms / 1000.0, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def is_dirty(self, key: str | None = None) -> bool:
+        with self._lock:
+            return bool(self._dirty) if key is None else key in self._dirty
+
+    def is_pending(self, key: str) -> bool:
+        """Dirty, queued or being written right now."""
+        with self._lock:
+            return key in self._dirty or self._inflight.get(key, 0) > 0
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self._submit_dirty()
+
+    def _submit_dirty(self):
+        with self._lock:
+            keys = self._dirty
+            self._dirty = []
+            for key in keys:
+                self._inflight[key] = self._inflight.get(key, 0) + 1
+        for key in keys:
+            snapshot, write = self._entries[key]
+            try:
+                payload = snapshot()
+            except Exception as e:
+                self._done(key)
+                self._report(key, e)
+                continue
+            self._queue.put((key, write, payload))
+
+    def _done(self, key: str):
+        with self._lock:
+            self._inflight[key] -= 1
+
+    def _writer_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                key, write, payload = item
+                try:
+                    write(payload)
+                    self.writes += 1
+                    if self._on_written:
+                        self._on_written(key)
+                except Exception as e:
+                    self._report(key, e)
+                finally:
+                    self._done(key)
+            finally:
+                self._queue.task_done()
+
+    def _report(self, key: str, err: Exception):
+        if self._on_error:
+            try:
+                self._on_error(key, err)
+            except Exception:
+                pass
+
+    def flush(self):
+        with self._lock:
+            timer = self._timer
+            self._timer = None
+        if timer is not None:
+            if self._schedule is not None:
+                if self._cancel is not None:
+                    try:
+                        self._cancel(timer)
+                    except Exception:
+                        pass
+            else:
+                timer.cancel()
+        self._submit_dirty()
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=5.0)
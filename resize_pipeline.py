@@ -0,0 +1,309 @@
+"""
+Batch resize / crop / convert to training buckets.
+
+Each image goes to its aspect-ratio bucket (aspect_buckets.BucketSet) and is written
+  - into out_dir, mirroring the folder layout, or
+  - next to the original as <stem><suffix>.<ext>
+with metadata stripped (EXIF orientation is applied first) and its .caption sidecar copied along.
+
+Outputs whose mtime is not older than the source are skipped if the manifest next to them
+(MANIFEST_NAME in out_dir, or in folder) says they were written with the same settings. Files are
+written through a temporary name, so an interrupted run can simply be started again. Work runs on
+a process pool.
+"""
+import os, json, math, time, shutil, hashlib, threading, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from io_store import caption_path_for
+from aspect_buckets import BucketSet
+
+# center: cover the bucket, center-crop the overflow
+# fit:    fit inside the bucket, no crop, output may be smaller than the bucket
+# pad:    fit inside the bucket and pad to its exact size
+CROP_POLICIES = ("center", "fit", "pad")
+OUTPUT_FORMATS = ("png", "jpg", "webp", "keep")
+SAVE_FORMATS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG", ".webp": "WEBP", ".bmp": "BMP"}
+PAD_COLOR = (0, 0, 0)
+CHUNK = 16
+MANIFEST_NAME = ".resize_manifest.json"
+
+# per-process config, set once by the pool initializer
+_cfg = {}
+
+
+def output_path(src: str, folder: str, out_dir: str | None, suffix: str, fmt: str) -> str:
+    stem, ext = os.path.splitext(os.path.relpath(src, folder))
+    ext = ext.lower() if fmt == "keep" else "." + fmt
+    if out_dir:
+        return os.path.join(out_dir, stem + ext)
+    return os.path.join(folder, stem + suffix + ext)
+
+
+def _up_to_date(src: str, dst: str) -> bool:
+    try:
+        return os.stat(dst).st_mtime_ns >= os.stat(src).st_mtime_ns
+    except OSError:
+        return False
+
+
+def settings_digest(cfg: dict, fmt: str) -> str:
+    """Everything that changes the output pixels or encoding; outputs made with another digest are redone."""
+    keys = ["buckets", "policy", "upscale"]
+    if fmt != "png":
+        keys.append("quality")
+    if fmt in ("png", "keep"):
+        keys.append("png_level")
+    data = {k: cfg[k] for k in keys}
+    data["fmt"] = fmt
+    data["pad"] = list(PAD_COLOR)
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path: str, manifest: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _scale(w: int, h: int, bucket: tuple[int, int], policy: str, upscale: bool) -> float:
+    bw, bh = bucket
+    s = max(bw / w, bh / h) if policy == "center" else min(bw / w, bh / h)
+    return s if upscale else min(s, 1.0)
+
+
+def _init_worker(cfg: dict):
+    _cfg.clear()
+    _cfg.update(cfg)
+    _cfg["bset"] = BucketSet(cfg["buckets"])
+
+
+def _convert_mode(img, fmt: str):
+    if fmt == "JPEG" or fmt == "BMP":
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            Image = _cfg["Image"]
+            img = img.convert("RGBA")
+            bg = Image.new("RGB", img.size, (255, 255, 255))
+            bg.paste(img, mask=img.getchannel("A"))
+            return bg
+        return img if img.mode in ("RGB", "L") else img.convert("RGB")
+    if img.mode == "P":
+        return img.convert("RGBA" if "transparency" in img.info else "RGB")
+    return img if img.mode in ("RGB", "RGBA", "L", "LA") else img.convert("RGB")
+
+
+def _process(src: str, dst: str):
+    Image = _cfg["Image"]
+    ImageOps = _cfg["ImageOps"]
+    policy, upscale = _cfg["policy"], _cfg["upscale"]
+
+    with Image.open(src) as img:
+        orient = img.getexif().get(0x0112, 1)
+        w, h = img.size
+        tw, th = (h, w) if orient in (5, 6, 7, 8) else (w, h)
+        bucket = _cfg["bset"].assign(tw, th)[0]
+        scale = _scale(tw, th, bucket, policy, upscale)
+        if scale < 1.0 and img.format == "JPEG":
+            # DCT-domain downscale while decoding: much cheaper than a full decode plus resize
+            img.draft("RGB", (math.ceil(w * scale), math.ceil(h * scale)))
+        img = ImageOps.exif_transpose(img)
+
+        w, h = img.size
+        bw, bh = bucket
+        scale = _scale(w, h, bucket, policy, upscale)
+        if policy == "center":
+            cw, ch = min(w, round(bw / scale)), min(h, round(bh / scale))
+            box = ((w - cw) // 2, (h - ch) // 2, (w - cw) // 2 + cw, (h - ch) // 2 + ch)
+            size = (max(1, round(cw * scale)), max(1, round(ch * scale)))
+            if size == (cw, ch):
+                img = img.crop(box) if (cw, ch) != (w, h) else img
+            else:
+                img = img.resize(size, Image.Resampling.LANCZOS, box=box, reducing_gap=3.0)
+        else:
+            size = (max(1, round(w * scale)), max(1, round(h * scale)))
+            if size != (w, h):
+                img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        fmt = SAVE_FORMATS.get(os.path.splitext(dst)[1].lower(), "PNG")
+        img = _convert_mode(img, fmt)
+        if policy == "pad" and img.size != bucket:
+            canvas = Image.new(img.mode, bucket, PAD_COLOR if img.mode not in ("L", "LA") else 0)
+            canvas.paste(img, ((bw - img.size[0]) // 2, (bh - img.size[1]) // 2))
+            img = canvas
+
+        # no exif/icc/pnginfo passed: metadata is stripped
+        params = {}
+        if fmt in ("JPEG", "WEBP"):
+            params["quality"] = _cfg["quality"]
+        if fmt == "PNG":
+            params["compress_level"] = _cfg["png_level"]
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        tmp = dst + ".tmp"
+        img.save(tmp, format=fmt, **params)
+    os.replace(tmp, dst)
+
+
+def _work_chunk(items: list[tuple[str, str, bool]]) -> dict:
+    if "Image" not in _cfg:
+        from image_utils import pil_image
+        _cfg["Image"] = pil_image()
+        from PIL import ImageOps
+        _cfg["ImageOps"] = ImageOps
+
+    out = {"pid": os.getpid(), "written": 0, "skipped": 0, "captions": 0, "failed": [], "done": [], "busy": 0.0}
+    t0 = time.perf_counter()
+    for src, dst, same_settings in items:
+        try:
+            if not _cfg["force"] and same_settings and _up_to_date(src, dst):
+                out["skipped"] += 1
+            else:
+                _process(src, dst)
+                out["written"] += 1
+            out["done"].append(dst)
+
+            cap = caption_path_for(src)
+            if os.path.exists(cap):
+                dst_cap = caption_path_for(dst)
+                if _cfg["force"] or not _up_to_date(cap, dst_cap):
+                    shutil.copy2(cap, dst_cap)
+                    out["captions"] += 1
+        except Exception as e:
+            out["failed"].append((src, str(e)))
+            try:
+                os.remove(dst + ".tmp")
+            except OSError:
+                pass
+    out["busy"] = time.perf_counter() - t0
+    return out
+
+
+def plan(folder: str, paths: list[str], out_dir: str | None, suffix: str, fmt: str) -> list[tuple[str, str]]:
+    """(source, output) pairs; with a suffix, earlier outputs sitting next to the originals are left out."""
+    items = []
+    for p in paths:
+        if not out_dir and os.path.splitext(os.path.basename(p))[0].endswith(suffix):
+            continue
+        dst = output_path(p, folder, out_dir, suffix, fmt)
+        if os.path.normcase(os.path.abspath(dst)) == os.path.normcase(os.path.abspath(p)):
+            raise ValueError(f"Output would overwrite the original: {p}")
+        items.append((p, dst))
+    return items
+
+
+def run_pipeline(
+    folder: str,
+    paths: list[str],
+    buckets: list[tuple[int, int]],
+    out_dir: str | None = None,
+    suffix: str = "_train",
+    policy: str = "center",
+    fmt: str = "png",
+    quality: int = 95,
+    upscale: bool = False,
+    png_level: int = 6,
+    force: bool = False,
+    workers: int = 4,
+    progress=None,
+    cancel: threading.Event | None = None,
+) -> dict:
+    """
+    progress(done, total) is called from the calling thread. Returns counts, failures and
+    per-worker throughput: {"per_worker": {pid: {"images", "busy_s", "images_per_s"}}, ...}.
+    """
+    if policy not in CROP_POLICIES:
+        raise ValueError(f"Unknown crop policy: {policy}")
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+    if not out_dir and not suffix:
+        raise ValueError("Writing next to the originals needs a file name suffix.")
+
+    items = plan(folder, paths, out_dir, suffix, fmt)
+    cfg = {
+        "buckets": list(buckets),
+        "policy": policy,
+        "quality": int(quality),
+        "upscale": bool(upscale),
+        "png_level": int(png_level),
+        "force": bool(force),
+    }
+
+    # output path (relative to the manifest, "/" separated) -> settings digest it was written with
+    base = out_dir or folder
+    manifest_path = os.path.join(base, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    digest = settings_digest(cfg, fmt)
+
+    def _key(dst: str) -> str:
+        return os.path.relpath(dst, base).replace(os.sep, "/")
+
+    work = [(src, dst, manifest.get(_key(dst)) == digest) for src, dst in items]
+    dst_of = dict(items)
+    chunks = [work[i:i + CHUNK] for i in range(0, len(work), CHUNK)]
+
+    res = {"images": len(items), "written": 0, "skipped": 0, "captions": 0, "failed": [], "per_worker": {},
+           "elapsed_s": 0.0, "cancelled": False}
+    t0 = time.perf_counter()
+    done = 0
+    if progress is not None:
+        progress(0, len(items))
+
+    # spawn, not fork: the GUI calls this from a worker thread of a process running Tk
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, int(workers)), mp_context=ctx,
+                                 initializer=_init_worker, initargs=(cfg,)) as ex:
+            futures = [ex.submit(_work_chunk, chunk) for chunk in chunks]
+            for fut in as_completed(futures):
+                if cancel is not None and cancel.is_set():
+                    for f in futures:
+                        f.cancel()
+                    res["cancelled"] = True
+                    break
+                part = fut.result()
+                for key in ("written", "skipped", "captions"):
+                    res[key] += part[key]
+                res["failed"].extend(part["failed"])
+                for dst in part["done"]:
+                    manifest[_key(dst)] = digest
+                for src, _err in part["failed"]:
+                    # may have been replaced halfway by another run: not trusted any more
+                    manifest.pop(_key(dst_of[src]), None)
+                w = res["per_worker"].setdefault(part["pid"], {"images": 0, "busy_s": 0.0})
+                w["images"] += part["written"] + part["skipped"]
+                w["busy_s"] += part["busy"]
+                done += part["written"] + part["skipped"] + len(part["failed"])
+                if progress is not None:
+                    progress(done, len(items))
+    finally:
+        # also after a cancel or crash: what was written is recorded, the next run skips it
+        if items:
+            try:
+                os.makedirs(base, exist_ok=True)
+                save_manifest(manifest_path, manifest)
+            except OSError:
+                pass
+
+    res["elapsed_s"] = time.perf_counter() - t0
+    for w in res["per_worker"].values():
+        w["images_per_s"] = w["images"] / w["busy_s"] if w["busy_s"] > 0 else 0.0
+    res["failed"].sort()
+    return res
+
+
+def throughput_lines(res: dict) -> list[str]:
+    lines = []
+    for n, (pid, w) in enumerate(sorted(res["per_worker"].items()), 1):
+        lines.append(f"worker {n} (pid {pid}): {w['images']} images, {w['images_per_s']:.1f} img/s")
+    if res["elapsed_s"] > 0:
+        total = res["written"] + res["skipped"]
+        lines.append(f"total: {total / res['elapsed_s']:.1f} img/s over {len(res['per_worker'])} worker(s)")
+    return lines
@@ -0,0 +1,48 @@
+import os, json, time
+
+SESSION_VERSION = 1
+
+
+class SessionSnapshot:
+    """
+    Where the user left off: folder, image, list position, group/filter and the image list itself,
+    plus the last on-screen preview as a PNG that Tk can show without Pillow.
+    save() runs on the persistence writer thread, load() on startup before any folder scan.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.preview_path = os.path.splitext(path)[0] + "_preview.png"
+        self._saved_preview = None
+
+    def load(self) -> dict | None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != SESSION_VERSION:
+            return None
+        if data.get("preview_for") and not os.path.exists(self.preview_path):
+            data["preview_for"] = None
+        return data
+
+    def save(self, data: dict, preview=None):
+        data = dict(data, version=SESSION_VERSION, saved_at=time.time())
+
+        # the preview only changes with the image or canvas size, skip re-encoding otherwise
+        if preview is not None and preview is not self._saved_preview:
+            tmp = self.preview_path + ".tmp"
+            try:
+                preview.save(tmp, "PNG", compress_level=1)
+                os.replace(tmp, self.preview_path)
+                self._saved_preview = preview
+            except Exception:
+                data["preview_for"] = None
+        elif preview is None:
+            data["preview_for"] = None
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
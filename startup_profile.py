@@ -0,0 +1,36 @@
+import time, sys
+
+_T0 = time.perf_counter()
+
+
+class StartupProfile:
+    def __init__(self):
+        self.enabled = False
+        self.marks: list[tuple[str, float]] = []
+        self._last = _T0
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.marks.append((phase, now - self._last))
+        self._last = now
+
+    def report(self) -> str:
+        lines = ["Startup profile:"]
+        for phase, dt in self.marks:
+            lines.append(f"  {phase:28s} {dt * 1000:8.1f} ms")
+        lines.append(f"  {'total':28s} {(self._last - _T0) * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+    def print_report(self, log_path: str | None = None):
+        text = self.report()
+        if sys.stdout is not None:
+            print(text, flush=True)
+        if log_path:
+            try:
+                with open(log_path, "w", encoding="utf-8") as f:
+                    f.write(text + "\n")
+            except OSError:
+                pass
+
+
+PROFILE = StartupProfile()
@@ -0,0 +1,58 @@
+import os, sys, threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_export import export_dataset, scan_dataset
+
+
+def _dataset(folder, n: int):
+    for i in range(n):
+        with open(os.path.join(folder, f"img{i}.png"), "wb") as f:
+            f.write(b"\x89PNG" + bytes([i]))
+        with open(os.path.join(folder, f"img{i}.caption"), "w", encoding="utf-8") as f:
+            f.write(f"tag{i}")
+
+
+def test_scan_reports_caption_stat(tmp_path):
+    _dataset(str(tmp_path), 1)
+    with open(tmp_path / "bare.png", "wb") as f:
+        f.write(b"\x89PNG")
+    items = {it[0]: it for it in scan_dataset(str(tmp_path))}
+    st = os.stat(tmp_path / "img0.caption")
+    assert items["img0.png"][3:] == (st.st_size, st.st_mtime_ns)
+    assert items["bare.png"][3:] == (-1, -1)
+
+
+def test_resume_redoes_shard_whose_caption_changed(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    _dataset(str(src), 4)
+    res = export_dataset(str(src), str(out), {}, [], shard_size=2, workers=1)
+    assert (res["written"], res["skipped"]) == (2, 0)
+
+    # only the caption changes, the image stays as it was
+    cap = src / "img3.caption"
+    with open(cap, "w", encoding="utf-8") as f:
+        f.write("tag3, new tag")
+    st = os.stat(cap)
+    os.utime(cap, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    res = export_dataset(str(src), str(out), {}, [], shard_size=2, workers=1)
+    assert (res["written"], res["skipped"]) == (1, 1)
+    with open(out / "shard-000001.json", "r", encoding="utf-8") as f:
+        assert "new tag" in f.read()
+
+
+def test_cancel_reports_shards_already_written(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    _dataset(str(src), 6)
+    cancel = threading.Event()
+
+    def _progress(done, _total):
+        if done == 2:
+            cancel.set()
+
+    res = export_dataset(str(src), str(out), {}, [], shard_size=2, workers=1, progress=_progress, cancel=cancel)
+    assert res["cancelled"]
+    assert res["written"] == 1
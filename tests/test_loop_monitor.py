@@ -0,0 +1,65 @@
+import os, sys, time, tkinter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loop_monitor import LoopMonitor, MIN_RECORD_S
+
+
+class _Root:
+    """Just enough of a Tk widget for Misc.after without a display: callbacks are kept by name."""
+
+    after = tkinter.Misc.after
+
+    def __init__(self):
+        self.commands = {}
+        self.tk = self
+
+    def call(self, *args):
+        return "after#%d" % len(self.commands)
+
+    def _register(self, func):
+        name = "cb%d" % len(self.commands)
+        self.commands[name] = func
+        return name
+
+    def deletecommand(self, name):
+        self.commands.pop(name, None)
+
+    def after_cancel(self, _id):
+        pass
+
+    def fire(self, name):
+        # the way Tcl calls back into Python
+        tkinter.CallWrapper(self.commands[name], None, self)()
+
+
+class _Target:
+    def slow(self):
+        time.sleep(MIN_RECORD_S * 2)
+
+
+def test_after_callback_reported_under_its_own_name():
+    root = _Root()
+    mon = LoopMonitor(root, log_path=None)
+    mon.install()
+    try:
+        root.after(0, _Target().slow)
+        name = next(n for n, f in root.commands.items() if f.__name__ == "slow")
+        root.fire(name)
+    finally:
+        mon.uninstall()
+    assert "_Target.slow" in mon.stats
+    assert not any("callit" in n for n in mon.stats)
+
+
+def test_heartbeat_is_not_recorded_as_a_callback():
+    root = _Root()
+    mon = LoopMonitor(root, log_path=None)
+    mon.install()
+    try:
+        beat = next(n for n, f in root.commands.items() if f.__name__ == "_beat")
+        root.fire(beat)
+    finally:
+        mon.uninstall()
+    assert mon._slowest is None
+    assert not any("_beat" in n for n in mon.stats)
@@ -11,35 +11,53 @@ THEMES = ("Light", "Dark", "Image")
 
 
 class ThemeManager:
+    """
+    Every theme is compiled once into its own ttk theme (derived from clam) together with
+    its PhotoImages; switching afterwards is a single theme_use().
+    """
+
     def __init__(self, root: tk.Tk, assets_dir: str):
         self.root = root
         self.style = ttk.Style(root)
         self.assets_dir = assets_dir
-        self._image_refs = {}
+        self._image_refs = {}   # theme name -> images the compiled theme refers to
+        self._compiled = {}     # theme name -> ttk theme name
+        self.current = None
 
     def available(self):
         return THEMES
 
-    def apply(self, name: str):
-        name = name.strip()
-        self._image_refs = {}
+    def _compile(self, name: str) -> str:
+        ttk_name = f"icap_{name.lower()}"
+        if ttk_name not in self.style.theme_names():
+            self.style.theme_create(ttk_name, parent="clam")
+        self.style.theme_use(ttk_name)
 
-        if name == "Light":
-            apply_light(self.root, self.style)
-        elif name == "Dark":
-            apply_dark(self.root, self.style)
+        refs = self._image_refs.setdefault(name, {})
+        if name == "Dark":
+            apply_dark(self.root, self.style, ttk_name)
         elif name == "Image":
-            apply_image_theme(self.root, self.style, self.assets_dir, self._image_refs)
+            apply_image_theme(self.root, self.style, self.assets_dir, refs, ttk_name)
         else:
-            apply_light(self.root, self.style)
+            apply_light(self.root, self.style, ttk_name)
+
+        if hasattr(self.root, "on_theme_compiled"):
+            self.root.on_theme_compiled(name)
 
-        if hasattr(self.root, "_render_trigger_list"):
-            try:
-                self.root._render_trigger_list()
-            except Exception:
-                pass
+        self._compiled[name] = ttk_name
+        return ttk_name
+
+    def apply(self, name: str):
+        name = name.strip()
+        if name not in THEMES:
+            name = "Light"
 
-        self.root.update_idletasks()
+        ttk_name = self._compiled.get(name)
+        if ttk_name is None:
+            self._compile(name)
+        elif self.style.theme_use() != ttk_name:
+            self.style.theme_use(ttk_name)
+        self.current = name
 
         if hasattr(self.root, "on_theme_applied"):
-            self.root.on_theme_applied(name)
\ No newline at end of file
+            self.root.on_theme_applied(name)
@@ -2,9 +2,9 @@
 import tkinter as tk
 from tkinter import ttk
 
-def apply_dark(root: tk.Tk, style: ttk.Style):
+def apply_dark(root: tk.Tk, style: ttk.Style, base: str = "clam"):
     try:
-        style.theme_use("clam")
+        style.theme_use(base)
     except Exception:
         pass
 
@@ -13,7 +13,7 @@ def apply_dark(root: tk.Tk, style: ttk.Style):
     style.configure("TLabel", background="#1e1e1e", foreground="#e6e6e6")
     style.configure("TButton", padding=6)
     style.configure("TCombobox", padding=4)
-    style.theme_use("clam")
+    style.theme_use(base)
 
     bg = "#1e1e1e"
     fg = "#e7e7e7"
@@ -8,14 +8,14 @@ def _load_png(root: tk.Tk, path: str, image_refs: dict, key: str):
     image_refs[key] = img
     return img
 
-def apply_image_theme(root: tk.Tk, style: ttk.Style, assets_dir: str, image_refs: dict):
+def apply_image_theme(root: tk.Tk, style: ttk.Style, assets_dir: str, image_refs: dict, base: str = "clam"):
     """
     PNG theme scaffold:
     - Custom.TButton uses images for normal/active/pressed/disabled
     - Custom.TFrame uses a background image (optional)
     You can expand to entries/combobox/scrollbar later.
     """
-    style.theme_use("clam")
+    style.theme_use(base)
 
     theme_dir = os.path.join(assets_dir, "theme_image")
 
@@ -2,10 +2,10 @@
 import tkinter as tk
 from tkinter import ttk
 
-def apply_light(root: tk.Tk, style: ttk.Style):
+def apply_light(root: tk.Tk, style: ttk.Style, base: str = "clam"):
 
     try:
-        style.theme_use("clam")
+        style.theme_use(base)
     except Exception:
         pass
 
@@ -15,7 +15,7 @@ def apply_light(root: tk.Tk, style: ttk.Style):
     style.configure("TButton", padding=6)
     style.configure("TCombobox", padding=4)
     # базовая тема ttk
-    style.theme_use("clam")
+    style.theme_use(base)
 
     # базовые цвета
     bg = "#f3f3f3"
@@ -0,0 +1,255 @@
+"""
+Zoom and pan for the preview canvas, drawn from cached tiles.
+
+The decoded image is reused as pyramid level 0; level n is level n-1 halved with Image.reduce(2),
+built once per image on a background thread. A display tile is TILE x TILE canvas pixels at one
+quantized zoom, resampled from the smallest level that still has enough pixels, and kept in an
+LRU of PhotoImages. Panning only moves canvas items; tiles that scroll into view are rendered
+within a per-frame time budget and the rest follow on the next frame.
+"""
+import math, time, threading
+from collections import OrderedDict
+
+from image_utils import pil_image, pil_imagetk
+
+TILE = 256
+CACHE_TILES = 384                  # ~100 MB of RGBA PhotoImages at 256x256
+FRAME_MS = 16
+FRAME_BUDGET_S = 0.010
+ZOOM_STEP = 2 ** 0.25              # four wheel steps per doubling, zoom levels repeat so tiles get reused
+MAX_ZOOM = 16.0
+NEAREST_FROM = 3.0                 # show real pixels instead of smoothing when magnified this much
+
+
+class TileViewer:
+    def __init__(self, canvas, on_zoom=None):
+        self.canvas = canvas
+        self.on_zoom = on_zoom         # on_zoom(zoom) entering/changing, on_zoom(None) back to fit
+        self.image = None
+        self.levels = []
+        self.active = False
+        self.zoom = 1.0
+        self.ox = 0.0                  # image coords (level 0) at the canvas top-left
+        self.oy = 0.0
+
+        self._gen = 0
+        self._cache = OrderedDict()    # (gen, zoom key, tx, ty) -> PhotoImage
+        self._items = {}               # (tx, ty) -> (canvas item, PhotoImage) on screen
+        self._frame_id = None
+        self._drag = None
+        self._lock = threading.Lock()
+
+        canvas.bind("<MouseWheel>", self._on_wheel, add="+")
+        canvas.bind("<Button-4>", lambda e: self._zoom_at(e.x, e.y, 1), add="+")
+        canvas.bind("<Button-5>", lambda e: self._zoom_at(e.x, e.y, -1), add="+")
+        canvas.bind("<ButtonPress-1>", self._on_press, add="+")
+        canvas.bind("<B1-Motion>", self._on_drag, add="+")
+        canvas.bind("<ButtonRelease-1>", lambda _e: setattr(self, "_drag", None), add="+")
+        canvas.bind("<Double-Button-1>", lambda _e: self.fit(), add="+")
+
+    # ===== image =====
+    def set_image(self, img):
+        """New decoded image (or None); leaves zoom mode and drops the previous pyramid and tiles."""
+        self.fit()
+        with self._lock:
+            self._gen += 1
+            self.image = img
+            self.levels = [img] if img is not None else []
+        self._cache.clear()
+        if img is not None:
+            threading.Thread(target=self._build_levels, args=(self._gen, img), daemon=True).start()
+
+    def _build_levels(self, gen: int, img):
+        cur = img
+        while max(cur.size) > TILE:
+            try:
+                cur = cur.reduce(2)
+            except Exception:
+                return
+            with self._lock:
+                if gen != self._gen:
+                    return
+                self.levels.append(cur)
+
+    def _fit_zoom(self) -> float:
+        w, h = self.image.size
+        cw, ch = max(self.canvas.winfo_width(), 1), max(self.canvas.winfo_height(), 1)
+        return min(cw / w, ch / h)
+
+    # ===== zoom / pan =====
+    def fit(self):
+        was = self.active
+        self.active = False
+        self._clear_items()
+        if was and self.on_zoom is not None:
+            self.on_zoom(None)
+
+    def toggle_actual_size(self):
+        """1:1 around the canvas center, or back to fit."""
+        if self.image is None:
+            return
+        if self.active:
+            self.fit()
+            return
+        cw, ch = self.canvas.winfo_width(), self.canvas.winfo_height()
+        w, h = self.image.size
+        # center of the fitted image stays under the canvas center
+        self._set_zoom(1.0, cw / 2, ch / 2, w / 2, h / 2)
+
+    def _on_wheel(self, e):
+        self._zoom_at(e.x, e.y, 1 if e.delta > 0 else -1)
+
+    def _zoom_at(self, x: int, y: int, direction: int):
+        if self.image is None:
+            return
+        fz = self._fit_zoom()
+        if self.active:
+            z0, ix, iy = self.zoom, self.ox + x / self.zoom, self.oy + y / self.zoom
+        else:
+            # image point under the cursor in the fitted preview
+            w, h = self.image.size
+            cw, ch = self.canvas.winfo_width(), self.canvas.winfo_height()
+            z0 = fz
+            ix = (x - (cw - w * fz) / 2) / fz
+            iy = (y - (ch - h * fz) / 2) / fz
+        steps = round(math.log(max(z0, 1e-6), ZOOM_STEP)) + direction
+        z = min(MAX_ZOOM, ZOOM_STEP ** steps)
+        if z <= fz * 1.0001:
+            self.fit()
+            return
+        self._set_zoom(z, x, y, ix, iy)
+
+    def _set_zoom(self, z: float, x: float, y: float, ix: float, iy: float):
+        """Zoom z with image point (ix, iy) under canvas point (x, y)."""
+        self.zoom = z
+        self.ox = ix - x / z
+        self.oy = iy - y / z
+        self._clamp()
+        self.active = True
+        self._clear_items()
+        self._schedule()
+        if self.on_zoom is not None:
+            self.on_zoom(z)
+
+    def _clamp(self):
+        w, h = self.image.size
+        cw, ch = self.canvas.winfo_width(), self.canvas.winfo_height()
+        vw, vh = cw / self.zoom, ch / self.zoom
+        # center images smaller than the view, otherwise keep the view inside the image
+        self.ox = (w - vw) / 2 if vw >= w else min(max(self.ox, 0.0), w - vw)
+        self.oy = (h - vh) / 2 if vh >= h else min(max(self.oy, 0.0), h - vh)
+
+    def _on_press(self, e):
+        self._drag = (e.x, e.y) if self.active else None
+
+    def _on_drag(self, e):
+        if not self.active or self._drag is None:
+            return
+        px, py = self._drag
+        self._drag = (e.x, e.y)
+        z = self.zoom
+        ox, oy = self.ox, self.oy
+        self.ox -= (e.x - px) / z
+        self.oy -= (e.y - py) / z
+        self._clamp()
+        # same rounding as _frame, so moved and newly placed tiles line up
+        dx, dy = round(ox * z) - round(self.ox * z), round(oy * z) - round(self.oy * z)
+        if dx or dy:
+            # tiles on screen just move; new ones are filled in on the next frame
+            self.canvas.move("tile", dx, dy)
+            self._schedule()
+
+    def on_resize(self):
+        if self.active and self.image is not None:
+            self._clamp()
+            self._clear_items()
+            self._schedule()
+
+    # ===== tiles =====
+    def _zoom_key(self) -> int:
+        return round(math.log(self.zoom, ZOOM_STEP))
+
+    def _schedule(self):
+        if self._frame_id is None:
+            self._frame_id = self.canvas.after(FRAME_MS if self._items else 0, self._frame)
+
+    def _clear_items(self):
+        if self._frame_id is not None:
+            try:
+                self.canvas.after_cancel(self._frame_id)
+            except Exception:
+                pass
+            self._frame_id = None
+        self.canvas.delete("tile")
+        self._items = {}
+
+    def _frame(self):
+        self._frame_id = None
+        if not self.active or self.image is None:
+            return
+        z = self.zoom
+        w, h = self.image.size
+        zw, zh = math.ceil(w * z), math.ceil(h * z)
+        cw, ch = self.canvas.winfo_width(), self.canvas.winfo_height()
+        # zoomed-image pixel at the canvas origin
+        x0, y0 = round(self.ox * z), round(self.oy * z)
+        tx0, ty0 = max(0, int(x0 // TILE)), max(0, int(y0 // TILE))
+        tx1 = min((zw - 1) // TILE, int((x0 + cw) // TILE))
+        ty1 = min((zh - 1) // TILE, int((y0 + ch) // TILE))
+        wanted = {(tx, ty) for tx in range(tx0, tx1 + 1) for ty in range(ty0, ty1 + 1)}
+
+        for key in [k for k in self._items if k not in wanted]:
+            self.canvas.delete(self._items.pop(key)[0])
+
+        # center-out so the middle of the view fills first
+        cx, cy = (tx0 + tx1) / 2, (ty0 + ty1) / 2
+        todo = sorted((k for k in wanted if k not in self._items), key=lambda k: (k[0] - cx) ** 2 + (k[1] - cy) ** 2)
+        deadline = time.perf_counter() + FRAME_BUDGET_S
+        zkey = self._zoom_key()
+        for tx, ty in todo:
+            photo = self._tile(zkey, tx, ty, zw, zh)
+            if photo is None:
+                continue
+            item = self.canvas.create_image(tx * TILE - x0, ty * TILE - y0, image=photo, anchor="nw", tags=("tile",))
+            self._items[(tx, ty)] = (item, photo)
+            if time.perf_counter() > deadline:
+                break
+        if self.canvas.find_withtag("hud"):
+            self.canvas.tag_raise("hud")
+
+        if len(self._items) < len(wanted):
+            self._schedule()
+
+    def _tile(self, zkey: int, tx: int, ty: int, zw: int, zh: int):
+        key = (self._gen, zkey, tx, ty)
+        photo = self._cache.get(key)
+        if photo is not None:
+            self._cache.move_to_end(key)
+            return photo
+
+        z = self.zoom
+        x0, y0 = tx * TILE, ty * TILE
+        x1, y1 = min(x0 + TILE, zw), min(y0 + TILE, zh)
+        with self._lock:
+            levels = list(self.levels)
+        # smallest level that still has at least one source pixel per screen pixel
+        lvl = 0
+        while lvl + 1 < len(levels) and z * (2 ** (lvl + 1)) <= 1.0:
+            lvl += 1
+        src = levels[lvl]
+        f = 2 ** lvl * z
+        box = (x0 / f, y0 / f, min(x1 / f, src.size[0]), min(y1 / f, src.size[1]))
+        Image = pil_image()
+        resample = Image.Resampling.NEAREST if z >= NEAREST_FROM else Image.Resampling.BILINEAR
+        try:
+            tile = src.resize((x1 - x0, y1 - y0), resample, box=box)
+            if tile.mode not in ("RGB", "RGBA", "L"):
+                tile = tile.convert("RGBA" if "A" in tile.getbands() else "RGB")
+            photo = pil_imagetk().PhotoImage(tile)
+        except Exception:
+            return None
+
+        self._cache[key] = photo
+        while len(self._cache) > CACHE_TILES:
+            self._cache.popitem(last=False)
+        return photo
@@ -0,0 +1,125 @@
+import os, json
+
+from io_store import normalize_trigger, load_translations, save_translations
+
+JOURNAL_SUFFIX = ".journal"
+
+
+class TranslationStore:
+    """
+    In-memory translations with an append-only journal next to translations.txt.
+    Upserts append one line to the journal; the sorted key=value file is rewritten
+    only by compact() (after compact_after journal entries and on close()).
+    Replaying the journal is idempotent, so a crash between the two files loses nothing.
+
+    If on_compact_needed is set, compaction is left to the caller, who can split it into
+    begin_compact() (rotates the journal, cheap) and finish_compact() (any thread).
+    """
+
+    def __init__(self, path: str, compact_after: int = 512):
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.rotated_path = self.journal_path + ".old"
+        self.compact_after = compact_after
+        self.on_compact_needed = None
+        self.data: dict[str, str] = {}
+        self._journal_len = 0
+        self.load()
+
+    def _replay(self, path: str, data: dict[str, str]) -> int:
+        n = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    if not isinstance(op, list) or len(op) < 2:
+                        continue
+                    if op[0] == "set" and len(op) >= 3:
+                        data[op[1]] = op[2]
+                    elif op[0] == "del":
+                        data.pop(op[1], None)
+                    n += 1
+        except FileNotFoundError:
+            pass
+        return n
+
+    def load(self) -> dict[str, str]:
+        data = load_translations(self.path) or {}
+        self._replay(self.rotated_path, data)
+        self._journal_len = self._replay(self.journal_path, data)
+
+        # keep the same dict object so references held by the UI stay valid
+        self.data.clear()
+        self.data.update(data)
+        return self.data
+
+    def get(self, key: str, default: str = "") -> str:
+        return self.data.get(key, default)
+
+    def _append(self, ops: list[list]):
+        if not ops:
+            return
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            for op in ops:
+                f.write(json.dumps(op, ensure_ascii=False) + "\n")
+        self._journal_len += len(ops)
+        if self._journal_len >= self.compact_after:
+            if self.on_compact_needed is not None:
+                self.on_compact_needed()
+            else:
+                self.compact()
+
+    def upsert(self, key: str, value: str) -> None:
+        key = normalize_trigger(key)
+        value = (value or "").strip()
+        if not key:
+            return
+        if not value:
+            self.remove(key)
+            return
+        if self.data.get(key) == value:
+            return
+        self.data[key] = value
+        self._append([["set", key, value]])
+
+    def remove(self, key: str) -> None:
+        self.remove_many([key])
+
+    def remove_many(self, keys) -> None:
+        ops = []
+        for key in keys:
+            key = normalize_trigger(key)
+            if key in self.data:
+                self.data.pop(key, None)
+                ops.append(["del", key])
+        self._append(ops)
+
+    def dirty(self) -> bool:
+        return self._journal_len > 0 or os.path.exists(self.rotated_path)
+
+    def begin_compact(self) -> dict[str, str]:
+        # while a previous compaction is still pending the live journal is left alone,
+        # the next compaction picks it up
+        if os.path.exists(self.journal_path) and not os.path.exists(self.rotated_path):
+            os.replace(self.journal_path, self.rotated_path)
+            self._journal_len = 0
+        return dict(self.data)
+
+    def finish_compact(self, data: dict[str, str]) -> None:
+        tmp = self.path + ".tmp"
+        save_translations(tmp, data)
+        os.replace(tmp, self.path)
+        try:
+            os.remove(self.rotated_path)
+        except FileNotFoundError:
+            pass
+
+    def compact(self) -> None:
+        self.finish_compact(self.begin_compact())
+
+    def close(self) -> None:
+        if self.dirty():
+            self.compact()
@@ -0,0 +1,272 @@
+import os, json, mmap
+from array import array
+
+from io_store import load_triggers, normalize_trigger
+from file_watch import file_signature
+
+VOCAB_SUFFIX = ".vocab"          # sorted tags, one per line (lowercased UTF-8 byte order, then exact)
+INDEX_SUFFIX = ".vocab.idx"      # uint32 line offsets
+META_SUFFIX = ".vocab.json"      # signature of the source triggers file
+
+VOCAB_ORDER = "lower"             # recorded in the meta file, files sorted another way are rebuilt
+
+# triggers files above this size are opened in large-vocabulary mode when the setting is "auto"
+LARGE_VOCAB_BYTES = 512 * 1024
+
+READ_CHUNK = 1 << 20
+
+
+def wants_large_vocab(triggers_path: str, mode: str = "auto") -> bool:
+    if mode == "on":
+        return True
+    if mode == "off":
+        return False
+    try:
+        return os.path.getsize(triggers_path) >= LARGE_VOCAB_BYTES
+    except OSError:
+        return False
+
+
+def _sort_key(tag: bytes) -> tuple[bytes, bytes]:
+    return tag.decode("utf-8").lower().encode("utf-8"), tag
+
+
+def build_vocab_files(triggers_path: str) -> None:
+    # case-insensitive order so prefix lookups match the small-vocabulary suggestions
+    tags = sorted({t.encode("utf-8") for t in load_triggers(triggers_path)}, key=_sort_key)
+
+    vocab_path = triggers_path + VOCAB_SUFFIX
+    offsets = array("I")
+    pos = 0
+    with open(vocab_path + ".tmp", "wb") as f:
+        for t in tags:
+            offsets.append(pos)
+            f.write(t + b"\n")
+            pos += len(t) + 1
+    offsets.append(pos)
+    os.replace(vocab_path + ".tmp", vocab_path)
+
+    with open(triggers_path + INDEX_SUFFIX, "wb") as f:
+        offsets.tofile(f)
+    with open(triggers_path + META_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump({"source": list(file_signature(triggers_path) or ()), "order": VOCAB_ORDER}, f)
+
+
+def _vocab_files_fresh(triggers_path: str) -> bool:
+    try:
+        with open(triggers_path + META_SUFFIX, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if not os.path.exists(triggers_path + VOCAB_SUFFIX) or not os.path.exists(triggers_path + INDEX_SUFFIX):
+        return False
+    if meta.get("order") != VOCAB_ORDER:
+        return False
+    return meta.get("source") == list(file_signature(triggers_path) or ())
+
+
+def iter_trigger_file(triggers_path: str):
+    """Tags of a triggers file in file order, read in chunks (duplicates are kept)."""
+    try:
+        f = open(triggers_path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        rest = ""
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                break
+            parts = (rest + chunk).replace("\n", ",").split(",")
+            rest = parts.pop()
+            for p in parts:
+                t = normalize_trigger(p)
+                if t:
+                    yield t
+        t = normalize_trigger(rest)
+        if t:
+            yield t
+
+
+class VocabIndex:
+    """
+    Read-only view of a sorted vocabulary file.
+    Only the line offsets (4 bytes per tag) and a first-byte bucket table live in memory,
+    tag strings are decoded from the memory map on demand. Lines are ordered by their
+    lowercased form, so lookups compare _key(i).
+    """
+
+    def __init__(self, vocab_path: str, index_path: str):
+        self._file = open(vocab_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        self._offsets = array("I")
+        with open(index_path, "rb") as f:
+            self._offsets.frombytes(f.read())
+        self._n = max(0, len(self._offsets) - 1)
+
+        # bucket[b] = first line whose first byte is >= b, narrows every search to one byte range
+        self._bucket = array("I", [self._n] * 257)
+        for b in range(256):
+            lo, hi = (self._bucket[b - 1] if b else 0), self._n
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._key(mid)[0] < b:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            self._bucket[b] = lo
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _raw(self, i: int) -> bytes:
+        return self._mm[self._offsets[i]:self._offsets[i + 1] - 1]
+
+    def line(self, i: int) -> str:
+        return self._raw(i).decode("utf-8")
+
+    def _key(self, i: int) -> bytes:
+        return self.line(i).lower().encode("utf-8")
+
+    def _lower_bound(self, key: bytes) -> int:
+        if not key:
+            return 0
+        lo = self._bucket[key[0]]
+        hi = self._bucket[key[0] + 1]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __contains__(self, tag: str) -> bool:
+        exact = tag.encode("utf-8")
+        key = tag.lower().encode("utf-8")
+        i = self._lower_bound(key)
+        # tags differing only in case sit next to each other
+        while i < self._n and self._key(i) == key:
+            if self._raw(i) == exact:
+                return True
+            i += 1
+        return False
+
+    def prefix(self, prefix: str, limit: int = 50) -> list[str]:
+        """Case-insensitive, like the small-vocabulary suggestions."""
+        key = prefix.lower().encode("utf-8")
+        out = []
+        i = self._lower_bound(key)
+        while i < self._n and len(out) < limit:
+            if not self._key(i).startswith(key):
+                break
+            out.append(self.line(i))
+            i += 1
+        return out
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self.line(i)
+
+    def close(self):
+        try:
+            if isinstance(self._mm, mmap.mmap):
+                self._mm.close()
+        finally:
+            self._file.close()
+
+
+class LargeVocabulary:
+    """VocabIndex plus the additions/removals made in this session (not yet in the index)."""
+
+    def __init__(self, triggers_path: str):
+        if not _vocab_files_fresh(triggers_path):
+            build_vocab_files(triggers_path)
+        self.triggers_path = triggers_path
+        self.index = VocabIndex(triggers_path + VOCAB_SUFFIX, triggers_path + INDEX_SUFFIX)
+        self.added: list[str] = []
+        self._added_set: set[str] = set()
+        self.removed: set[str] = set()
+        # added, saved, then removed again: not in the index but still in the triggers file
+        self._dropped: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.index) + len(self.added) - len(self.removed)
+
+    def __contains__(self, tag: str) -> bool:
+        if tag in self._added_set:
+            return True
+        return tag not in self.removed and tag in self.index
+
+    def add(self, tag: str):
+        self.removed.discard(tag)
+        self._dropped.discard(tag)
+        if tag not in self.index and tag not in self._added_set:
+            self._added_set.add(tag)
+            self.added.append(tag)
+
+    def remove(self, tag: str):
+        if tag in self._added_set:
+            self._added_set.discard(tag)
+            self.added.remove(tag)
+            self._dropped.add(tag)
+        if tag in self.index:
+            self.removed.add(tag)
+
+    def prefix(self, prefix: str, limit: int = 50) -> list[str]:
+        out = [t for t in self.index.prefix(prefix, limit + len(self.removed)) if t not in self.removed][:limit]
+        low = prefix.lower()
+        extra = [t for t in self.added if t.lower().startswith(low)]
+        return sorted(out + extra, key=str.lower)[:limit] if extra else out
+
+    def lookup_snapshot(self):
+        """
+        contains(tag) for a background thread: its own map of the index files and frozen copies
+        of this session's additions and removals, so later edits or close() don't reach it.
+        """
+        index = VocabIndex(self.triggers_path + VOCAB_SUFFIX, self.triggers_path + INDEX_SUFFIX)
+        added = frozenset(self._added_set)
+        removed = frozenset(self.removed)
+
+        def contains(tag: str) -> bool:
+            if tag in added:
+                return True
+            return tag not in removed and tag in index
+
+        return contains
+
+    def snapshot(self):
+        """
+        Cheap copy for a background writer: iterating it streams the triggers file in its own
+        order with this session's removals left out and additions appended.
+        """
+        path = self.triggers_path
+        removed = frozenset(self.removed | self._dropped)
+        added = list(self.added)
+        added_set = frozenset(added)
+
+        def _iter():
+            for t in iter_trigger_file(path):
+                # additions already written by an earlier save come again at the end
+                if t not in removed and t not in added_set:
+                    yield t
+            yield from added
+
+        return _iter
+
+    def close(self):
+        self.index.close()
+
+
+def save_large_triggers(triggers_path: str, snapshot) -> None:
+    tmp = triggers_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        first = True
+        for t in snapshot():
+            if not first:
+                f.write(", ")
+            f.write(t)
+            first = False
+    os.replace(tmp, triggers_path)